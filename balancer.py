@@ -0,0 +1,267 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+
+def model_key(model_name: str) -> str:
+    """Ollama reports "llama2:latest" for a model requested as "llama2" """
+    return model_name.removesuffix(":latest")
+
+
+class Backend:
+    """One Ollama server and what the pool knows about it"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.latency_ewma: Optional[float] = None  # seconds to the response headers
+        self.ejected_until = 0.0
+        self.failures = 0  # consecutive connect or health check failures
+        self.models: Set[str] = set()  # loaded models (model_key), from /api/ps and our own requests
+        self.running: List[Dict] = []  # last /api/ps answer
+        self.requests = 0
+        self.errors = 0
+
+    def stats(self, now: float) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.ejected_until <= now,
+            "outstanding": self.outstanding,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "models": sorted(self.models),
+            "requests": self.requests,
+            "errors": self.errors
+        }
+
+
+class BackendPool:
+    """
+    Routes requests across several Ollama servers.
+
+    A backend is chosen per request among those not ejected, preferring the
+    ones that already have the requested model loaded (so a model is not
+    loaded on a second GPU box while another has it warm):
+
+    - "least_outstanding": fewest requests in flight, then lowest latency.
+    - "ewma": lowest latency EWMA scaled by the requests in flight.
+
+    Ties go round robin. Once every backend with the model has
+    spill_outstanding requests in flight, the others are considered too
+    (0 never spills). A backend is ejected for eject_seconds when a
+    connection to it fails or a health check fails, and readmitted by the
+    next successful health check (or for a trial request once the time is
+    up). When every backend is ejected, all of them are tried.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        transport: httpx.AsyncBaseTransport,
+        strategy: str = "least_outstanding",
+        eject_seconds: float = 30,
+        spill_outstanding: int = 4,
+        ewma_alpha: float = 0.3,
+        clock=time.monotonic
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy {strategy!r}; use one of {', '.join(STRATEGIES)}")
+        self.backends = [Backend(url) for url in urls]
+        self.transport = transport
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self.spill_outstanding = spill_outstanding
+        self.ewma_alpha = ewma_alpha
+        self.clock = clock
+        self._turn = itertools.count()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def available(self) -> List[Backend]:
+        now = self.clock()
+        return [b for b in self.backends if b.ejected_until <= now] or self.backends
+
+    def choose(self, model_name: Optional[str] = None, exclude: Iterable[Backend] = ()) -> Backend:
+        """Backend for the next request (exclude: backends that already failed it)"""
+        candidates = [b for b in self.available() if b not in exclude] or self.available()
+        if model_name:
+            warm = [b for b in candidates if model_key(model_name) in b.models]
+            saturated = self.spill_outstanding and all(b.outstanding >= self.spill_outstanding for b in warm)
+            if warm and not saturated:
+                candidates = warm
+
+        start = next(self._turn) % len(candidates)
+        rotated = candidates[start:] + candidates[:start]
+        if self.strategy == "ewma":
+            return min(rotated, key=lambda b: ((b.latency_ewma or 0.0) * (b.outstanding + 1), b.outstanding))
+        return min(rotated, key=lambda b: (b.outstanding, b.latency_ewma or 0.0))
+
+    # Bookkeeping, called by BalancingTransport
+
+    def started(self, backend: Backend):
+        backend.outstanding += 1
+        backend.requests += 1
+
+    def finished(self, backend: Backend):
+        backend.outstanding -= 1
+
+    def responded(self, backend: Backend, model_name: Optional[str], seconds: float, status_code: int):
+        """Headers arrived: update the latency EWMA and (on success) the loaded models"""
+        if backend.latency_ewma is None:
+            backend.latency_ewma = seconds
+        else:
+            backend.latency_ewma += self.ewma_alpha * (seconds - backend.latency_ewma)
+        backend.failures = 0
+        if status_code >= 500:
+            backend.errors += 1
+        elif model_name and status_code < 400:
+            backend.models.add(model_key(model_name))
+
+    def eject(self, backend: Backend, reason: str):
+        backend.errors += 1
+        backend.failures += 1
+        backend.ejected_until = self.clock() + self.eject_seconds
+        logger.warning("Ejected Ollama backend %s for %.0fs: %s", backend.url, self.eject_seconds, reason)
+
+    # Active health checks
+
+    async def check(self, backend: Backend) -> bool:
+        """GET /api/ps on one backend; readmits it on success, ejects it on failure"""
+        if self._http is None:
+            # Shares the connection pool; never closed, as that would close it
+            self._http = httpx.AsyncClient(transport=self.transport, timeout=5)
+        try:
+            response = await self._http.get(f"{backend.url}/api/ps")
+            response.raise_for_status()
+            backend.running = response.json().get("models", [])
+        except Exception as e:
+            self.eject(backend, f"health check failed: {type(e).__name__}: {e}")
+            return False
+
+        if backend.ejected_until:
+            logger.info("Readmitted Ollama backend %s", backend.url)
+        backend.ejected_until = 0.0
+        backend.failures = 0
+        backend.models = {model_key(model["name"]) for model in backend.running}
+        return True
+
+    async def check_all(self) -> List[bool]:
+        return await asyncio.gather(*(self.check(backend) for backend in self.backends))
+
+    async def run_health_checks(self, interval: float):
+        """Check every backend every interval seconds (for the server's lifetime)"""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(interval)
+
+    async def running_models(self) -> List[Dict]:
+        """Loaded models on every reachable backend, each tagged with its backend"""
+        results = await self.check_all()
+        if not any(results):
+            raise ConnectionError(f"No Ollama backend reachable ({', '.join(b.url for b in self.backends)})")
+        return [
+            {**model, "backend": backend.url}
+            for backend, ok in zip(self.backends, results) if ok
+            for model in backend.running
+        ]
+
+    def stats(self) -> List[Dict]:
+        now = self.clock()
+        return [backend.stats(now) for backend in self.backends]
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that releases the backend's slot when it is closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class BalancingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that sends each request to a backend chosen by the
+    pool. Clients are created with the first backend's URL; the request is
+    re-addressed here, so every ChatOllama client (and anything else on
+    the shared transport) is balanced without knowing about the pool.
+
+    A request whose connection fails is retried once on another backend.
+    Nothing has been sent at that point, so no tokens can be duplicated.
+    """
+
+    def __init__(self, pool: BackendPool, transport: httpx.AsyncBaseTransport, retries: int = 1):
+        self.pool = pool
+        self.transport = transport
+        self.retries = retries
+        self.origin = httpx.URL(pool.backends[0].url)
+
+    def _readdress(self, request: httpx.Request, backend: Backend):
+        url = httpx.URL(backend.url)
+        path = request.url.path
+        if request.url.host == self.origin.host and request.url.port == self.origin.port:
+            path = path[len(self.origin.path.rstrip("/")):]
+        request.url = request.url.copy_with(
+            scheme=url.scheme, host=url.host, port=url.port, path=url.path.rstrip("/") + path
+        )
+        request.headers["Host"] = request.url.netloc.decode()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model_name = _requested_model(request)
+        tried: List[Backend] = []
+        while True:
+            backend = self.pool.choose(model_name, exclude=tried)
+            tried.append(backend)
+            self._readdress(request, backend)
+            self.pool.started(backend)
+            started = time.perf_counter()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self.pool.finished(backend)
+                self.pool.eject(backend, f"{type(e).__name__}: {e}")
+                if len(tried) > self.retries:
+                    raise
+                continue
+            except BaseException:
+                self.pool.finished(backend)
+                raise
+
+            self.pool.responded(backend, model_name, time.perf_counter() - started, response.status_code)
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_ReleasingStream(response.stream, lambda: self.pool.finished(backend)),
+                extensions=response.extensions
+            )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def _requested_model(request: httpx.Request) -> Optional[str]:
+    """The "model" of an Ollama API request body, if any"""
+    if request.method != "POST":
+        return None
+    try:
+        return json.loads(request.content).get("model")
+    except (httpx.RequestNotRead, ValueError, AttributeError):
+        return None
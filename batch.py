@@ -0,0 +1,52 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+
+def session_chains(session_ids: Sequence[Optional[str]]) -> List[List[int]]:
+    """
+    Group item indexes into chains that must run one after another: the
+    items of a session in submission order, and every stateless item (no
+    session) on its own
+    """
+    chains: "OrderedDict[Any, List[int]]" = OrderedDict()
+    for index, session_id in enumerate(session_ids):
+        chains.setdefault(index if session_id is None else ("session", session_id), []).append(index)
+    return list(chains.values())
+
+
+async def run_batch(
+    session_ids: Sequence[Optional[str]],
+    handle: Callable[[int], Awaitable[Any]],
+    max_parallel: int
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Run handle(index) for every item of a batch and yield (index, result) in
+    completion order.
+
+    At most max_parallel items run at once. Items of the same session run in
+    submission order, so each turn sees the previous one in its history;
+    everything else runs concurrently. If handle raises, the exception is
+    yielded as that item's result. Closing the generator early cancels the
+    remaining items.
+    """
+    pending = list(reversed(session_chains(session_ids)))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while pending:
+            for index in pending.pop():
+                try:
+                    result = await handle(index)
+                except Exception as e:
+                    result = e
+                await results.put((index, result))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_parallel, len(pending)))]
+    try:
+        for _ in range(len(session_ids)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,60 @@
+"""
+Per-turn latency as a session grows.
+
+Runs ChatBot.get_response against an instant fake model so the numbers show
+only the cost of assembling the prompt from history. With the token budget in
+place the time per turn should stay flat from tens to thousands of messages.
+
+Usage: python -m benchmarks.bench_context
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from bot import ChatBot
+from llm import llm_registry
+
+SIZES = [10, 100, 1000, 5000, 20000]
+
+
+async def time_turns(chatbot: ChatBot, turns: int) -> float:
+    """Average seconds per get_response call"""
+    start = time.perf_counter()
+    for i in range(turns):
+        await chatbot.get_response(f"Question {i}: tell me more about this topic please")
+    return (time.perf_counter() - start) / turns
+
+
+async def run(turns: int):
+    llm_registry.factory = lambda model_name: FakeListChatModel(responses=["A short answer about the topic."])
+
+    print(f"{'messages':>10} {'ms/turn':>10} {'prompt msgs':>12}")
+    for size in SIZES:
+        chatbot = ChatBot(session_id=f"bench-{size}", model_name="bench")
+        history = chatbot.get_session_history(chatbot.session_id)
+        for i in range(size // 2):
+            history.add_messages([
+                HumanMessage(content=f"Earlier question number {i} with some extra words"),
+                AIMessage(content=f"Earlier answer number {i}, a little longer than the question was")
+            ])
+
+        # Warm the cached token counts, as a live session would have
+        await chatbot.get_response("warm up")
+        per_turn = await time_turns(chatbot, turns)
+
+        prompt, _, _ = chatbot._build_context("probe", history, None, None, chatbot.model_name)
+        print(f"{size:>10} {per_turn * 1000:>10.3f} {len(prompt):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context assembly benchmark")
+    parser.add_argument("--turns", type=int, default=50, help="Turns timed per session size")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns))
+
+
+if __name__ == "__main__":
+    main()
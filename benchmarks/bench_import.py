@@ -0,0 +1,83 @@
+"""
+Import time of the API module, i.e. the startup cost before the server can
+bind its socket.
+
+Imports main in fresh interpreters with -X importtime and reports the
+median total, plus the modules that contribute most. Exits non-zero when
+the median exceeds --budget-ms, so CI catches a heavy import creeping back
+onto the startup path (LangChain is meant to load in the background; see
+startup.py).
+
+Usage: python -m benchmarks.bench_import --runs 5 --budget-ms 800
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """Parse the stderr of python -X importtime, in the order it was printed"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # column header
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def measure(module: str) -> List[ImportTime]:
+    """Import a module in a fresh interpreter and return its import times"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import-time benchmark")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Exit 1 if the median import time exceeds this")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [next(e.cumulative_us for e in entries if e.module == args.module) for entries in runs]
+    median_ms = statistics.median(totals) / 1000
+
+    # Direct imports of the module (and other top-level imports it triggered)
+    # from the median run, by cumulative time
+    entries = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    target_depth = next(e.depth for e in entries if e.module == args.module)
+    direct = sorted(
+        (e for e in entries if e.depth == target_depth + 1),
+        key=lambda e: e.cumulative_us, reverse=True
+    )
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.1f}, max {max(totals) / 1000:.1f})")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    for entry in direct[:args.top]:
+        print(f"{entry.module:<40} {entry.cumulative_us / 1000:>14.1f} {entry.self_us / 1000:>9.1f}")
+
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"import time {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
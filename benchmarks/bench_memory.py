@@ -0,0 +1,98 @@
+"""
+Memory held per session and per message.
+
+Builds many sessions with the compact MessageLog history and, for
+comparison, with LangChain's in-memory history (a pydantic message object
+per message, as ChatBot used before), and measures the allocations with
+tracemalloc. Content strings are included in the per-message numbers and
+also reported separately, so the difference is pure bookkeeping.
+
+Usage: python -m benchmarks.bench_memory --sessions 2000 --messages 50
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+import warnings
+
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from bot import ChatBot
+from message_log import TIMESTAMP_KEY, MessageLog
+
+# Only here for comparison
+warnings.filterwarnings("ignore", message=".*InMemoryChatMessageHistory.*")
+
+BACKENDS = {
+    "MessageLog": MessageLog,
+    "InMemoryChatMessageHistory": InMemoryChatMessageHistory
+}
+
+
+def allocated(build):
+    """Bytes still allocated by build() once it returns, and its result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def make_sessions(backend, count: int):
+    chatbots = []
+    for i in range(count):
+        chatbot = ChatBot(session_id=f"bench-{i}")
+        chatbot.store[chatbot.session_id] = backend()
+        chatbots.append(chatbot)
+    return chatbots
+
+
+def fill(chatbots, messages: int):
+    """Add user/assistant turns as ChatBot does (unique content per message)"""
+    for chatbot in chatbots:
+        history = chatbot.get_session_history(chatbot.session_id)
+        for turn in range(messages // 2):
+            now = time.time()
+            history.add_messages([
+                HumanMessage(content=f"Question {turn} from {chatbot.session_id}: how does this part work?",
+                             additional_kwargs={TIMESTAMP_KEY: now}),
+                AIMessage(content=f"Answer {turn} for {chatbot.session_id}: it works like this, roughly speaking.",
+                          additional_kwargs={TIMESTAMP_KEY: now})
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session and message memory benchmark")
+    parser.add_argument("--sessions", type=int, default=2000, help="Sessions per backend")
+    parser.add_argument("--messages", type=int, default=50, help="Messages per session")
+    args = parser.parse_args()
+    total_messages = args.sessions * (args.messages // 2 * 2)
+
+    print(f"{args.sessions} sessions x {args.messages} messages")
+    print(f"{'history':<28} {'B/session':>10} {'B/message':>10} {'overhead':>9} {'total MiB':>10} {'estimate':>9}")
+    for name, backend in BACKENDS.items():
+        session_bytes, chatbots = allocated(lambda: make_sessions(backend, args.sessions))
+        message_bytes, _ = allocated(lambda: fill(chatbots, args.messages))
+
+        content_bytes = sum(
+            sys.getsizeof(message.content)
+            for chatbot in chatbots[:10]
+            for message in chatbot.get_session_history(chatbot.session_id).messages
+        ) / (10 * (args.messages // 2 * 2))
+        per_message = message_bytes / total_messages
+        # How close ChatBot.estimated_memory_bytes (used in /api/health) is
+        estimate = sum(chatbot.estimated_memory_bytes() for chatbot in chatbots) / (session_bytes + message_bytes)
+
+        print(f"{name:<28} {session_bytes / args.sessions:>10.0f} {per_message:>10.0f} "
+              f"{per_message - content_bytes:>9.0f} {(session_bytes + message_bytes) / 2 ** 20:>10.1f} "
+              f"{estimate:>8.2f}x")
+        del chatbots
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-request overhead of the rate limiter.
+
+Calls a minimal ASGI app directly (no server, no network) with and without
+RateLimitMiddleware in front of it, so the difference is the cost of the
+limiter alone: key extraction, one bucket update and the extra headers.
+Keys rotate over a pool of clients so bucket lookup and idle eviction are
+exercised too.
+
+Usage: python -m benchmarks.bench_ratelimit
+"""
+import argparse
+import asyncio
+import time
+
+from ratelimit import RateLimitMiddleware, TokenBucketLimiter
+
+
+async def plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def time_requests(app, requests: int, clients: int) -> float:
+    """Average seconds per request"""
+    scopes = [
+        {"type": "http", "path": "/api/chat", "headers": [], "client": (f"10.0.{i // 256}.{i % 256}", 5000)}
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % clients], receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def run(requests: int, clients: int):
+    # Generous limit so every request takes the allowed path
+    limiter = TokenBucketLimiter(limit=10 ** 9, period=1)
+    limited_app = RateLimitMiddleware(plain_app, limiter=limiter)
+
+    # Warm up both paths
+    await time_requests(plain_app, 1000, clients)
+    await time_requests(limited_app, 1000, clients)
+
+    baseline = await time_requests(plain_app, requests, clients)
+    limited = await time_requests(limited_app, requests, clients)
+
+    print(f"{'':>16} {'us/request':>12}")
+    print(f"{'no limiter':>16} {baseline * 1e6:>12.2f}")
+    print(f"{'token bucket':>16} {limited * 1e6:>12.2f}")
+    print(f"{'overhead':>16} {(limited - baseline) * 1e6:>12.2f}")
+    print(f"buckets held: {len(limiter)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead benchmark")
+    parser.add_argument("--requests", type=int, default=200000, help="Requests timed per configuration")
+    parser.add_argument("--clients", type=int, default=10000, help="Distinct client IPs")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Local stand-in for the Ollama HTTP API.
+
+Streams synthetic tokens with configurable load, prefill and decode latency,
+so the API can be load-tested offline. Implements the endpoints the app
+uses: /api/chat, /api/generate (streaming NDJSON or a single JSON object),
+/api/embed, /api/tags and /api/ps. Responses carry Ollama-style timing
+fields (total_duration, prompt_eval_duration, eval_duration, ...).
+
+Usage: python -m benchmarks.fake_ollama --port 11435 --prefill-ms 40 --decode-ms 8
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+VOCABULARY = (
+    "the model answers with a short synthetic reply so that benchmarks measure "
+    "the serving path rather than the quality of the text being generated"
+).split()
+
+
+@dataclass
+class FakeOllamaConfig:
+    load_ms: float = 0.0                # first request for a model (cold start)
+    prefill_ms: float = 20.0            # fixed cost before the first token
+    prefill_ms_per_token: float = 0.02  # plus this per prompt token
+    decode_ms: float = 5.0              # per generated token
+    tokens: int = 64                    # tokens per answer (num_predict caps it)
+    keep_alive: float = 300.0           # seconds a model stays loaded
+    embed_dim: int = 768
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _prompt_tokens(payload: Dict) -> int:
+    if "messages" in payload:
+        text = "".join(str(message.get("content", "")) for message in payload["messages"])
+    else:
+        text = str(payload.get("prompt", ""))
+    return max(1, len(text) // 4)
+
+
+def _keep_alive_seconds(value, default: float) -> float:
+    """Ollama keep_alive: seconds or a duration like "30m"; negative = forever"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        unit = next((u for u in sorted(units, key=len, reverse=True) if value.endswith(u)), None)
+        value = float(value[:-len(unit)]) * units[unit] if unit else float(value)
+    return float("inf") if value < 0 else float(value)
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit-length vector for a text"""
+    digest = hashlib.sha256(text.encode()).digest()
+    values = [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+
+def create_app(config: FakeOllamaConfig = None) -> FastAPI:
+    config = config or FakeOllamaConfig()
+    app = FastAPI(title="Fake Ollama")
+    loaded: Dict[str, float] = {}  # model -> expiry (monotonic)
+    stats = {"requests": 0, "active": 0, "loads": 0}
+
+    async def load(model: str, keep_alive=None) -> float:
+        """Simulate loading a model; returns seconds spent"""
+        keep_alive = _keep_alive_seconds(keep_alive, config.keep_alive)
+        now = time.monotonic()
+        if loaded.get(model, 0) > now:
+            loaded[model] = now + keep_alive
+            return 0.0
+        stats["loads"] += 1
+        await asyncio.sleep(config.load_ms / 1000)
+        loaded[model] = time.monotonic() + keep_alive
+        return config.load_ms / 1000
+
+    def answer_tokens(payload: Dict) -> List[str]:
+        limit = (payload.get("options") or {}).get("num_predict") or config.tokens
+        count = max(1, min(config.tokens, int(limit)))
+        return [VOCABULARY[i % len(VOCABULARY)] + " " for i in range(count)]
+
+    async def generate(request: Request, kind: str):
+        payload = await request.json()
+        model = payload.get("model", "fake")
+        stream = payload.get("stream", True)
+        stats["requests"] += 1
+        stats["active"] += 1
+
+        started = time.perf_counter()
+        load_seconds = await load(model, payload.get("keep_alive"))
+        prompt_tokens = _prompt_tokens(payload)
+        prefill = (config.prefill_ms + prompt_tokens * config.prefill_ms_per_token) / 1000
+        await asyncio.sleep(prefill)
+        tokens = answer_tokens(payload)
+
+        def part(text: str) -> Dict:
+            body = {"model": model, "created_at": _now(), "done": False}
+            if kind == "chat":
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            return body
+
+        def final(decode_seconds: float, text: str = "") -> Dict:
+            body = part(text)
+            body.update({
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+                "load_duration": int(load_seconds * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(decode_seconds * 1e9)
+            })
+            return body
+
+        async def events():
+            try:
+                decode_started = time.perf_counter()
+                for token in tokens:
+                    await asyncio.sleep(config.decode_ms / 1000)
+                    yield json.dumps(part(token)) + "\n"
+                yield json.dumps(final(time.perf_counter() - decode_started)) + "\n"
+            finally:
+                stats["active"] -= 1
+
+        if stream:
+            return StreamingResponse(events(), media_type="application/x-ndjson")
+
+        try:
+            await asyncio.sleep(config.decode_ms * len(tokens) / 1000)
+            return JSONResponse(final(config.decode_ms * len(tokens) / 1000, "".join(tokens)))
+        finally:
+            stats["active"] -= 1
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await generate(request, "chat")
+
+    @app.post("/api/generate")
+    async def generate_completion(request: Request):
+        return await generate(request, "generate")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        payload = await request.json()
+        inputs = payload.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        await load(payload.get("model", "fake"), payload.get("keep_alive"))
+        return {
+            "model": payload.get("model", "fake"),
+            "embeddings": [_embedding(text, config.embed_dim) for text in inputs]
+        }
+
+    @app.get("/api/tags")
+    async def tags():
+        names = sorted(set(loaded) | {"llama3.2:latest"})
+        return {"models": [
+            {"name": name, "model": name, "modified_at": _now(), "size": 0, "digest": "", "details": {}}
+            for name in names
+        ]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.monotonic()
+        return {"models": [
+            {
+                "name": name, "model": name, "size": 0, "size_vram": 0, "digest": "",
+                "expires_at": (
+                    datetime.now(timezone.utc) + timedelta(seconds=min(expiry - now, 10 ** 9))
+                ).isoformat()
+            }
+            for name, expiry in loaded.items() if expiry > now
+        ]}
+
+    @app.get("/stats")
+    async def server_stats():
+        """Not part of Ollama: request counters for benchmark reports"""
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    defaults = FakeOllamaConfig()
+    parser.add_argument("--load-ms", type=float, default=defaults.load_ms, help="Cold-start delay per model")
+    parser.add_argument("--prefill-ms", type=float, default=defaults.prefill_ms, help="Fixed delay before the first token")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=defaults.prefill_ms_per_token)
+    parser.add_argument("--decode-ms", type=float, default=defaults.decode_ms, help="Delay per generated token")
+    parser.add_argument("--tokens", type=int, default=defaults.tokens, help="Tokens per answer")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        load_ms=args.load_ms,
+        prefill_ms=args.prefill_ms,
+        prefill_ms_per_token=args.prefill_ms_per_token,
+        decode_ms=args.decode_ms,
+        tokens=args.tokens
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Load generator for the chat API.
+
+Drives /api/chat (plain and SSE streaming), /ws/{session_id} and the history
+route with a fixed number of concurrent workers spread over many sessions,
+then reports throughput, p50/p95/p99 latency, time to first token and
+server RSS per active session.
+
+With --spawn it starts the fake Ollama server (or --ollama-backends of them)
+and the API itself, so it runs fully offline (e.g. in CI); --fail-p95-ms makes it exit non-zero on a
+latency regression.
+
+Usage:
+    python -m benchmarks.load_test --spawn --scenario mixed --concurrency 32 --sessions 128
+    python -m benchmarks.load_test --url http://localhost:8000 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+SCENARIOS = ("chat", "chat_stream", "ws", "history")
+# Share of each scenario in --scenario mixed (out of 10 requests)
+MIXED = ["chat"] * 4 + ["chat_stream"] * 2 + ["ws"] * 3 + ["history"]
+
+
+@dataclass
+class Results:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    ttfts: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, Dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+
+    def error(self, scenario: str, kind: str):
+        self.errors[scenario][kind] += 1
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class _Counted(Exception):
+    """Failure already recorded under a more specific error kind"""
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, message: str):
+        self.base_url = base_url.rstrip("/")
+        self.ws_url = "ws" + self.base_url[len("http"):]
+        self.message = message
+        self.results = Results()
+        self.http = httpx.AsyncClient(base_url=self.base_url, timeout=120)
+        self.sockets: Dict[str, object] = {}
+
+    async def close(self):
+        await self.http.aclose()
+        for websocket in self.sockets.values():
+            await websocket.close()
+
+    async def run(self, scenario: str, session_id: str, number: int):
+        started = time.perf_counter()
+        try:
+            ttft = await getattr(self, f"_{scenario}")(session_id, number)
+        except _Counted:
+            return
+        except Exception as e:
+            self.results.error(scenario, type(e).__name__)
+            return
+        self.results.latencies[scenario].append(time.perf_counter() - started)
+        if ttft is not None:
+            self.results.ttfts[scenario].append(ttft - started)
+
+    def _check(self, scenario: str, response: httpx.Response) -> bool:
+        if response.status_code != 200:
+            self.results.error(scenario, f"HTTP {response.status_code}")
+            return False
+        return True
+
+    async def _chat(self, session_id: str, number: int):
+        response = await self.http.post("/api/chat", json={
+            "message": f"{self.message} ({number})", "session_id": session_id
+        })
+        if not self._check("chat", response):
+            raise _Counted()
+        return None
+
+    async def _chat_stream(self, session_id: str, number: int):
+        first = None
+        async with self.http.stream("POST", "/api/chat", json={
+            "message": f"{self.message} ({number})", "session_id": session_id, "stream": True
+        }) as response:
+            if not self._check("chat_stream", response):
+                raise _Counted()
+            async for line in response.aiter_lines():
+                if first is None and line == "event: delta":
+                    first = time.perf_counter()
+                elif line == "event: error":
+                    self.results.error("chat_stream", "stream error")
+                    raise _Counted()
+        return first
+
+    async def _ws(self, session_id: str, number: int):
+        websocket = self.sockets.get(session_id)
+        if websocket is None:
+            websocket = self.sockets[session_id] = await websockets.connect(f"{self.ws_url}/ws/{session_id}")
+        await websocket.send(json.dumps({"message": f"{self.message} ({number})", "stream": True}))
+        first = None
+        while True:
+            frame = json.loads(await websocket.recv())
+            if frame["type"] == "delta":
+                first = first or time.perf_counter()
+            elif frame["type"] == "final":
+                return first
+            else:
+                self.results.error("ws", "error frame")
+                raise _Counted()
+
+    async def _history(self, session_id: str, number: int):
+        response = await self.http.get(f"/api/history/{session_id}", params={"limit": 50})
+        if not self._check("history", response):
+            raise _Counted()
+        return None
+
+
+async def run_load(args) -> Dict:
+    generator = LoadGenerator(args.url, args.message)
+    scenarios = MIXED if args.scenario == "mixed" else [args.scenario]
+    rss_before = read_rss(args.server_pid) if args.server_pid else None
+
+    async def worker(worker_id: int):
+        # Each worker owns a disjoint set of sessions, so a session never has
+        # two requests in flight (as with a real client)
+        sessions = [f"load-{i}" for i in range(worker_id, args.sessions, args.concurrency)] or [f"load-{worker_id}"]
+        for turn, number in enumerate(range(worker_id, args.requests, args.concurrency)):
+            scenario = scenarios[number % len(scenarios)]
+            await generator.run(scenario, sessions[turn % len(sessions)], number)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    health = (await generator.http.get("/api/health")).json()
+    rss_after = read_rss(args.server_pid) if args.server_pid else None
+    await generator.close()
+
+    results = generator.results
+    report = {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "sessions": args.sessions,
+        "requests": args.requests,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": sum(len(v) for v in results.latencies.values()) / elapsed,
+        "routes": {},
+        "active_sessions": health.get("active_sessions")
+    }
+    for scenario in SCENARIOS:
+        latencies = results.latencies.get(scenario, [])
+        errors = dict(results.errors.get(scenario, {}))
+        if not latencies and not errors:
+            continue
+        route = {"ok": len(latencies), "errors": errors}
+        for name, values in (("latency_ms", latencies), ("ttft_ms", results.ttfts.get(scenario, []))):
+            if values:
+                route[name] = {
+                    f"p{int(q * 100)}": percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)
+                }
+        report["routes"][scenario] = route
+
+    if rss_after is not None:
+        report["server_rss_bytes"] = rss_after
+        active = health.get("active_sessions") or 0
+        if active and rss_before is not None:
+            report["rss_per_session_bytes"] = (rss_after - rss_before) / active
+    return report
+
+
+def print_report(report: Dict):
+    print(f"{report['requests']} requests, concurrency {report['concurrency']}, "
+          f"{report['sessions']} sessions: {report['throughput_rps']:.1f} req/s "
+          f"in {report['elapsed_seconds']:.1f}s")
+    print(f"{'route':<12} {'ok':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'ttft p50':>9} {'ttft p95':>9} {'ttft p99':>9}")
+    for scenario, route in report["routes"].items():
+        latency = route.get("latency_ms", {})
+        ttft = route.get("ttft_ms", {})
+        cells = [latency.get(p) for p in ("p50", "p95", "p99")] + [ttft.get(p) for p in ("p50", "p95", "p99")]
+        print(f"{scenario:<12} {route['ok']:>6} {sum(route['errors'].values()):>5} " +
+              " ".join(f"{c:>9.1f}" if c is not None else f"{'-':>9}" for c in cells))
+        for kind, count in route["errors"].items():
+            print(f"{'':<12} {kind}: {count}")
+    if "server_rss_bytes" in report:
+        print(f"server RSS: {report['server_rss_bytes'] / 2 ** 20:.1f} MiB"
+              f" for {report['active_sessions']} active sessions")
+    if "rss_per_session_bytes" in report:
+        print(f"RSS per active session: {report['rss_per_session_bytes'] / 1024:.1f} KiB")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def spawn_servers(args) -> List[subprocess.Popen]:
+    """Start the fake Ollama server(s) and the API; point args at them"""
+    ollama_ports = [_free_port() for _ in range(args.ollama_backends)]
+    api_port = _free_port()
+    fakes = [
+        subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(port),
+            "--prefill-ms", str(args.prefill_ms), "--decode-ms", str(args.decode_ms), "--tokens", str(args.tokens)
+        ])
+        for port in ollama_ports
+    ]
+    env = {
+        **os.environ,
+        "OLLAMA_BASE_URL": ",".join(f"http://127.0.0.1:{port}" for port in ollama_ports),
+        # The limiter would throttle a single-IP load generator
+        "RATE_LIMIT_ENABLED": "false",
+        "MAX_ACTIVE_SESSIONS": str(max(args.sessions, 100))
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"],
+        env=env
+    )
+    for port in ollama_ports:
+        _wait_ready(f"http://127.0.0.1:{port}/api/tags")
+    _wait_ready(f"http://127.0.0.1:{api_port}/api/health")
+    args.url = f"http://127.0.0.1:{api_port}"
+    args.server_pid = api.pid
+    return [api, *fakes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat API load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    parser.add_argument("--spawn", action="store_true", help="Start the fake Ollama server and the API locally")
+    parser.add_argument("--scenario", default="mixed", choices=SCENARIOS + ("mixed",))
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--sessions", type=int, default=64, help="Distinct sessions")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests")
+    parser.add_argument("--message", default="Tell me something about distributed systems")
+    parser.add_argument("--server-pid", type=int, help="API process id, for RSS reporting")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--fail-p95-ms", type=float, help="Exit 1 if any route's p95 latency exceeds this")
+    parser.add_argument("--prefill-ms", type=float, default=20, help="Fake Ollama prefill delay (--spawn)")
+    parser.add_argument("--decode-ms", type=float, default=2, help="Fake Ollama per-token delay (--spawn)")
+    parser.add_argument("--tokens", type=int, default=32, help="Fake Ollama tokens per answer (--spawn)")
+    parser.add_argument("--ollama-backends", type=int, default=1, help="Fake Ollama servers to balance over (--spawn)")
+    args = parser.parse_args()
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.fail_p95_ms is not None:
+        slow = [
+            name for name, route in report["routes"].items()
+            if route.get("latency_ms", {}).get("p95", 0) > args.fail_p95_ms
+        ]
+        if slow:
+            print(f"p95 latency above {args.fail_p95_ms} ms: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,90 @@
-from langchain_ollama import ChatOllama
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableWithMessageHistory
-from langchain_core.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from datetime import datetime
 import asyncio
-from typing import Dict, List, Optional
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from cache import request_key, response_cache
+from config import settings
+from context import MESSAGE_OVERHEAD_TOKENS, ContextWindow, approx_tokens
+from llm import generation_options, llm_registry
+from message_log import TIMESTAMP_KEY, JournaledMessageLog, MessageLog, message_record
+from metrics import GENERATION_ERRORS, PROMPT_TOKENS, TIME_TO_FIRST_TOKEN, TOKENS_PER_SECOND
+from profiling import PhaseTimer
+from scheduler import OverloadedError, scheduler
+from semantic_cache import semantic_cache
+from singleflight import singleflight
+from warmup import model_warmer
+
+SYSTEM_PROMPT = "You are a helpful, intelligent AI assistant. You have memory of the conversation and can reference previous messages."
+SYSTEM_PROMPT_TOKENS = approx_tokens(SYSTEM_PROMPT)
+
+# Prompt with history placeholder, shared by every session
+CHAT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="history"),
+    ("human", "{input}")
+])
+
+# Prompt used to fold older turns into the rolling summary
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a concise running summary of a conversation between a user and an AI assistant. Keep facts, names, preferences and open questions. Reply with the updated summary only."),
+    ("human", "Current summary:\n{summary}\n\nNew conversation lines:\n{lines}\n\nUpdated summary:")
+])
+
+logger = logging.getLogger(__name__)
+
+# Approximate resident size of a session, and of each message object in
+# histories other than MessageLog (which measures itself), used for memory
+# estimates (content size is added separately)
+SESSION_OVERHEAD_BYTES = 1024
+MESSAGE_OVERHEAD_BYTES = 700
 
 class ChatBot:
     """
     Advanced chatbot with memory, context awareness, and multiple features
     """
     
-    def __init__(self, session_id: str, model_name: str = "llama3.2:latest"):
+    def __init__(
+        self,
+        session_id: str,
+        model_name: Optional[str] = None,
+        memory_mode: Optional[str] = None,
+        ephemeral: bool = False
+    ):
         self.session_id = session_id
+        # Ephemeral bots (stateless batch items) never touch the shared store
+        self.ephemeral = ephemeral
         self.created_at = datetime.now().isoformat()
         
-        # Initialize Ollama LLM
-        self.llm = ChatOllama(
-            model=model_name,
-            temperature=0.7,
-            callbacks=[StreamingStdOutCallbackHandler()]
-        )
-        
-        # Create prompt with history placeholder
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful, intelligent AI assistant. You have memory of the conversation and can reference previous messages."),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{input}")
-        ])
-        
-        # Create the base chain (prompt + LLM)
-        self.chain = self.prompt | self.llm
+        # Model settings; the LLM client itself is shared through the registry.
+        # A turn can also run on another model (see ModelRouter in router.py)
+        self.model_name = model_name or settings.DEFAULT_MODEL
+        self.temperature = 0.7
         
         # Initialize message history store
         self.store = {}
+        self.content_chars = 0
         
-        # Create the conversational chain with message history
-        self.conversational_chain = RunnableWithMessageHistory(
-            self.chain,
-            self.get_session_history,
-            input_messages_key="input",
-            history_messages_key="history",
+        # Token-budgeted view of the history used to build prompts
+        self.context_window = ContextWindow(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            max_messages=settings.MAX_MEMORY_MESSAGES
         )
         
+        # Rolling summary of the first summarized_count messages ("summary" mode)
+        self.memory_mode = memory_mode or settings.MEMORY_MODE
+        self.summary = ""
+        self.summarized_count = 0
+        self._summary_task: Optional[asyncio.Task] = None
+        # Messages the store trimmed from the head, and history replacements,
+        # so a summary finished in the background lines up with the history
+        self._dropped_total = 0
+        self._history_epoch = 0
+        
         # User context and preferences
         self.user_context = {}
         self.conversation_topics = []
@@ -52,64 +92,417 @@ class ChatBot:
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
         """Get or create chat message history for a session"""
         if session_id not in self.store:
-            self.store[session_id] = ChatMessageHistory()
+            if settings.USE_REDIS and not self.ephemeral:
+                # Optional backend; only imported when enabled
+                from redis_history import RedisChatMessageHistory, get_redis
+                self.store[session_id] = RedisChatMessageHistory(
+                    session_id,
+                    get_redis(),
+                    ttl=settings.SESSION_TIMEOUT,
+                    max_messages=settings.REDIS_HISTORY_MAX_MESSAGES
+                )
+            elif settings.JOURNAL_PATH and not self.ephemeral:
+                # Local durable history; stored turns are read back (in a
+                # thread) by the first async access
+                from journal import get_journal
+                self.store[session_id] = JournaledMessageLog(session_id, get_journal())
+            else:
+                self.store[session_id] = MessageLog()
         return self.store[session_id]
     
+    def _build_context(
+        self,
+        message: str,
+        history: BaseChatMessageHistory,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        model_name: str
+    ) -> Tuple[List[BaseMessage], Dict, int]:
+        """
+        Assemble the prompt for the next turn, its generation options and its
+        estimated size in tokens.
+        
+        The system prompt and the new message are always kept; history is
+        trimmed from the oldest end to fit CONTEXT_TOKEN_BUDGET, and the
+        generation length is capped so prompt + answer fit the model context.
+        """
+        self._sync_history(history)
+        
+        reserved_tokens = SYSTEM_PROMPT_TOKENS + approx_tokens(message)
+        if self.summary:
+            summary_message = SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")
+            reserved_tokens += approx_tokens(summary_message.content)
+        
+        recent, history_tokens = self.context_window.select(
+            history.messages, reserved_tokens, min_start=self.summarized_count
+        )
+        prompt_tokens = reserved_tokens + history_tokens
+        
+        if self.summary:
+            recent.insert(0, summary_message)
+        
+        num_predict = min(
+            max_tokens or settings.MAX_GENERATION_TOKENS,
+            settings.MAX_GENERATION_TOKENS,
+            max(settings.MODEL_CONTEXT_TOKENS - prompt_tokens, 1)
+        )
+        
+        messages = CHAT_PROMPT.format_messages(input=message, history=recent)
+        options = generation_options(
+            temperature=self.temperature if temperature is None else temperature,
+            max_tokens=num_predict
+        )
+        PROMPT_TOKENS.labels(model_name).observe(prompt_tokens)
+        return messages, options, prompt_tokens
+    
+    async def _lookup_cache(
+        self,
+        message: str,
+        messages: List[BaseMessage],
+        history: BaseChatMessageHistory,
+        key: str,
+        options: Dict,
+        model_name: str
+    ) -> Tuple[Optional[str], Optional[str], Dict]:
+        """
+        Look for a cached answer: exact match first, then (for the opening
+        message of a session) semantic similarity among answers generated
+        with the same model, system prompt and options.
+        
+        Returns (answer, cache kind, handle for _store_cache).
+        """
+        handle = {
+            "key": key if response_cache.accepts(options) else None,
+            "vector": None,
+            "namespace": request_key(model_name, messages[:-1], options)
+        }
+        
+        if handle["key"]:
+            answer = await response_cache.get(handle["key"])
+            if answer is not None:
+                return answer, "exact", handle
+        
+        if semantic_cache.enabled and not history.messages:
+            answer, handle["vector"] = await semantic_cache.lookup(handle["namespace"], message)
+            if answer is not None:
+                return answer, "semantic", handle
+        
+        return None, None, handle
+    
+    async def _store_cache(self, handle: Dict, response_text: str):
+        """
+        Remember a freshly generated answer in the caches that missed
+        """
+        if handle["key"]:
+            await response_cache.set(handle["key"], response_text)
+        if handle["vector"] is not None:
+            semantic_cache.add(handle["namespace"], handle["vector"], response_text)
+    
+    def _generate(
+        self,
+        key: str,
+        messages: List[BaseMessage],
+        options: Dict,
+        stream: bool,
+        model_name: str,
+        server_timings: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Model output as text chunks. Concurrent requests with the same key
+        share one upstream generation and all receive the same chunks.
+        
+        Ollama's own timings for the generation are copied into
+        server_timings (only for the request that ran it).
+        """
+        llm = llm_registry.get(model_name)
+        if server_timings is None:
+            server_timings = {}
+        
+        async def produce():
+            if stream:
+                async for chunk in llm.astream(messages, **options):
+                    text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    if text:
+                        yield text
+                    if getattr(chunk, 'response_metadata', None):
+                        server_timings.update(chunk.response_metadata)
+            else:
+                response = await llm.ainvoke(messages, **options)
+                server_timings.update(getattr(response, 'response_metadata', None) or {})
+                yield response.content if hasattr(response, 'content') else str(response)
+        
+        if not settings.COALESCE_REQUESTS:
+            return produce()
+        return singleflight.stream(key, produce)
+    
+    async def _commit_turn(
+        self,
+        history: BaseChatMessageHistory,
+        message: str,
+        response_text: str,
+        received_at: float
+    ):
+        """
+        Append a completed turn to memory (stamped with when the message was
+        received and when the answer completed) and update context
+        """
+        await history.aadd_messages([
+            HumanMessage(content=message, additional_kwargs={TIMESTAMP_KEY: received_at}),
+            AIMessage(content=response_text, additional_kwargs={TIMESTAMP_KEY: time.time()})
+        ])
+        self.content_chars += len(message) + len(response_text)
+        self._update_context(message, response_text)
+        self._maybe_schedule_summary(history)
+    
+    def _sync_history(self, history: BaseChatMessageHistory):
+        """
+        Catch up with the stored history. The summary covers the first
+        summarized_count messages: messages the store trimmed from the head
+        (capped list, compaction) are older than that and already summarized,
+        so the count shifts down; a cleared or replaced history drops it.
+        """
+        dropped = self.context_window.sync(history.messages)
+        if dropped is None or self.summarized_count - (dropped or 0) > len(history.messages):
+            self._reset_summary()
+        elif dropped:
+            self._dropped_total += dropped
+            self.summarized_count = max(self.summarized_count - dropped, 0)
+    
+    def _maybe_schedule_summary(self, history: BaseChatMessageHistory):
+        """
+        Start a background summary update once enough turns are unsummarized
+        """
+        if self.memory_mode != "summary":
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        
+        unsummarized = len(history.messages) - self.summarized_count
+        if unsummarized - settings.SUMMARY_KEEP_RECENT < settings.SUMMARY_TRIGGER_MESSAGES:
+            return
+        
+        self._summary_task = asyncio.get_running_loop().create_task(self._refresh_summary(history))
+    
+    async def _refresh_summary(self, history: BaseChatMessageHistory):
+        """
+        Fold everything but the newest SUMMARY_KEEP_RECENT messages into the summary
+        """
+        self._sync_history(history)
+        messages = history.messages
+        epoch, dropped_total = self._history_epoch, self._dropped_total
+        upto = len(messages) - settings.SUMMARY_KEEP_RECENT
+        lines = "\n".join(
+            f"{'User' if msg.type == 'human' else 'Assistant'}: {msg.content}"
+            for msg in messages[self.summarized_count:upto]
+        )
+        model_name = settings.SUMMARY_MODEL or self.model_name
+        
+        try:
+            # A generation like any other, so it counts against the slot
+            # limit; its own queue key keeps the session's next turn from
+            # waiting behind it
+            async with scheduler.slot(f"{self.session_id}:summary", model_name, traffic_class="batch"):
+                result = await llm_registry.get(model_name).ainvoke(
+                    SUMMARY_PROMPT.format_messages(summary=self.summary or "(empty)", lines=lines),
+                    **generation_options(temperature=0.0, max_tokens=settings.SUMMARY_MAX_TOKENS)
+                )
+        except OverloadedError:
+            # Busy: the next turn retries
+            logger.info("Summary update for session %s skipped, server busy", self.session_id)
+            return
+        except Exception:
+            # Keep serving with the previous summary; the next turn retries
+            logger.exception("Summary update failed for session %s", self.session_id)
+            return
+        
+        self._sync_history(history)
+        if self._history_epoch != epoch:
+            # Cleared or replaced meanwhile; the lines no longer match
+            return
+        self.summary = result.content.strip()
+        # Messages trimmed meanwhile were among the summarized ones
+        self.summarized_count = max(upto - (self._dropped_total - dropped_total), 0)
+    
+    def _reset_summary(self):
+        self.summary = ""
+        self.summarized_count = 0
+        self._history_epoch += 1
+    
     async def get_response(
         self, 
         message: str, 
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        debug: bool = False,
+        timer: Optional[PhaseTimer] = None,
+        model_name: Optional[str] = None
     ) -> Dict:
         """
-        Get response from the chatbot with memory
+        Get response from the chatbot with memory.
+        
+        With debug, metadata["timings"] breaks the turn down by phase (in ms);
+        pass the route's timer to include time spent before the call.
+        model_name runs this turn on another model than the session's.
         """
+        model_name = model_name or self.model_name
+        timer = timer or PhaseTimer()
+        received_at = time.time()
         try:
-            # Update temperature if provided
-            if temperature is not None:
-                # Create a new LLM instance with updated temperature
-                self.llm = ChatOllama(
-                    model=self.llm.model,
-                    temperature=temperature,
-                    callbacks=[StreamingStdOutCallbackHandler()]
-                )
-                # Recreate the chain with updated LLM
-                self.chain = self.prompt | self.llm
-                self.conversational_chain = RunnableWithMessageHistory(
-                    self.chain,
-                    self.get_session_history,
-                    input_messages_key="input",
-                    history_messages_key="history",
-                )
+            history = self.get_session_history(self.session_id)
+            await history.aget_messages()
+            timer.mark("history_load")
+            messages, options, _ = self._build_context(message, history, temperature, max_tokens, model_name)
+            key = request_key(model_name, messages, options)
+            timer.mark("prompt_build")
             
-            # Get response using the new pattern
-            response = await asyncio.to_thread(
-                self.conversational_chain.invoke,
-                {"input": message},
-                config={"configurable": {"session_id": self.session_id}}
-            )
+            # Serve repeated questions from the response caches
+            response_text, cached, cache_handle = await self._lookup_cache(message, messages, history, key, options, model_name)
+            timer.mark("cache_lookup")
             
-            # Extract the response content
-            response_text = response.content if hasattr(response, 'content') else str(response)
+            if not cached:
+                started = time.perf_counter()
+                server_timings = {}
+                response_text = "".join([
+                    text async for text in self._generate(key, messages, options, False, model_name, server_timings)
+                ])
+                timer.mark("generation")
+                timer.add_server_timings(server_timings, time.perf_counter() - started)
+                self._observe_generation(model_name, response_text, started, server_timings)
+                await self._store_cache(cache_handle, response_text)
             
-            # Update context
-            self._update_context(message, response_text)
+            # Commit the turn and update context (cached answers too, so the
+            # conversation stays coherent)
+            await self._commit_turn(history, message, response_text, received_at)
+            timer.mark("history_commit")
             
+            metadata = self._response_metadata(model_name)
+            if cached:
+                metadata["cached"] = cached
+            if debug:
+                metadata["timings"] = timer.as_metadata()
             return {
                 "response": response_text,
-                "metadata": {
-                    "session_id": self.session_id,
-                    "message_count": len(self.get_session_history(self.session_id).messages),
-                    "topics": self.conversation_topics[-5:] if self.conversation_topics else []
-                }
+                "metadata": metadata
             }
         
         except Exception as e:
+            self._record_error(e, model_name)
             return {
                 "response": f"Error: {str(e)}",
                 "metadata": {"error": True}
             }
     
+    async def stream_response(
+        self, 
+        message: str, 
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        debug: bool = False,
+        timer: Optional[PhaseTimer] = None,
+        model_name: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream the response token by token.
+        
+        Yields "delta" frames with increasing sequence numbers as chunks arrive
+        from the model, followed by one "final" frame carrying the full text and
+        metadata. History is only updated once the stream has completed.
+        With debug, the final metadata includes per-phase timings.
+        """
+        model_name = model_name or self.model_name
+        seq = 0
+        started = time.perf_counter()
+        timer = timer or PhaseTimer()
+        received_at = time.time()
+        try:
+            history = self.get_session_history(self.session_id)
+            await history.aget_messages()
+            timer.mark("history_load")
+            messages, options, _ = self._build_context(message, history, temperature, max_tokens, model_name)
+            key = request_key(model_name, messages, options)
+            timer.mark("prompt_build")
+            
+            response_text, cached, cache_handle = await self._lookup_cache(message, messages, history, key, options, model_name)
+            timer.mark("cache_lookup")
+            
+            if cached:
+                # A cached answer is sent as a single delta
+                TIME_TO_FIRST_TOKEN.labels(model_name).observe(time.perf_counter() - started)
+                yield {"type": "delta", "seq": seq, "delta": response_text}
+                seq += 1
+            else:
+                chunks = []
+                server_timings = {}
+                generation_started = time.perf_counter()
+                
+                # Time spent sending deltas to the client counts as decode
+                async for text in self._generate(key, messages, options, True, model_name, server_timings):
+                    if not chunks:
+                        TIME_TO_FIRST_TOKEN.labels(model_name).observe(time.perf_counter() - started)
+                        timer.mark("first_token")
+                    chunks.append(text)
+                    yield {"type": "delta", "seq": seq, "delta": text}
+                    seq += 1
+                
+                timer.mark("decode")
+                timer.add_server_timings(server_timings, time.perf_counter() - generation_started)
+                response_text = "".join(chunks)
+                self._observe_generation(model_name, response_text, generation_started, server_timings)
+                await self._store_cache(cache_handle, response_text)
+            
+            # Commit the completed turn to memory
+            await self._commit_turn(history, message, response_text, received_at)
+            timer.mark("history_commit")
+            
+            metadata = self._response_metadata(model_name)
+            metadata["chunks"] = seq
+            if cached:
+                metadata["cached"] = cached
+            if debug:
+                metadata["timings"] = timer.as_metadata()
+            yield {
+                "type": "final",
+                "seq": seq,
+                "response": response_text,
+                "metadata": metadata
+            }
+        
+        except Exception as e:
+            self._record_error(e, model_name)
+            yield {
+                "type": "error",
+                "seq": seq,
+                "error": str(e),
+                "metadata": {"error": True}
+            }
+    
+    def _observe_generation(self, model_name: str, response_text: str, started: float, server_timings: Dict):
+        """Record output speed (and any cold start) for a completed generation"""
+        model_warmer.observe(model_name, server_timings)
+        elapsed = time.perf_counter() - started
+        if elapsed > 0:
+            output_tokens = approx_tokens(response_text) - MESSAGE_OVERHEAD_TOKENS
+            TOKENS_PER_SECOND.labels(model_name).observe(output_tokens / elapsed)
+    
+    def _record_error(self, error: Exception, model_name: str):
+        """Count and log a failed turn (the client only sees the message)"""
+        GENERATION_ERRORS.labels(model_name, type(error).__name__).inc()
+        logger.error("Chat turn failed for session %s: %s", self.session_id, error, exc_info=error)
+    
+    def _response_metadata(self, model_name: str) -> Dict:
+        """
+        Metadata attached to every completed response
+        """
+        metadata = {
+            "session_id": self.session_id,
+            "model": model_name,
+            "message_count": self.message_count(),
+            "topics": self.conversation_topics[-5:] if self.conversation_topics else []
+        }
+        if self.memory_mode == "summary":
+            metadata["summarized_messages"] = self.summarized_count
+        return metadata
+    
     def _update_context(self, user_message: str, bot_response: str):
         """
         Update conversation context and extract topics
@@ -119,31 +512,43 @@ class ChatBot:
         potential_topics = [w for w in words if len(w) > 5]
         self.conversation_topics.extend(potential_topics[:2])
     
-    def get_history(self, limit: Optional[int] = None) -> List[Dict]:
+    async def get_history(self, limit: Optional[int] = None, before: Optional[int] = None) -> List[Dict]:
         """
-        Get conversation history
+        Get conversation history: the last limit messages before index
+        before (default: the newest messages)
         """
-        messages = self.get_session_history(self.session_id).messages
-        history = []
+        history = self.get_session_history(self.session_id)
+        if isinstance(history, MessageLog):
+            await history.aget_messages()
+            return history.tail(limit, before)
         
-        for msg in messages:
-            role = "user" if msg.type == "human" else "assistant"
-            history.append({
-                "role": role,
-                "content": msg.content,
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        if limit:
-            return history[-limit:]
-        return history
+        messages = await history.aget_messages()
+        end = len(messages) if before is None else min(before, len(messages))
+        start = max(end - limit, 0) if limit else 0
+        return [message_record(msg) for msg in messages[start:end]]
     
-    def clear_history(self):
+    async def load_history(self):
+        """
+        Read this session's stored history, if it hasn't been read yet
+        """
+        await self.get_session_history(self.session_id).aget_messages()
+    
+    def message_count(self) -> int:
+        """
+        Number of messages in this session's history (as read so far)
+        """
+        return len(self.get_session_history(self.session_id).messages)
+    
+    async def clear_history(self):
         """
         Clear conversation memory
         """
         # Clear the specific session's history
-        self.get_session_history(self.session_id).clear()
+        self.close()
+        await self.get_session_history(self.session_id).aclear()
+        self.context_window.reset()
+        self._reset_summary()
+        self.content_chars = 0
         self.conversation_topics = []
         self.user_context = {}
     
@@ -153,11 +558,11 @@ class ChatBot:
         """
         self.user_context[key] = value
     
-    def get_summary(self) -> str:
+    async def get_summary(self) -> str:
         """
         Get a summary of the conversation
         """
-        history = self.get_history()
+        history = await self.get_history()
         if not history:
             return "No conversation history yet."
         
@@ -167,18 +572,22 @@ class ChatBot:
         """
         Switch to a different Ollama model
         """
-        # Create new LLM instance with the new model
-        self.llm = ChatOllama(
-            model=model_name,
-            temperature=self.llm.temperature,
-            callbacks=[StreamingStdOutCallbackHandler()]
-        )
-        
-        # Recreate the chain with new LLM
-        self.chain = self.prompt | self.llm
-        self.conversational_chain = RunnableWithMessageHistory(
-            self.chain,
-            self.get_session_history,
-            input_messages_key="input",
-            history_messages_key="history",
-        )
\ No newline at end of file
+        # Clients are shared per model, so switching is just a lookup
+        self.model_name = model_name
+    
+    def estimated_memory_bytes(self) -> int:
+        """
+        Rough resident size of this session and its history
+        """
+        history = self.get_session_history(self.session_id)
+        if isinstance(history, MessageLog):
+            return SESSION_OVERHEAD_BYTES + history.memory_bytes()
+        return SESSION_OVERHEAD_BYTES + len(history.messages) * MESSAGE_OVERHEAD_BYTES + self.content_chars
+    
+    def close(self):
+        """
+        Stop background work when the session is evicted or deleted
+        """
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
\ No newline at end of file
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from config import settings
+
+
+def request_key(model_name: str, messages: Sequence, options: Dict) -> str:
+    """
+    Hash identifying a generation request: the model, the full assembled
+    prompt (system prompt, summary, trimmed history and new message) and the
+    generation options
+    """
+    digest = hashlib.sha256(model_name.encode())
+    for message in messages:
+        digest.update(b"\x1e" + message.type.encode() + b"\x1f" + str(message.content).encode())
+    digest.update(b"\x1d" + json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class InMemoryCacheBackend:
+    """
+    LRU cache with a per-entry TTL, local to the process
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self._entries[key] = (value, self.clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by all workers; size is bounded by TTL and Redis eviction
+    """
+
+    def __init__(self, client, ttl: int, key_prefix: str = "chatbot:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.key_prefix + key)
+
+    async def set(self, key: str, value: str):
+        await self.client.set(self.key_prefix + key, value, ex=self.ttl)
+
+
+class ResponseCache:
+    """
+    Exact-match cache of model answers for deterministic requests, keyed by
+    request_key() so any change in context is a different entry
+    """
+
+    def __init__(self, backend=None, max_temperature: float = 0.0):
+        self.backend = backend
+        self.max_temperature = max_temperature
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def accepts(self, options: Dict) -> bool:
+        """
+        Whether a request may be cached (cache enabled and sampling
+        temperature at or below max_temperature)
+        """
+        if not self.enabled:
+            return False
+        if options.get("options", {}).get("temperature", 0.0) > self.max_temperature:
+            self.bypassed += 1
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        await self.backend.set(key, value)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the process-wide response cache from settings"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return ResponseCache()
+
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        from redis_history import get_redis
+        backend = RedisCacheBackend(get_redis(), ttl=settings.RESPONSE_CACHE_TTL)
+    else:
+        backend = InMemoryCacheBackend(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=settings.RESPONSE_CACHE_TTL
+        )
+    return ResponseCache(backend, max_temperature=settings.RESPONSE_CACHE_MAX_TEMPERATURE)
+
+
+response_cache = create_response_cache()
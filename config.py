@@ -3,6 +3,20 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def parse_keep_alive(value: str) -> dict:
+    """
+    MODEL_KEEP_ALIVE entries ("model=duration", comma-separated); a bare
+    duration (no "=") is the default for every model, like "*=duration"
+    """
+    keep_alive = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model_name, sep, duration = item.rpartition("=")
+        keep_alive[model_name.strip() if sep else "*"] = duration.strip()
+    return keep_alive
+
 class Settings:
     """Application settings and configuration"""
     
@@ -11,10 +25,29 @@ class Settings:
     API_VERSION = "1.0.0"
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
     API_PORT = int(os.getenv("API_PORT", 8000))
+    API_WORKERS = int(os.getenv("API_WORKERS", 1))  # >1 requires USE_REDIS so workers share sessions
+    API_RELOAD = os.getenv("API_RELOAD", "false").lower() == "true"
     
     # Ollama Settings
-    OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # One or more Ollama servers (comma-separated); requests are balanced over them
+    OLLAMA_BASE_URLS = [url.strip() for url in os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").split(",") if url.strip()]
+    OLLAMA_BASE_URL = OLLAMA_BASE_URLS[0]
+    OLLAMA_BALANCE = os.getenv("OLLAMA_BALANCE", "least_outstanding")  # or "ewma" (latency x requests in flight)
+    OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", 10))  # seconds; 0 disables active checks
+    OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", 30))  # after a failed connection or check
+    # Requests go to backends that have the model loaded until each of them has
+    # this many in flight (match OLLAMA_NUM_PARALLEL; 0 = never load it elsewhere)
+    OLLAMA_SPILLOVER_OUTSTANDING = int(os.getenv("OLLAMA_SPILLOVER_OUTSTANDING", 4))
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "llama2")
+    OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 100))
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", 20))
+    
+    # Model residency: load these models at startup, and how long Ollama keeps
+    # each one loaded after its last request ("model=duration" pairs, "*" for
+    # every other model; seconds or Go durations like "30m", -1 = forever)
+    WARMUP_MODELS = [name for name in os.getenv("WARMUP_MODELS", "").split(",") if name]
+    WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 120))  # seconds per model
+    MODEL_KEEP_ALIVE = parse_keep_alive(os.getenv("MODEL_KEEP_ALIVE", ""))  # "10m" alone applies to all models
     
     # Available models
     AVAILABLE_MODELS = [
@@ -26,25 +59,104 @@ class Settings:
         "orca-mini"
     ]
     
+    # Model routing for requests with model="auto": smallest adequate model,
+    # falling back to a smaller one while a model's expected queue wait is over the SLO
+    ROUTER_MODELS = [name for name in os.getenv("ROUTER_MODELS", "phi,llama2").split(",") if name]  # smallest first
+    ROUTER_CODE_MODEL = os.getenv("ROUTER_CODE_MODEL", "codellama")  # empty: code goes to the largest model
+    ROUTER_WAIT_SLO = float(os.getenv("ROUTER_WAIT_SLO", 2.0))  # seconds of queue wait
+    ROUTER_LONG_MESSAGE_CHARS = int(os.getenv("ROUTER_LONG_MESSAGE_CHARS", 600))
+    ROUTER_DEEP_CONVERSATION = int(os.getenv("ROUTER_DEEP_CONVERSATION", 12))  # history messages
+    
     # Memory Settings
     MAX_MEMORY_MESSAGES = int(os.getenv("MAX_MEMORY_MESSAGES", 100))
     
-    # Rate Limiting
+    # Context Window Settings (approximate tokens)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2048))  # system prompt + history + input
+    MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", 4096))  # prompt + generation
+    MAX_GENERATION_TOKENS = int(os.getenv("MAX_GENERATION_TOKENS", 2048))
+    
+    # Rolling Summary Memory ("window" keeps recent turns only, "summary" also
+    # folds older turns into a running summary in the background)
+    MEMORY_MODE = os.getenv("MEMORY_MODE", "window")
+    SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", 20))  # unsummarized messages before folding
+    SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", 6))  # newest messages always sent verbatim
+    SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 256))
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", None)  # defaults to the session model
+    
+    # Response Cache (exact match; only requests at or below the max
+    # temperature are cached, so sampled answers stay varied)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # "memory" or "redis"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 3600))  # seconds
+    RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", 0.0))
+    
+    # Semantic Cache (session-opening messages matched by embedding similarity)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_EMBED_MODEL = os.getenv("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text")
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))  # cosine similarity
+    SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", 5000))  # entries per model
+    SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", None)  # directory to persist the index
+    
+    # Identical concurrent requests share one generation
+    COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+    
+    # Admission control (size SCHEDULER_MAX_CONCURRENCY to Ollama's OLLAMA_NUM_PARALLEL)
+    SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", 4))
+    SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", 64))  # waiting requests before 503
+    # Slots one model may hold (its OLLAMA_NUM_PARALLEL when several models are
+    # loaded; 0 = any model may use them all). Lets model="auto" route around a busy model
+    SCHEDULER_MODEL_CONCURRENCY = int(os.getenv("SCHEDULER_MODEL_CONCURRENCY", 0))
+    # Traffic classes in priority order and their weighted share of free slots
+    SCHEDULER_CLASS_WEIGHTS = {
+        name: int(weight)
+        for name, weight in (
+            item.split("=") for item in os.getenv("SCHEDULER_CLASS_WEIGHTS", "ws=8,api=4,batch=1").split(",")
+        )
+    }
+    
+    # Batch chat (/api/chat/batch): items generating at once per batch, and batch size
+    BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", 4))
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+    
+    # Rate Limiting (token bucket: RATE_LIMIT_REQUESTS per RATE_LIMIT_PERIOD, bursts up to the limit)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
     RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", 60))
     RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", 60))  # seconds
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "redis" (shared by replicas)
+    RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "ip")  # "ip", "session" or "api_key" (keys listed in API_KEYS)
+    RATE_LIMIT_BATCH_ITEMS = int(os.getenv("RATE_LIMIT_BATCH_ITEMS", 1000))  # batch items per RATE_LIMIT_PERIOD
+    # API keys that get their own rate-limit bucket; any other X-API-Key is limited by client IP
+    API_KEYS = frozenset(key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip())
     
     # Session Settings
     SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", 3600))  # 1 hour
     MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", 100))
+    SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 60))  # seconds
+    
+    # Durable local history: an SQLite journal (WAL mode) that survives restarts
+    # without Redis. Writes are group-committed in the background, so a crash
+    # loses at most one commit window. Ignored when USE_REDIS is set.
+    JOURNAL_PATH = os.getenv("JOURNAL_PATH", None)  # database file; unset keeps history in memory only
+    JOURNAL_COMMIT_INTERVAL = float(os.getenv("JOURNAL_COMMIT_INTERVAL", 0.05))  # seconds
+    JOURNAL_MAX_MESSAGES = int(os.getenv("JOURNAL_MAX_MESSAGES", 1000))  # kept (and reloaded) per session
+    JOURNAL_RETENTION = int(os.getenv("JOURNAL_RETENTION", 7 * 24 * 3600))  # seconds since last write; 0 = forever
+    JOURNAL_COMPACT_INTERVAL = int(os.getenv("JOURNAL_COMPACT_INTERVAL", 600))  # seconds
     
     # CORS Settings
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
     
+    # Admin endpoints (disabled unless a token is set; send it as X-Admin-Token)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 60))
+    
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
     # Redis (optional for persistent sessions)
     REDIS_URL = os.getenv("REDIS_URL", None)
     USE_REDIS = os.getenv("USE_REDIS", "false").lower() == "true"
+    REDIS_HISTORY_MAX_MESSAGES = int(os.getenv("REDIS_HISTORY_MAX_MESSAGES", 1000))  # capped list length
+    SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", 30))  # seconds a dead worker can hold a session's turn
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,213 @@
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import ratelimit
+import redis_history
+import session_lock
+from config import settings
+from llm import llm_registry
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with full rate-limit buckets"""
+    for limiter in (ratelimit.rate_limiter, ratelimit.batch_rate_limiter):
+        if limiter is not None:
+            limiter.clear()
+
+
+class FakeOllama(FakeListChatModel):
+    """Fake chat model that streams one character per chunk and records calls"""
+
+    model: str = "fake"
+    calls: List[dict] = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs: Any) -> str:
+        self.calls.append({"messages": messages, **kwargs})
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        self.calls.append({"messages": messages, **kwargs})
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Serve every model from a FakeOllama client instead of a live Ollama"""
+    clients = {}
+
+    def factory(model_name):
+        clients[model_name] = FakeOllama(model=model_name, responses=["Hello there"])
+        return clients[model_name]
+
+    monkeypatch.setattr(llm_registry, "factory", factory)
+    llm_registry.clear()
+    yield clients
+    llm_registry.clear()
+
+
+class FakeRedis:
+    """In-process stand-in for the subset of redis.asyncio used by the app"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+
+    # Commands (applied synchronously; the async wrappers count round trips)
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        if ex is not None:
+            self.ttls[key] = ex
+        if px is not None:
+            self.ttls[key] = px / 1000
+        return True
+
+    def _lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def _rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+        return len(self.data[key])
+
+    def _ltrim(self, key, start, end):
+        items = self.data.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        self.data[key] = items[start:end] if start >= 0 else items[max(len(items) + start, 0):end]
+        return True
+
+    def _expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return key in self.data
+
+    def _incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def _exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def _delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self, f"_{name}")
+
+        async def call(*args, **kwargs):
+            self.round_trips += 1
+            return command(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def sync(self) -> "FakeSyncRedis":
+        """A blocking client on the same data (redis.Redis)"""
+        return FakeSyncRedis(self)
+
+    def register_script(self, source):
+        """Lua scripts run as their Python equivalent from FAKE_SCRIPTS"""
+        command = FAKE_SCRIPTS[source]
+
+        async def script(keys=(), args=()):
+            self.round_trips += 1
+            return command(self, keys, args)
+        return script
+
+
+class FakeSyncRedis:
+    """Blocking view of a FakeRedis"""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, f"_{name}")
+
+        def call(*args, **kwargs):
+            self.redis.round_trips += 1
+            return command(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakeSyncPipeline(self.redis)
+
+
+class FakePipeline:
+    """Queues commands and applies them in one round trip on execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, f"_{name}")
+        return lambda *args, **kwargs: self.commands.append((command, args, kwargs))
+
+    def _apply(self):
+        self.redis.round_trips += 1
+        results = [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+    async def execute(self):
+        return self._apply()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+
+class FakeSyncPipeline(FakePipeline):
+    """Pipeline of a FakeSyncRedis: execute() blocks"""
+
+    def execute(self):
+        return self._apply()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _release_if_held(redis, keys, args):
+    if redis.data.get(keys[0]) != args[0]:
+        return 0
+    del redis.data[keys[0]]
+    return 1
+
+
+def _renew_if_held(redis, keys, args):
+    if redis.data.get(keys[0]) != args[0]:
+        return 0
+    redis.ttls[keys[0]] = int(args[1]) / 1000
+    return 1
+
+
+FAKE_SCRIPTS = {session_lock.RELEASE_LUA: _release_if_held, session_lock.RENEW_LUA: _renew_if_held}
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Enable the Redis backend against an in-process FakeRedis"""
+    client = FakeRedis()
+    monkeypatch.setattr(redis_history, "get_redis", lambda: client)
+    monkeypatch.setattr(redis_history, "get_sync_redis", client.sync)
+    monkeypatch.setattr(settings, "USE_REDIS", True)
+    return client
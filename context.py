@@ -0,0 +1,112 @@
+import operator
+from bisect import bisect_left
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+# Rough cost of the role/formatting tokens wrapped around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def approx_tokens(text: str) -> int:
+    """
+    Fast token estimate (about four characters per token for English text)
+    """
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    Selects the newest history messages that fit a token budget.
+
+    Token counts are cached per message as running prefix sums, so each turn
+    only counts the messages added since the previous turn and finds the cut
+    point with a binary search instead of re-walking the whole history.
+    """
+
+    def __init__(self, token_budget: int, max_messages: Optional[int] = None):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self._prefix: List[int] = [0]
+        self._messages: List[BaseMessage] = []  # the history as of the last sync
+
+    def reset(self):
+        """Forget cached counts, e.g. after the history was cleared"""
+        self._prefix = [0]
+        self._messages = []
+
+    def _dropped(self, messages: Sequence[BaseMessage]) -> Optional[int]:
+        """
+        How many of the known messages were dropped from the head, if
+        messages continue the known history; None if they don't. The same
+        message objects (trimmed in place) are matched first, then equal
+        ones (the history was re-read from the store).
+        """
+        known = self._messages
+        if not messages:
+            return None
+        for same in (operator.is_, operator.eq):
+            for offset in range(len(known)):
+                overlap = len(known) - offset
+                if (
+                    len(messages) >= overlap
+                    and same(known[offset], messages[0])
+                    and same(known[-1], messages[overlap - 1])
+                ):
+                    return offset
+        return None
+
+    def sync(self, messages: Sequence[BaseMessage]) -> Optional[int]:
+        """
+        Count tokens for messages appended since the last call. Returns how
+        many messages the store dropped from the head since then (a capped
+        list trimming its oldest messages, which shifts every index), or None
+        when the history was cleared or replaced and everything was recounted.
+        """
+        known = self._messages
+        dropped = 0
+        if known and not (messages and messages[0] is known[0] and len(messages) >= len(known)):
+            dropped = self._dropped(messages)
+            if dropped is None:
+                self.reset()
+            elif dropped:
+                base = self._prefix[dropped]
+                self._prefix = [total - base for total in self._prefix[dropped:]]
+            # Trimmed, reloaded or replaced: track the new message objects
+            self._messages = list(messages)
+        else:
+            known.extend(messages[len(known):])
+
+        total = self._prefix[-1]
+        for msg in messages[len(self._prefix) - 1:]:
+            total += approx_tokens(msg.content)
+            self._prefix.append(total)
+        return dropped
+
+    def select(
+        self,
+        messages: Sequence[BaseMessage],
+        reserved_tokens: int = 0,
+        min_start: int = 0
+    ) -> Tuple[List[BaseMessage], int]:
+        """
+        Return the newest messages whose combined size fits in the budget left
+        after reserved_tokens (system prompt and current input), together with
+        their estimated token count. Messages before min_start are never
+        selected (e.g. because they are already summarized).
+        """
+        self.sync(messages)
+
+        available = max(self.token_budget - reserved_tokens, 0)
+        total = self._prefix[-1]
+
+        # First index whose suffix fits in the available budget
+        start = bisect_left(self._prefix, total - available, min(min_start, len(messages)), len(messages))
+        if self.max_messages is not None:
+            start = max(start, len(messages) - self.max_messages)
+
+        # Don't open the context with a dangling assistant reply
+        if start < len(messages) and messages[start].type == "ai":
+            start += 1
+
+        return list(messages[start:]), total - self._prefix[start]
@@ -0,0 +1,289 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Queued operations: (number, kind, session_id, role, content, timestamp)
+_APPEND = "append"
+_CLEAR = "clear"
+_STOP = object()
+
+
+class Journal:
+    """
+    Durable local chat history in an SQLite database in WAL mode.
+
+    append() and clear() only queue the change; a writer thread applies
+    everything queued within commit_interval in one transaction (group
+    commit), so requests never wait on a disk sync. A crash, even kill -9,
+    loses at most the changes of the last commit window.
+
+    Nothing is loaded at startup: load() reads one session when it is first
+    used. The writer also compacts the database every compact_interval:
+    sessions idle for longer than retention are dropped, each session is
+    trimmed to its newest max_messages, and the WAL is checkpointed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        commit_interval: float = 0.05,
+        max_messages: int = 1000,
+        retention: float = 0,
+        compact_interval: float = 600,
+        clock=time.time
+    ):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.max_messages = max_messages
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self.clock = clock
+
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._committed_changed = threading.Condition(self._lock)
+        self._queued = 0     # number of the last queued operation
+        self._committed = 0  # number of the last operation written
+        self._pending: Dict[str, int] = {}  # session -> its last uncommitted operation
+
+        self.commits = 0
+        self.compactions = 0
+        self.errors = 0
+        self.messages_written = 0
+
+        # The schema is created here so reads work before the first commit
+        self._reader = self._connect(check_same_thread=False)
+        self._reader.executescript(SCHEMA)
+        self._reader_lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, **kwargs)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # only takes effect on a new file
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = FULL")
+        return conn
+
+    # Called from request handlers; never blocks on the disk
+
+    def append(self, session_id: str, role: str, content: str, timestamp: float):
+        """Queue one message for the session"""
+        self._enqueue(_APPEND, session_id, role, content, timestamp)
+
+    def clear(self, session_id: str):
+        """Queue removal of the session's whole history"""
+        self._enqueue(_CLEAR, session_id)
+
+    def _enqueue(self, kind: str, session_id: str, *args):
+        with self._lock:
+            self._queued += 1
+            self._pending[session_id] = self._queued
+            self._queue.put((self._queued, kind, session_id, *args))
+
+    # Reads (one indexed query per session, the first time it is used)
+
+    def load(self, session_id: str) -> List[Tuple[str, str, float]]:
+        """
+        The session's newest max_messages as (role, content, timestamp),
+        oldest first. Waits for the writer if the session still has queued
+        changes (e.g. it was evicted and reopened within a commit window).
+        """
+        with self._lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            self.flush(pending)
+        with self._reader_lock:
+            rows = self._reader.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages)
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def exists(self, session_id: str) -> bool:
+        """Whether the session has stored (or queued) history"""
+        with self._lock:
+            if session_id in self._pending:
+                return True
+        with self._reader_lock:
+            row = self._reader.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def flush(self, upto: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until operation upto (default: everything queued so far) is committed"""
+        with self._lock:
+            upto = self._queued if upto is None else upto
+            return self._committed_changed.wait_for(lambda: self._committed >= upto, timeout)
+
+    def close(self):
+        """Commit what is queued and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = self._queued - self._committed
+        return {
+            "enabled": True,
+            "path": self.path,
+            "queued": queued,
+            "commits": self.commits,
+            "messages_written": self.messages_written,
+            "compactions": self.compactions,
+            "errors": self.errors
+        }
+
+    # Writer thread
+
+    def _run(self):
+        conn = self._connect()
+        next_compaction = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=max(next_compaction - time.monotonic(), 0))
+            except queue.Empty:
+                pass
+            else:
+                # Group commit: take everything that arrives within the window
+                batch = [first]
+                deadline = time.monotonic() + self.commit_interval
+                while batch[-1] is not _STOP:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                stopping = batch[-1] is _STOP
+                operations = [op for op in batch if op is not _STOP]
+                if operations:
+                    self._commit(conn, operations)
+
+            if time.monotonic() >= next_compaction:
+                self._compact(conn)
+                next_compaction = time.monotonic() + self.compact_interval
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, operations: List[Tuple]):
+        updated: Dict[str, float] = {}
+        appended = 0
+        try:
+            conn.execute("BEGIN")
+            for _, kind, session_id, *args in operations:
+                if kind == _APPEND:
+                    conn.execute(
+                        "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                        (session_id, *args)
+                    )
+                    updated[session_id] = args[-1]
+                    appended += 1
+                else:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                    updated.pop(session_id, None)
+            conn.executemany(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                updated.items()
+            )
+            conn.execute("COMMIT")
+            self.commits += 1
+            self.messages_written += appended
+        except sqlite3.Error:
+            # The in-memory history is intact; only durability is lost
+            self.errors += 1
+            logger.exception("Journal commit of %d operations failed", len(operations))
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+        with self._lock:
+            self._committed = operations[-1][0]
+            for session_id in {op[2] for op in operations}:
+                if self._pending.get(session_id, 0) <= self._committed:
+                    self._pending.pop(session_id, None)
+            self._committed_changed.notify_all()
+
+    def _compact(self, conn: sqlite3.Connection):
+        try:
+            conn.execute("BEGIN")
+            if self.retention:
+                cutoff = self.clock() - self.retention
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                    (cutoff,)
+                )
+                conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            oversized = conn.execute(
+                "SELECT session_id FROM messages GROUP BY session_id HAVING COUNT(*) > ?", (self.max_messages,)
+            ).fetchall()
+            for (session_id,) in oversized:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id <= "
+                    "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_messages)
+                )
+            conn.execute("COMMIT")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA incremental_vacuum")
+            self.compactions += 1
+        except sqlite3.Error:
+            self.errors += 1
+            logger.exception("Journal compaction failed")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+
+_journal: Optional[Journal] = None
+
+
+def get_journal() -> Journal:
+    """Shared journal at JOURNAL_PATH (opened on first use)"""
+    global _journal
+    if _journal is None:
+        _journal = Journal(
+            settings.JOURNAL_PATH,
+            commit_interval=settings.JOURNAL_COMMIT_INTERVAL,
+            max_messages=settings.JOURNAL_MAX_MESSAGES,
+            retention=settings.JOURNAL_RETENTION,
+            compact_interval=settings.JOURNAL_COMPACT_INTERVAL
+        )
+    return _journal
+
+
+def close_journal():
+    """Commit queued changes and close the shared journal, if it was opened"""
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
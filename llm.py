@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Union
+
+from config import settings
+
+if TYPE_CHECKING:
+    # langchain_ollama (and the tracing stack behind it) is the slowest
+    # import of the app, and httpx loads the CA bundle for its transports;
+    # both are loaded with the first client instead of at startup
+    import httpx
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import BaseChatModel
+
+    from balancer import BackendPool
+
+
+def generation_options(
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None
+) -> Dict:
+    """
+    Build per-invocation keyword arguments for a chat model call.
+
+    Ollama reads sampling settings from the request "options", so passing them
+    per call lets every session share one client instead of building a new
+    ChatOllama whenever the temperature or length changes.
+    """
+    options = {}
+    if temperature is not None:
+        options["temperature"] = temperature
+    if max_tokens is not None:
+        options["num_predict"] = max_tokens
+    return {"options": options} if options else {}
+
+
+def keep_alive_for(model_name: str) -> Optional[Union[int, str]]:
+    """
+    Configured Ollama keep_alive for a model: MODEL_KEEP_ALIVE entry for the
+    exact name, then for the name without its tag, then the "*" default.
+    Numbers are seconds (negative keeps the model loaded); strings are
+    durations such as "30m". None leaves Ollama's default (5 minutes).
+    """
+    keep_alive = settings.MODEL_KEEP_ALIVE
+    value = keep_alive.get(model_name, keep_alive.get(model_name.split(":")[0], keep_alive.get("*")))
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class LLMRegistry:
+    """
+    Process-wide registry of chat model clients keyed by model name.
+
+    With several Ollama base URLs, async requests from every client are
+    spread over them by a BackendPool (see balancer.py); clients themselves
+    are still one per model.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        factory: Optional[Callable[[str], "BaseChatModel"]] = None
+    ):
+        self.base_urls = base_urls
+        self.base_url = base_urls[0]
+        self.factory = factory or self._create_ollama_client
+        self._clients: Dict[str, "BaseChatModel"] = {}
+        self._lock = threading.Lock()
+        self._transport: Optional["httpx.HTTPTransport"] = None
+        self._async_transport: Optional["httpx.AsyncBaseTransport"] = None
+        self._backends: Optional["BackendPool"] = None
+
+    def transports(self):
+        """
+        One connection pool shared by every Ollama client in the process.
+        The async transport balances over the backends; sync calls (not
+        used by the server) go to the first one.
+        """
+        if self._async_transport is None:
+            import httpx
+            from balancer import BackendPool, BalancingTransport
+            limits = httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS
+            )
+            connections = httpx.AsyncHTTPTransport(limits=limits)
+            self._transport = httpx.HTTPTransport(limits=limits)
+            self._backends = BackendPool(
+                self.base_urls,
+                connections,
+                strategy=settings.OLLAMA_BALANCE,
+                eject_seconds=settings.OLLAMA_EJECT_SECONDS,
+                spill_outstanding=settings.OLLAMA_SPILLOVER_OUTSTANDING
+            )
+            self._async_transport = BalancingTransport(self._backends, connections)
+        return self._transport, self._async_transport
+
+    def backends(self) -> "BackendPool":
+        """The Ollama backends and their health, load and loaded models"""
+        self.transports()
+        return self._backends
+
+    def _create_ollama_client(self, model_name: str) -> "BaseChatModel":
+        """Create an Ollama client that uses the shared connection pool"""
+        from langchain_ollama import ChatOllama
+        transport, async_transport = self.transports()
+        return ChatOllama(
+            model=model_name,
+            base_url=self.base_url,
+            keep_alive=keep_alive_for(model_name),
+            sync_client_kwargs={"transport": transport},
+            async_client_kwargs={"transport": async_transport}
+        )
+
+    def create_embeddings(self, model_name: str) -> "Embeddings":
+        """Create an Ollama embeddings client on the same balanced connection pool"""
+        from langchain_ollama import OllamaEmbeddings
+        transport, async_transport = self.transports()
+        return OllamaEmbeddings(
+            model=model_name,
+            base_url=self.base_url,
+            sync_client_kwargs={"transport": transport},
+            async_client_kwargs={"transport": async_transport}
+        )
+
+    def get(self, model_name: str) -> "BaseChatModel":
+        """Get the shared client for a model, creating it on first use"""
+        client = self._clients.get(model_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(model_name)
+                if client is None:
+                    client = self.factory(model_name)
+                    self._clients[model_name] = client
+        return client
+
+    def models(self) -> list:
+        """Models that currently have a client"""
+        return list(self._clients)
+
+    async def running_models(self) -> List[Dict]:
+        """Models the Ollama backends currently hold in memory (GET /api/ps on each)"""
+        return await self.backends().running_models()
+    
+    async def run_health_checks(self, interval: float):
+        """Check the backends periodically; runs for the lifetime of the server"""
+        # The pool (and httpx) is created off the event loop, as in startup.py
+        backends = await asyncio.to_thread(self.backends)
+        await backends.run_health_checks(interval)
+    
+    def backend_stats(self) -> List[Dict]:
+        """Per-backend health and load (empty until the first Ollama request)"""
+        return self._backends.stats() if self._backends is not None else []
+
+    def clear(self):
+        """Drop all cached clients (they are recreated on next use)"""
+        with self._lock:
+            self._clients.clear()
+
+
+llm_registry = LLMRegistry(base_urls=settings.OLLAMA_BASE_URLS)
@@ -1,15 +1,119 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, List, Optional, Dict, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import time
+import uuid
 import uvicorn
 from datetime import datetime
 import json
 
-from bot import ChatBot
-from models import ChatRequest, ChatResponse, ConversationHistory, SessionInfo
+from batch import run_batch
+from cache import response_cache
+from config import settings
+from journal import close_journal, get_journal
+from llm import keep_alive_for, llm_registry
+from metrics import REGISTRY, REQUEST_LATENCY, REQUESTS, register_collector
+from models import (
+    BatchChatRequest, BatchChatResult, BatchItem, ChatRequest, ChatResponse, ConversationHistory, SessionInfo,
+    error_frame
+)
+from profiling import PhaseTimer, ProfilerBusyError, capture_profile
+from ratelimit import RateLimitMiddleware, batch_rate_limiter, client_key, rate_limiter
+from router import AUTO_MODEL, model_router
+from scheduler import OverloadedError, Ticket, scheduler
+from semantic_cache import semantic_cache
+from sessions import SessionManager
+from singleflight import singleflight
+from startup import readiness
+from warmup import model_warmer
+
+if TYPE_CHECKING:
+    from bot import ChatBot
+
+def create_chatbot(session_id: str, **kwargs) -> "ChatBot":
+    """
+    New chatbot. bot (and LangChain with it) is imported here rather than
+    at module load so the server starts quickly; startup preloads it.
+    """
+    from bot import ChatBot
+    return ChatBot(session_id=session_id, **kwargs)
+
+# Store chatbot instances per session (bounded LRU with idle expiry)
+chatbot_sessions = SessionManager(
+    factory=create_chatbot,
+    max_sessions=settings.MAX_ACTIVE_SESSIONS,
+    idle_timeout=settings.SESSION_TIMEOUT,
+    sweep_interval=settings.SESSION_SWEEP_INTERVAL
+)
 
-app = FastAPI(title="AI Chatbot API", version="1.0.0")
+# Sessions examined per /api/sessions call when filters skip most of them
+SESSION_LIST_MAX_SCAN = 5000
+
+# Without a shared store each worker would only see part of every conversation
+if settings.API_WORKERS > 1 and not settings.USE_REDIS:
+    raise RuntimeError("API_WORKERS > 1 requires USE_REDIS=true so workers share session history")
+
+async def find_session(session_id: str) -> Optional["ChatBot"]:
+    """
+    Look up an existing session, rehydrating it from the shared store when
+    it was started by another worker or replica (or from the journal when
+    it was started before a restart)
+    """
+    chatbot = chatbot_sessions.get(session_id)
+    if chatbot is None and settings.USE_REDIS:
+        from redis_history import session_exists
+        if await session_exists(session_id):
+            chatbot = chatbot_sessions.get_or_create(session_id)
+    elif chatbot is None and settings.JOURNAL_PATH:
+        # Sessions from before a restart are reloaded from the local journal
+        if await asyncio.to_thread(get_journal().exists, session_id):
+            chatbot = chatbot_sessions.get_or_create(session_id)
+            await chatbot.load_history()
+    return chatbot
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background maintenance for the lifetime of the server"""
+    if semantic_cache.enabled and settings.SEMANTIC_CACHE_PATH:
+        semantic_cache.load(settings.SEMANTIC_CACHE_PATH)
+    
+    # Preload LangChain and warm up models once the server is listening;
+    # /api/ready reports when that is done
+    preparing = asyncio.create_task(readiness.prepare())
+    sweeper = asyncio.create_task(chatbot_sessions.run_sweeper())
+    health_checks = None
+    if settings.OLLAMA_HEALTH_INTERVAL > 0:
+        health_checks = asyncio.create_task(llm_registry.run_health_checks(settings.OLLAMA_HEALTH_INTERVAL))
+    yield
+    sweeper.cancel()
+    preparing.cancel()
+    if health_checks is not None:
+        health_checks.cancel()
+    
+    if semantic_cache.enabled and settings.SEMANTIC_CACHE_PATH:
+        semantic_cache.save(settings.SEMANTIC_CACHE_PATH)
+    
+    # Commit history still waiting for the journal's next group commit
+    await asyncio.to_thread(close_journal)
+
+app = FastAPI(title="AI Chatbot API", version="1.0.0", lifespan=lifespan)
+
+# Rate limiting for HTTP requests and WebSocket messages (added first so
+# CORS headers are also set on 429 responses)
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=rate_limiter,
+    key_by=settings.RATE_LIMIT_KEY,
+    api_keys=settings.API_KEYS,
+    exempt_paths=("/api/health", "/api/ready", "/metrics")
+)
 
 # CORS middleware
 app.add_middleware(
@@ -20,9 +124,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store chatbot instances per session
-chatbot_sessions: Dict[str, ChatBot] = {}
-
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -31,34 +132,64 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/api/chat",
+            "batch": "/api/chat/batch",
             "websocket": "/ws/{session_id}",
             "history": "/api/history/{session_id}",
             "sessions": "/api/sessions",
-            "clear": "/api/clear/{session_id}"
+            "clear": "/api/clear/{session_id}",
+            "models": "/api/models"
         }
     }
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_api_key: Optional[str] = Header(default=None)):
     """
     Main chat endpoint with memory and context awareness
     """
+    started = time.perf_counter()
+    timer = PhaseTimer()
+    model_name = "unknown"
     try:
         session_id = request.session_id or "default"
         
         # Create or get chatbot instance for this session
-        if session_id not in chatbot_sessions:
-            chatbot_sessions[session_id] = ChatBot(session_id=session_id)
+        chatbot = chatbot_sessions.get_or_create(session_id)
+        model_name, routing = await _turn_model(chatbot, request.message, request.model)
+        timer.mark("session_lookup")
+        
+        # Wait for this session's turn and a free generation slot, sharing
+        # capacity fairly between API keys (or sessions without one)
+        ticket = await scheduler.acquire(
+            session_id, model_name, traffic_class="api", flow=x_api_key
+        )
+        timer.mark("queue_wait")
         
-        chatbot = chatbot_sessions[session_id]
+        # Stream the response as Server-Sent Events. The stream releases the
+        # slot when it ends; the background task covers clients that
+        # disconnect before it starts.
+        if request.stream:
+            return StreamingResponse(
+                _chat_event_stream(chatbot, request, ticket, started, timer, model_name, routing),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                background=BackgroundTask(scheduler.arelease, ticket)
+            )
         
         # Get response from chatbot
-        response = await chatbot.get_response(
-            message=request.message,
-            temperature=request.temperature,
-            max_tokens=request.max_tokens
-        )
+        try:
+            response = await chatbot.get_response(
+                message=request.message,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                debug=request.debug,
+                timer=timer,
+                model_name=model_name
+            )
+        finally:
+            scheduler.release(ticket)
         
+        _record_routing(routing, response, started)
+        _observe_request("chat", model_name, started, _status(response))
         return ChatResponse(
             response=response["response"],
             session_id=session_id,
@@ -66,28 +197,222 @@ async def chat(request: ChatRequest):
             metadata=response.get("metadata", {})
         )
     
+    except OverloadedError as e:
+        _observe_request("chat", model_name, started, "rejected")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
+        _observe_request("chat", model_name, started, "error")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _turn_model(chatbot: "ChatBot", message: str, requested: Optional[str]) -> Tuple[str, Optional[Dict]]:
+    """
+    Model for one turn: the session's model, or the router's choice (and
+    its decision) when the request asks for "auto"
+    """
+    if requested == AUTO_MODEL:
+        # The conversation depth counts, so a stored history is read first
+        await chatbot.load_history()
+        routing = model_router.route(message, chatbot.message_count())
+        return routing["model"], routing
+    return chatbot.model_name, None
+
+def _record_routing(routing: Optional[Dict], response: Dict, started: float):
+    """Report an auto-routing decision in the response metadata and time the turn"""
+    if routing is not None:
+        response.setdefault("metadata", {})["routing"] = routing
+        model_router.observe(routing["model"], time.perf_counter() - started)
+
+def _observe_request(route: str, model_name: str, started: float, status: str):
+    """Record a handled request in the route metrics"""
+    REQUESTS.labels(route, model_name, status).inc()
+    REQUEST_LATENCY.labels(route, model_name).observe(time.perf_counter() - started)
+
+def _status(response: Dict) -> str:
+    """Outcome label for a chatbot response or final stream frame"""
+    return "error" if response.get("metadata", {}).get("error") else "ok"
+
+def _sse_event(event: str, data: Dict) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _chat_event_stream(
+    chatbot: "ChatBot",
+    request: ChatRequest,
+    ticket: Ticket,
+    started: float,
+    timer: PhaseTimer,
+    model_name: str,
+    routing: Optional[Dict]
+):
+    """
+    Relay chatbot stream frames as SSE: "delta" events, then one "done"
+    event carrying the ChatResponse (or an "error" event)
+    """
+    status = "error"
+    try:
+        async for frame in chatbot.stream_response(
+            message=request.message,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            debug=request.debug,
+            timer=timer,
+            model_name=model_name
+        ):
+            if frame["type"] != "delta":
+                status = _status(frame)
+            if frame["type"] == "delta":
+                yield _sse_event("delta", {"seq": frame["seq"], "delta": frame["delta"]})
+            elif frame["type"] == "final":
+                _record_routing(routing, frame, started)
+                done = ChatResponse(
+                    response=frame["response"],
+                    session_id=chatbot.session_id,
+                    timestamp=datetime.now().isoformat(),
+                    metadata=frame.get("metadata", {})
+                )
+                yield _sse_event("done", done.model_dump())
+            else:
+                yield _sse_event("error", {"seq": frame["seq"], "error": frame["error"]})
+    finally:
+        scheduler.release(ticket)
+        _observe_request("chat_stream", model_name, started, status)
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: Request, batch: BatchChatRequest, x_api_key: Optional[str] = Header(default=None)):
+    """
+    Run many chat requests in one call and stream the results as NDJSON, one
+    BatchChatResult per line in completion order.
+    
+    Items with a session_id run in order within their session; items
+    without one are stateless and run in parallel. At most BATCH_MAX_PARALLEL items
+    generate at once, in the scheduler's low-priority "batch" class. Every
+    item takes a token from the client's RATE_LIMIT_BATCH_ITEMS bucket.
+    """
+    if len(batch.requests) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(batch.requests)} items; the limit is {settings.BATCH_MAX_ITEMS}"
+        )
+    await _charge_batch_items(request, len(batch.requests))
+    return StreamingResponse(_batch_lines(batch.requests, x_api_key), media_type="application/x-ndjson")
+
+async def _charge_batch_items(request: Request, items: int):
+    """Take one token per batch item from the client's batch bucket (429 when it runs out)"""
+    if batch_rate_limiter is None:
+        return
+    if items > batch_rate_limiter.limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {items} items; at most {batch_rate_limiter.limit} are allowed per "
+                   f"{settings.RATE_LIMIT_PERIOD}s"
+        )
+    result = await batch_rate_limiter.hit(
+        client_key(request.scope, settings.RATE_LIMIT_KEY, settings.API_KEYS), cost=items
+    )
+    if not result.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Batch item rate limit exceeded",
+            headers={name.decode(): value.decode() for name, value in result.headers()}
+        )
+
+async def _batch_lines(requests: List[BatchItem], api_key: Optional[str]):
+    """Run a batch and format each result as it completes"""
+    async for index, result in run_batch(
+        [request.session_id for request in requests],
+        lambda index: _run_batch_item(index, requests[index], api_key),
+        settings.BATCH_MAX_PARALLEL
+    ):
+        if isinstance(result, Exception):
+            result = BatchChatResult(index=index, session_id=requests[index].session_id, error=str(result))
+        yield result.model_dump_json() + "\n"
+
+async def _run_batch_item(index: int, request: BatchItem, api_key: Optional[str]) -> BatchChatResult:
+    """Run one batch item; failures are reported in the result"""
+    started = time.perf_counter()
+    if request.session_id is None:
+        # Stateless: a throwaway bot that isn't registered or persisted
+        chatbot = create_chatbot(f"batch-{uuid.uuid4().hex}", ephemeral=True)
+    else:
+        chatbot = chatbot_sessions.get_or_create(request.session_id)
+    model_name, routing = await _turn_model(chatbot, request.message, request.model)
+    
+    try:
+        ticket = await scheduler.acquire(
+            chatbot.session_id, model_name, traffic_class="batch", flow=api_key
+        )
+    except OverloadedError as e:
+        _observe_request("chat_batch", model_name, started, "rejected")
+        return BatchChatResult(
+            index=index,
+            session_id=request.session_id,
+            error=str(e),
+            metadata={"retry_after": e.retry_after}
+        )
+    
+    try:
+        response = await chatbot.get_response(
+            message=request.message,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            debug=request.debug,
+            model_name=model_name
+        )
+    finally:
+        scheduler.release(ticket)
+    
+    _record_routing(routing, response, started)
+    status = _status(response)
+    _observe_request("chat_batch", model_name, started, status)
+    if status == "error":
+        return BatchChatResult(
+            index=index,
+            session_id=request.session_id,
+            metadata=response.get("metadata", {}),
+            error=response["response"]
+        )
+    return BatchChatResult(
+        index=index,
+        session_id=request.session_id,
+        response=response["response"],
+        metadata=response.get("metadata", {})
+    )
+
 @app.get("/api/history/{session_id}", response_model=ConversationHistory)
-async def get_history(session_id: str, limit: Optional[int] = 50):
+async def get_history(
+    session_id: str,
+    limit: Optional[int] = 50,
+    cursor: Optional[int] = Query(default=None, ge=0, description="next_cursor of the previous page")
+):
     """
-    Retrieve conversation history for a session
+    Retrieve conversation history for a session, newest page first; pass
+    next_cursor back as cursor for the page before
     """
+    started = time.perf_counter()
     try:
-        if session_id not in chatbot_sessions:
+        chatbot = await find_session(session_id)
+        if chatbot is None:
+            _observe_request("history", "none", started, "ok")
             return ConversationHistory(session_id=session_id, messages=[])
         
-        chatbot = chatbot_sessions[session_id]
-        history = chatbot.get_history(limit=limit)
+        history = await chatbot.get_history(limit=limit, before=cursor)
+        total = chatbot.message_count()
+        start = min(total if cursor is None else cursor, total) - len(history)
         
+        _observe_request("history", chatbot.model_name, started, "ok")
         return ConversationHistory(
             session_id=session_id,
             messages=history,
-            total_messages=len(history)
+            total_messages=total,
+            next_cursor=start if start > 0 else None
         )
     
     except Exception as e:
+        _observe_request("history", "none", started, "error")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/clear/{session_id}")
@@ -96,8 +421,9 @@ async def clear_history(session_id: str):
     Clear conversation history for a session
     """
     try:
-        if session_id in chatbot_sessions:
-            chatbot_sessions[session_id].clear_history()
+        chatbot = await find_session(session_id)
+        if chatbot is not None:
+            await chatbot.clear_history()
             return {"message": f"History cleared for session {session_id}"}
         else:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -106,20 +432,46 @@ async def clear_history(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sessions", response_model=List[SessionInfo])
-async def list_sessions():
+async def list_sessions(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[int] = Query(default=None, ge=0, description="X-Next-Cursor of the previous page"),
+    order: str = Query(default="last_activity", pattern="^(last_activity|created)$"),
+    active_since: Optional[datetime] = Query(default=None, description="Only sessions used since then"),
+    min_messages: int = Query(default=0, ge=0)
+):
     """
-    List all active chat sessions
+    List active chat sessions, most recently active (or created) first.
+    
+    Pages are read from the session manager's activity and creation
+    indexes. When there are more sessions, the cursor for the next page is
+    returned in the X-Next-Cursor header, with a Link header to that page.
     """
     try:
+        page, next_cursor = chatbot_sessions.page(
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            active_since=active_since.timestamp() if active_since else None,
+            predicate=(lambda chatbot: chatbot.message_count() >= min_messages) if min_messages else None,
+            max_scan=SESSION_LIST_MAX_SCAN
+        )
+        
         sessions = []
-        for session_id, chatbot in chatbot_sessions.items():
-            history = chatbot.get_history(limit=1)
+        for session_id, chatbot in page:
+            last = await chatbot.get_history(limit=1)
             sessions.append(SessionInfo(
                 session_id=session_id,
                 created_at=chatbot.created_at,
-                message_count=len(chatbot.memory.chat_memory.messages),
-                last_message=history[0] if history else None
+                last_activity=datetime.fromtimestamp(chatbot_sessions.last_active(session_id)).isoformat(),
+                message_count=chatbot.message_count(),
+                last_message=last[0] if last else None
             ))
+        
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+            response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
         return sessions
     
     except Exception as e:
@@ -131,8 +483,11 @@ async def delete_session(session_id: str):
     Delete a chat session completely
     """
     try:
-        if session_id in chatbot_sessions:
-            del chatbot_sessions[session_id]
+        chatbot = await find_session(session_id)
+        if chatbot is not None:
+            # Remove stored history too, not just this worker's copy
+            await chatbot.clear_history()
+            chatbot_sessions.delete(session_id)
             return {"message": f"Session {session_id} deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -147,24 +502,69 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """
     await websocket.accept()
     
-    # Create or get chatbot instance
-    if session_id not in chatbot_sessions:
-        chatbot_sessions[session_id] = ChatBot(session_id=session_id)
-    
-    chatbot = chatbot_sessions[session_id]
-    
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
             message_data = json.loads(data)
+            started = time.perf_counter()
+            timer = PhaseTimer()
+            route = "ws_stream" if message_data.get("stream") else "ws"
             
-            # Get response from chatbot
-            response = await chatbot.get_response(
-                message=message_data.get("message", ""),
-                temperature=message_data.get("temperature", 0.7),
-                max_tokens=message_data.get("max_tokens", 2000)
-            )
+            # Create or get chatbot instance (per message, so an idle
+            # connection whose session expired picks up a fresh one)
+            chatbot = chatbot_sessions.get_or_create(session_id)
+            model_name, routing = await _turn_model(chatbot, message_data.get("message", ""), message_data.get("model"))
+            timer.mark("session_lookup")
+            
+            try:
+                ticket = await scheduler.acquire(
+                    session_id, model_name,
+                    traffic_class="ws", flow=websocket.headers.get("x-api-key")
+                )
+                timer.mark("queue_wait")
+            except OverloadedError as e:
+                # Tell the client to back off; the connection stays open
+                _observe_request(route, model_name, started, "rejected")
+                await websocket.send_json(
+                    error_frame(str(e), message_data.get("stream"), {"retry_after": e.retry_after})
+                )
+                continue
+            
+            status = "error"
+            try:
+                # Streaming mode: forward deltas as they are generated
+                if message_data.get("stream"):
+                    async for frame in chatbot.stream_response(
+                        message=message_data.get("message", ""),
+                        temperature=message_data.get("temperature", 0.7),
+                        max_tokens=message_data.get("max_tokens", 2000),
+                        debug=bool(message_data.get("debug")),
+                        timer=timer,
+                        model_name=model_name
+                    ):
+                        if frame["type"] != "delta":
+                            status = _status(frame)
+                            frame["timestamp"] = datetime.now().isoformat()
+                        if frame["type"] == "final":
+                            _record_routing(routing, frame, started)
+                        await websocket.send_json(frame)
+                    continue
+                
+                # Get response from chatbot
+                response = await chatbot.get_response(
+                    message=message_data.get("message", ""),
+                    temperature=message_data.get("temperature", 0.7),
+                    max_tokens=message_data.get("max_tokens", 2000),
+                    debug=bool(message_data.get("debug")),
+                    timer=timer,
+                    model_name=model_name
+                )
+                _record_routing(routing, response, started)
+                status = _status(response)
+            finally:
+                scheduler.release(ticket)
+                _observe_request(route, model_name, started, status)
             
             # Send response back to client
             await websocket.send_json({
@@ -179,6 +579,52 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         print(f"WebSocket error: {e}")
         await websocket.close()
 
+@app.get("/api/models")
+async def list_models():
+    """
+    Configured and used models: whether Ollama has them loaded (until when,
+    and on which backends), their keep_alive, and warm-up and cold-start
+    latencies
+    """
+    try:
+        running = await llm_registry.running_models()
+        ollama_error = None
+    except Exception as e:
+        running = None
+        ollama_error = str(e)
+    
+    # Ollama reports "llama2:latest" for a model requested as "llama2"; with
+    # several backends a model can be loaded on more than one of them
+    loaded = {}
+    for model in running or []:
+        loaded.setdefault(_model_key(model["name"]), []).append(model)
+    warm_stats = model_warmer.stats()
+    names = {}
+    for name in (
+        settings.AVAILABLE_MODELS + settings.WARMUP_MODELS + llm_registry.models()
+        + list(warm_stats) + [model["name"] for model in running or []]
+    ):
+        names.setdefault(_model_key(name), name)
+    
+    models = []
+    for key, name in names.items():
+        instances = loaded.get(key, [])
+        ollama = instances[0] if instances else None
+        models.append({
+            "name": name,
+            "loaded": None if running is None else ollama is not None,
+            "backends": [instance.get("backend") for instance in instances],
+            "expires_at": ollama.get("expires_at") if ollama else None,
+            "size_vram": ollama.get("size_vram") if ollama else None,
+            "keep_alive": keep_alive_for(name),
+            "warm_up": name in settings.WARMUP_MODELS,
+            **warm_stats.get(name, {})
+        })
+    return {"models": models, "ollama_error": ollama_error}
+
+def _model_key(model_name: str) -> str:
+    return model_name.removesuffix(":latest")
+
 @app.get("/api/health")
 async def health_check():
     """
@@ -187,8 +633,106 @@ async def health_check():
     return {
         "status": "healthy",
         "active_sessions": len(chatbot_sessions),
+        "sessions": chatbot_sessions.stats(),
+        "response_cache": response_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "coalescing": singleflight.stats(),
+        "scheduler": scheduler.stats(),
+        "router": model_router.stats(),
+        "ollama_backends": llm_registry.backend_stats(),
+        "journal": get_journal().stats() if settings.JOURNAL_PATH and not settings.USE_REDIS else {"enabled": False},
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/api/ready")
+async def ready_check():
+    """
+    Readiness check: 503 until LangChain is loaded and WARMUP_MODELS are
+    warm, so load balancers only route traffic to a prepared instance
+    """
+    return JSONResponse(
+        status_code=200 if readiness.ready else 503,
+        content={
+            "status": "ready" if readiness.ready else "starting",
+            **readiness.stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
+@app.get("/api/admin/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10, gt=0, allow_inf_nan=False),
+    sort: str = Query(default="cumulative"),
+    limit: int = Query(default=50, ge=1),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    Profile the server for a number of seconds and return the cProfile report
+    """
+    # Constant-time comparison, so the token can't be guessed from response times
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILE_MAX_SECONDS}")
+    
+    try:
+        report = await capture_profile(seconds, sort=sort, limit=limit, max_seconds=settings.PROFILE_MAX_SECONDS)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PlainTextResponse(report)
+
+def _collect_state():
+    """Scrape-time metrics from counters the components already keep"""
+    sessions = chatbot_sessions.stats()
+    yield "chatbot_active_sessions", "gauge", "Sessions held by this process", [({}, sessions["active"])]
+    yield "chatbot_session_evictions_total", "counter", "Sessions evicted, by reason", [
+        ({"reason": "lru"}, sessions["evicted_lru"]),
+        ({"reason": "ttl"}, sessions["evicted_ttl"])
+    ]
+    yield "chatbot_session_memory_bytes", "gauge", "Estimated resident size of all sessions", [
+        ({}, sessions["estimated_memory_bytes"])
+    ]
+    
+    queue = scheduler.stats()
+    yield "chatbot_generations_active", "gauge", "Generation slots in use", [({}, queue["active"])]
+    yield "chatbot_queue_depth", "gauge", "Requests waiting for a slot, by traffic class", [
+        ({"traffic_class": name}, waiting) for name, waiting in queue["waiting_by_class"].items()
+    ]
+    yield "chatbot_queue_rejected_total", "counter", "Requests rejected because the queue was full", [
+        ({}, queue["rejected"])
+    ]
+    
+    caches = (("exact", response_cache.stats()), ("semantic", semantic_cache.stats()))
+    yield "chatbot_cache_lookups_total", "counter", "Response cache lookups, by cache and result", [
+        ({"cache": name, "result": result}, stats[result])
+        for name, stats in caches for result in ("hits", "misses")
+    ]
+    
+    coalescing = singleflight.stats()
+    yield "chatbot_coalesced_requests_total", "counter", "Generations started (leader) or joined (follower)", [
+        ({"role": "leader"}, coalescing["leaders"]),
+        ({"role": "follower"}, coalescing["followers"])
+    ]
+
+# Keyed by name: main.py is imported twice when run as a script
+register_collector("app_state", _collect_state)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        workers=settings.API_WORKERS,
+        reload=settings.API_RELOAD
+    )
\ No newline at end of file
@@ -0,0 +1,196 @@
+import asyncio
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# Message types a log can hold, stored as one-byte codes
+ROLES = ("human", "ai", "system")
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+MESSAGE_CLASSES = (HumanMessage, AIMessage, SystemMessage)
+API_ROLES = ("user", "assistant", "system")
+
+# additional_kwargs key for a message's creation time (epoch seconds), so
+# stores that keep whole messages (Redis) can report real timestamps too
+TIMESTAMP_KEY = "timestamp"
+
+
+def message_record(message: BaseMessage) -> Dict:
+    """Role, content and creation time of a LangChain message, for the API"""
+    timestamp = message.additional_kwargs.get(TIMESTAMP_KEY)
+    return {
+        "role": API_ROLES[ROLE_CODES.get(message.type, ROLE_CODES["ai"])],
+        "content": message.content,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+    }
+
+
+class MessageView(Sequence):
+    """
+    Read-only sequence of LangChain messages over a MessageLog. Messages are
+    built on access, so slicing the tail only materializes that tail.
+    """
+
+    __slots__ = ("_log",)
+
+    def __init__(self, log: "MessageLog"):
+        self._log = log
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._log.message(i) for i in range(*index.indices(len(self._log)))]
+        if index < 0:
+            index += len(self._log)
+        if not 0 <= index < len(self._log):
+            raise IndexError("message index out of range")
+        return self._log.message(index)
+
+
+class MessageLog(BaseChatMessageHistory):
+    """
+    Compact in-memory chat history.
+
+    Messages are stored column-wise: a byte per message for the role, a
+    double for the creation time and the content string itself, instead of
+    a pydantic message object (with its dicts) per message. `messages` is a
+    lazy view; LangChain messages are only built for the part of the
+    history that is actually read, e.g. the tail that goes into a prompt.
+    The first message is kept built so a replaced or cleared history can be
+    detected by identity (ContextWindow relies on this).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._roles = array("B")
+        self._times = array("d")
+        self._contents: List[Any] = []
+        self._content_bytes = 0
+        self._head: Optional[BaseMessage] = None
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    @property
+    def messages(self) -> MessageView:
+        return MessageView(self)
+
+    def message(self, index: int) -> BaseMessage:
+        """Build the LangChain message at a (non-negative) index"""
+        if index == 0 and self._head is not None:
+            return self._head
+        message = MESSAGE_CLASSES[self._roles[index]](content=self._contents[index])
+        if index == 0:
+            self._head = message
+        return message
+
+    def append(self, role: str, content: Any, timestamp: Optional[float] = None):
+        """Add one message; role is a LangChain message type ("human", "ai", "system")"""
+        self._roles.append(ROLE_CODES[role])
+        self._times.append(self.clock() if timestamp is None else timestamp)
+        self._contents.append(content)
+        self._content_bytes += sys.getsizeof(content)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        for message in messages:
+            self.append(message.type, message.content, message.additional_kwargs.get(TIMESTAMP_KEY))
+
+    async def aget_messages(self) -> MessageView:
+        return self.messages
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.add_messages(messages)
+
+    def clear(self) -> None:
+        self._roles = array("B")
+        self._times = array("d")
+        self._contents = []
+        self._content_bytes = 0
+        self._head = None
+
+    async def aclear(self) -> None:
+        self.clear()
+
+    def tail(self, limit: Optional[int] = None, end: Optional[int] = None) -> List[Dict]:
+        """
+        API records for the last limit messages before index end (default:
+        the newest messages; all of them without a limit), in O(limit)
+        """
+        end = len(self) if end is None else min(end, len(self))
+        start = max(end - limit, 0) if limit else 0
+        return [
+            {
+                "role": API_ROLES[self._roles[i]],
+                "content": self._contents[i],
+                "timestamp": datetime.fromtimestamp(self._times[i]).isoformat()
+            }
+            for i in range(start, end)
+        ]
+
+    def memory_bytes(self) -> int:
+        """Resident size of the log, including content strings"""
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+            + sys.getsizeof(self._roles) + sys.getsizeof(self._times)
+            + sys.getsizeof(self._contents) + self._content_bytes
+        )
+
+
+class JournaledMessageLog(MessageLog):
+    """
+    MessageLog that also writes every change to a Journal (journal.py), so
+    the conversation survives a restart.
+
+    The session's stored history is read back in a worker thread by the
+    first aget_messages()/aadd_messages() call, so the event loop never waits
+    on SQLite (or on the journal flushing the session's pending writes).
+    Like RedisChatMessageHistory, `messages` and len() only cover what has
+    been read so far.
+    """
+
+    def __init__(self, session_id: str, journal, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self.session_id = session_id
+        self.journal = journal
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def _replay(self, rows: List[Tuple[str, str, float]]):
+        for role, content, timestamp in rows:
+            super().append(role, content, timestamp)
+        self.loaded = True
+
+    async def aload(self):
+        """Read the stored history (once)"""
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                self._replay(await asyncio.to_thread(self.journal.load, self.session_id))
+
+    async def aget_messages(self) -> MessageView:
+        await self.aload()
+        return self.messages
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await self.aload()
+        self.add_messages(messages)
+
+    def append(self, role: str, content: Any, timestamp: Optional[float] = None):
+        if not self.loaded:
+            # Synchronous callers outside the server read the history inline
+            self._replay(self.journal.load(self.session_id))
+        timestamp = self.clock() if timestamp is None else timestamp
+        super().append(role, content, timestamp)
+        self.journal.append(self.session_id, role, content, timestamp)
+
+    def clear(self) -> None:
+        super().clear()
+        self.loaded = True
+        self.journal.clear(self.session_id)
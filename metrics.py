@@ -0,0 +1,98 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, disable_created_metrics
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Only _total/_bucket/_sum/_count samples, without a *_created series per child
+disable_created_metrics()
+
+# Latency buckets (seconds) spanning cache hits to long generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+# A state collector returns (name, type, help, [(labels, value), ...]) tuples
+Sample = Tuple[Dict[str, str], float]
+StateCollector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+METRIC_FAMILIES = {"counter": CounterMetricFamily, "gauge": GaugeMetricFamily}
+
+
+class _StateCollectors:
+    """
+    Scrape-time metrics for state other components already track (cache and
+    queue counters), read from plain functions registered by name
+    """
+
+    def __init__(self):
+        self.collectors: Dict[str, StateCollector] = {}
+
+    def collect(self):
+        for collector in self.collectors.values():
+            for name, kind, documentation, samples in collector():
+                labelnames = list(samples[0][0]) if samples else []
+                family = METRIC_FAMILIES[kind](name, documentation, labels=labelnames)
+                for labels, value in samples:
+                    family.add_metric([str(labels[label]) for label in labelnames], value)
+                yield family
+
+
+REGISTRY = CollectorRegistry()
+_state = _StateCollectors()
+REGISTRY.register(_state)
+
+
+def register_collector(name: str, collector: StateCollector):
+    """Add a scrape-time collector; re-registering a name replaces it"""
+    _state.collectors[name] = collector
+
+
+# Route-level metrics (route is e.g. "chat", "chat_stream", "ws", "history")
+REQUESTS = Counter(
+    "chatbot_requests_total", "Requests handled, by route, model and outcome",
+    ("route", "model", "status"), registry=REGISTRY
+)
+REQUEST_LATENCY = Histogram(
+    "chatbot_request_duration_seconds", "End-to-end request latency",
+    ("route", "model"), buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+# Generation metrics
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chatbot_time_to_first_token_seconds", "Time from request to the first streamed chunk",
+    ("model",), buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+TOKENS_PER_SECOND = Histogram(
+    "chatbot_generation_tokens_per_second", "Estimated output tokens per second of generation",
+    ("model",), buckets=RATE_BUCKETS, registry=REGISTRY
+)
+PROMPT_TOKENS = Histogram(
+    "chatbot_prompt_tokens", "Estimated prompt size sent to the model",
+    ("model",), buckets=TOKEN_BUCKETS, registry=REGISTRY
+)
+PHASE_LATENCY = Histogram(
+    "chatbot_phase_duration_seconds", "Time spent in each phase of a chat turn",
+    ("phase",), buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+GENERATION_ERRORS = Counter(
+    "chatbot_generation_errors_total", "Failed chat turns, by model and exception type",
+    ("model", "error"), registry=REGISTRY
+)
+
+# Model routing (model="auto")
+ROUTER_DECISIONS = Counter(
+    "chatbot_router_decisions_total", "Auto-routed turns, by request category, chosen model and SLO fallback",
+    ("category", "model", "fallback"), registry=REGISTRY
+)
+
+# Admission control
+QUEUE_WAIT = Histogram(
+    "chatbot_queue_wait_seconds", "Time spent waiting for a generation slot",
+    ("traffic_class",), buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+# Model residency
+MODEL_LOAD = Histogram(
+    "chatbot_model_load_seconds", "Ollama model load time on cold starts (load_duration)",
+    ("model",), buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
@@ -8,6 +8,9 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = Field(default="default", description="Session ID for conversation tracking")
     temperature: Optional[float] = Field(default=0.7, ge=0.0, le=1.0, description="Model temperature")
     max_tokens: Optional[int] = Field(default=2000, ge=1, le=4096, description="Maximum tokens in response")
+    stream: Optional[bool] = Field(default=False, description="Stream the response as Server-Sent Events")
+    debug: Optional[bool] = Field(default=False, description="Include per-phase timings (ms) in metadata")
+    model: Optional[str] = Field(default=None, pattern="^auto$", description='"auto" picks a model for this turn; omit to use the session model')
     
     class Config:
         json_schema_extra = {
@@ -26,25 +29,55 @@ class ChatResponse(BaseModel):
     timestamp: str = Field(..., description="Response timestamp")
     metadata: Optional[Dict[str, Any]] = Field(default={}, description="Additional metadata")
 
+class BatchItem(ChatRequest):
+    """One item of a batch; items without a session_id are stateless"""
+    session_id: Optional[str] = Field(default=None, description="Session ID; omit or null for a stateless item")
+
+class BatchChatRequest(BaseModel):
+    """Request model for the batch chat endpoint"""
+    requests: List[BatchItem] = Field(..., min_length=1, description="Chat requests; items without a session_id are stateless")
+
+class BatchChatResult(BaseModel):
+    """One NDJSON line of a batch response, emitted as each item completes"""
+    index: int = Field(..., description="Position of the item in the batch")
+    session_id: Optional[str] = Field(default=None, description="Session ID (null for stateless items)")
+    response: Optional[str] = Field(default=None, description="Bot response")
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+    metadata: Optional[Dict[str, Any]] = Field(default={}, description="Additional metadata")
+    error: Optional[str] = Field(default=None, description="Error message if the item failed")
+
 class Message(BaseModel):
     """Individual message in conversation"""
     role: str = Field(..., description="Message role: user or assistant")
     content: str = Field(..., description="Message content")
-    timestamp: str = Field(..., description="Message timestamp")
+    timestamp: Optional[str] = Field(default=None, description="Message creation time (null if the store didn't record it)")
 
 class ConversationHistory(BaseModel):
     """Conversation history response"""
     session_id: str = Field(..., description="Session ID")
     messages: List[Message] = Field(..., description="List of messages")
     total_messages: Optional[int] = Field(default=0, description="Total message count")
+    next_cursor: Optional[int] = Field(default=None, description="Cursor for the page of older messages (null on the first message)")
 
 class SessionInfo(BaseModel):
     """Session information"""
     session_id: str = Field(..., description="Session ID")
     created_at: str = Field(..., description="Session creation timestamp")
+    last_activity: Optional[str] = Field(default=None, description="Time the session was last used")
     message_count: int = Field(..., description="Number of messages in session")
     last_message: Optional[Message] = Field(default=None, description="Last message in conversation")
 
+def error_frame(error: str, stream: bool, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    WebSocket reply for a message that was not answered: an "error" frame
+    for streaming clients, a regular response frame otherwise
+    """
+    metadata = {"error": True, **(metadata or {})}
+    timestamp = datetime.now().isoformat()
+    if stream:
+        return {"type": "error", "seq": 0, "error": error, "metadata": metadata, "timestamp": timestamp}
+    return {"response": f"Error: {error}", "timestamp": timestamp, "metadata": metadata}
+
 class ErrorResponse(BaseModel):
     """Error response model"""
     error: str = Field(..., description="Error message")
@@ -0,0 +1,98 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+from typing import Dict
+
+from metrics import PHASE_LATENCY
+
+# Ollama reports these server-side durations (nanoseconds) with the final chunk
+OLLAMA_PHASES = {
+    "load_duration": "ollama_load",
+    "prompt_eval_duration": "ollama_prefill",
+    "eval_duration": "ollama_decode"
+}
+
+
+class PhaseTimer:
+    """
+    Wall-clock durations of the phases of one request.
+
+    mark(phase) closes the phase that has been running since the previous
+    mark, so instrumenting a code path is one call per boundary.
+    """
+
+    __slots__ = ("phases", "_started", "_last")
+
+    def __init__(self):
+        self._started = self._last = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.add(phase, now - self._last)
+        self._last = now
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        PHASE_LATENCY.labels(phase).observe(seconds)
+
+    def add_server_timings(self, response_metadata: Dict, generation_seconds: float):
+        """
+        Split a generation phase using Ollama's own durations: whatever the
+        server didn't account for is client-side overhead (LangChain,
+        serialization and network)
+        """
+        server_total = response_metadata.get("total_duration")
+        if not server_total:
+            return
+        for key, phase in OLLAMA_PHASES.items():
+            if response_metadata.get(key):
+                self.add(phase, response_metadata[key] / 1e9)
+        overhead = generation_seconds - server_total / 1e9
+        self.add("client_overhead", max(overhead, 0.0))
+
+    def as_metadata(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, plus the total so far"""
+        timings = {phase: round(seconds * 1000, 3) for phase, seconds in self.phases.items()}
+        timings["total"] = round((time.perf_counter() - self._started) * 1000, 3)
+        return timings
+
+
+_profile_lock = asyncio.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """Another profile capture is already running"""
+
+
+async def capture_profile(
+    seconds: float,
+    sort: str = "cumulative",
+    limit: int = 50,
+    max_seconds: float = 60
+) -> str:
+    """
+    Profile the event loop thread (where every request runs) for the given
+    number of seconds (at most max_seconds) and return the pstats report
+    """
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        raise ValueError(f"Unknown sort key: {sort}")
+    if not 0 < seconds <= max_seconds:
+        raise ValueError(f"seconds must be between 0 and {max_seconds}")
+    if _profile_lock.locked():
+        raise ProfilerBusyError("A profile capture is already running")
+
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
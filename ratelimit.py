@@ -0,0 +1,259 @@
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, List, NamedTuple, Optional, Tuple
+
+from config import settings
+from models import error_frame
+
+# Session id in /ws/{session_id} and /api/<route>/{session_id}
+SESSION_PATH = re.compile(r"^/(?:ws|api/[^/]+)/([^/]+)$")
+
+# Token bucket evaluated atomically in Redis, using the server clock so all
+# replicas agree. Takes ARGV[3] tokens at once (or none if there aren't
+# enough). Returns {allowed, tokens left as a string}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int   # seconds until the bucket is full again
+    retry_after: int   # seconds until the next request would be allowed
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (b"x-ratelimit-limit", str(self.limit).encode()),
+            (b"x-ratelimit-remaining", str(self.remaining).encode()),
+            (b"x-ratelimit-reset", str(self.reset_after).encode())
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(self.retry_after).encode()))
+        return headers
+
+
+def _result(allowed: bool, tokens: float, capacity: int, rate: float, cost: int = 1) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=capacity,
+        remaining=int(tokens),
+        reset_after=math.ceil((capacity - tokens) / rate),
+        retry_after=0 if tokens >= cost else max(1, math.ceil((cost - tokens) / rate))
+    )
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets: `limit` requests per `period` seconds with
+    bursts up to `limit`.
+
+    Buckets are kept in least-recently-updated order. A bucket idle for a
+    whole period has refilled completely, which is the same as having no
+    bucket, so stale ones are dropped from the front on every hit. Each hit
+    is O(1) amortized.
+    """
+
+    def __init__(self, limit: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+        self.clock = clock
+
+        # key -> [tokens, last update]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def clear(self):
+        self._buckets.clear()
+
+    async def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Take cost tokens from key's bucket (none if it doesn't hold that many)"""
+        now = self.clock()
+        self._evict_idle(now)
+
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [float(self.limit), now]
+        else:
+            bucket[0] = min(self.limit, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        self._buckets[key] = bucket
+
+        allowed = bucket[0] >= cost
+        if allowed:
+            bucket[0] -= cost
+        return _result(allowed, bucket[0], self.limit, self.rate, cost)
+
+    def _evict_idle(self, now: float):
+        deadline = now - self.period
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated > deadline:
+                break
+            del self._buckets[key]
+
+
+class RedisTokenBucketLimiter:
+    """
+    Token buckets shared by every worker and replica, updated atomically by
+    a Lua script. Idle buckets expire through their Redis TTL.
+    """
+
+    def __init__(self, client, limit: int, period: float, key_prefix: str = "chatbot:ratelimit:"):
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+        self.key_prefix = key_prefix
+        self._script = client.register_script(TOKEN_BUCKET_LUA)
+
+    async def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        allowed, tokens = await self._script(keys=[self.key_prefix + key], args=[self.limit, self.rate, cost])
+        return _result(bool(int(allowed)), float(tokens), self.limit, self.rate, cost)
+
+
+def client_key(scope: Dict, key_by: str, api_keys: Collection[str] = ()) -> str:
+    """
+    Identity a request is limited under: "api_key" (X-API-Key header when it
+    is one of api_keys, falling back to the client IP), "session" (session
+    id in the path, falling back to the client IP) or "ip".
+
+    Unknown API keys count as the client IP, so a client can't get a fresh
+    bucket by sending a new random key with every request.
+    """
+    if key_by == "api_key":
+        for name, value in scope.get("headers", ()):
+            if name == b"x-api-key":
+                api_key = value.decode("latin-1")
+                if api_key in api_keys:
+                    return "key:" + api_key
+                break
+    elif key_by == "session":
+        match = SESSION_PATH.match(scope.get("path", ""))
+        if match:
+            return "session:" + match.group(1)
+
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying a limiter to HTTP requests and to every message
+    received on a WebSocket.
+
+    HTTP responses carry X-RateLimit-Limit/-Remaining/-Reset headers; limited
+    requests get 429 with Retry-After. A limited WebSocket message is dropped
+    and answered with an error frame, leaving the connection open.
+    """
+
+    def __init__(
+        self,
+        app,
+        limiter=None,
+        key_by: str = "ip",
+        api_keys: Collection[str] = (),
+        exempt_paths: Tuple[str, ...] = ()
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.key_by = key_by
+        self.api_keys = frozenset(api_keys)
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if self.limiter is None or scope["type"] not in ("http", "websocket") or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = client_key(scope, self.key_by, self.api_keys)
+        if scope["type"] == "websocket":
+            await self.app(scope, self._limit_messages(key, receive, send), send)
+            return
+
+        result = await self.limiter.hit(key)
+        if not result.allowed:
+            await self._reject(send, result)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), *result.headers()]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _limit_messages(self, key: str, receive, send):
+        async def receive_limited():
+            while True:
+                message = await receive()
+                if message["type"] != "websocket.receive":
+                    return message
+                result = await self.limiter.hit(key)
+                if result.allowed:
+                    return message
+                frame = error_frame("Rate limit exceeded", _wants_stream(message), {"retry_after": result.retry_after})
+                await send({"type": "websocket.send", "text": json.dumps(frame)})
+        return receive_limited
+
+    @staticmethod
+    async def _reject(send, result: RateLimitResult):
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *result.headers()
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _wants_stream(message: Dict) -> bool:
+    """Whether a WebSocket chat message asked for streaming"""
+    try:
+        return bool(json.loads(message.get("text") or "{}").get("stream"))
+    except (ValueError, AttributeError):
+        return False
+
+
+def create_rate_limiter(limit: Optional[int] = None, key_prefix: str = "chatbot:ratelimit:"):
+    """Build a process-wide limiter from settings (None when disabled)"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    limit = settings.RATE_LIMIT_REQUESTS if limit is None else limit
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        from redis_history import get_redis
+        return RedisTokenBucketLimiter(get_redis(), limit, settings.RATE_LIMIT_PERIOD, key_prefix=key_prefix)
+    return TokenBucketLimiter(limit, settings.RATE_LIMIT_PERIOD)
+
+
+rate_limiter = create_rate_limiter()
+
+# Batch items are charged to a bucket of their own: a batch call takes one
+# request token, plus one item token per item
+batch_rate_limiter = create_rate_limiter(settings.RATE_LIMIT_BATCH_ITEMS, key_prefix="chatbot:ratelimit:batch:")
@@ -0,0 +1,185 @@
+import json
+import random
+from typing import List, Optional, Sequence
+
+import redis
+import redis.asyncio as aredis
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from config import settings
+
+KEY_PREFIX = "chatbot:"
+
+_client: Optional[aredis.Redis] = None
+_sync_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> aredis.Redis:
+    """Shared asyncio Redis client (one connection pool per process)"""
+    global _client
+    if _client is None:
+        _client = aredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_sync_redis() -> redis.Redis:
+    """Shared blocking Redis client, for callers of the sync history API"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+
+def history_key(session_id: str, key_prefix: str = KEY_PREFIX) -> str:
+    """Redis key holding a session's message list"""
+    return f"{key_prefix}history:{session_id}"
+
+
+async def session_exists(session_id: str) -> bool:
+    """Whether any process has stored history for the session"""
+    return bool(await get_redis().exists(history_key(session_id)))
+
+
+class RedisChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history stored in a capped Redis list.
+
+    Appends are pipelined into one round trip that pushes the messages, trims
+    the list to max_messages, refreshes the TTL and bumps a version counter.
+    Reads are served from a local copy that is only re-fetched when the
+    version counter shows another process has written to the session.
+
+    The version is never reset: clearing deletes the list but bumps the
+    counter, and a counter that is created anew (first write, or after the
+    keys expired) starts from a random value, so another process can't
+    mistake a new conversation for the copy it still holds.
+
+    The async methods are what the server uses; `messages` returns the local
+    copy once an async call has loaded it. The sync methods (and `messages`
+    before any async load) go through a blocking client on the same Redis.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        client: aredis.Redis,
+        ttl: int,
+        max_messages: int,
+        key_prefix: str = KEY_PREFIX,
+        sync_client: Optional[redis.Redis] = None
+    ):
+        self.session_id = session_id
+        self.client = client
+        self.sync_client = sync_client
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.key = history_key(session_id, key_prefix)
+        self.version_key = f"{self.key}:version"
+
+        # Local read-through cache; a None version means it has not been loaded
+        self._messages: List[BaseMessage] = []
+        self._version: Optional[int] = None
+
+    def _sync(self) -> redis.Redis:
+        if self.sync_client is None:
+            self.sync_client = get_sync_redis()
+        return self.sync_client
+
+    # Commands shared by the sync and async methods
+
+    def _bump_version(self, pipe):
+        # Seed a missing counter at a random value rather than 0 (NX leaves an existing one alone)
+        pipe.set(self.version_key, random.getrandbits(48), nx=True, ex=self.ttl)
+        pipe.incr(self.version_key)
+        pipe.expire(self.version_key, self.ttl)
+
+    def _queue_append(self, pipe, messages: Sequence[BaseMessage]):
+        pipe.rpush(self.key, *[json.dumps(message_to_dict(message)) for message in messages])
+        pipe.ltrim(self.key, -self.max_messages, -1)
+        pipe.expire(self.key, self.ttl)
+        self._bump_version(pipe)
+
+    def _queue_clear(self, pipe):
+        pipe.delete(self.key)
+        self._bump_version(pipe)
+
+    def _loaded(self, version: Optional[str], raw: List[str]) -> List[BaseMessage]:
+        self._messages = messages_from_dict([json.loads(item) for item in raw])
+        self._version = int(version or 0)
+        return self._messages
+
+    def _appended(self, messages: Sequence[BaseMessage], results: List) -> bool:
+        """Apply an append to the local copy; False if it has to be re-read"""
+        length, version = results[0], results[4]
+        if self._version is None:
+            return False
+        if self._version == 0:
+            # The session did not exist when loaded (its counter was just seeded);
+            # the copy is still current if the list held nothing but this append
+            if length != len(messages):
+                return False
+        elif version != self._version + 1:
+            return False
+        # Nobody else wrote in between: update the local copy in place
+        self._messages.extend(messages)
+        if len(self._messages) > self.max_messages:
+            del self._messages[:len(self._messages) - self.max_messages]
+        self._version = version
+        return True
+
+    def _cleared(self, version: int):
+        self._messages = []
+        self._version = version
+
+    # Async API
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        version = int(await self.client.get(self.version_key) or 0)
+        if version != self._version:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.get(self.version_key)
+                pipe.lrange(self.key, 0, -1)
+                return self._loaded(*await pipe.execute())
+        return self._messages
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._queue_append(pipe, messages)
+            results = await pipe.execute()
+        if not self._appended(messages, results):
+            await self.aget_messages()
+
+    async def aclear(self) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._queue_clear(pipe)
+            results = await pipe.execute()
+        self._cleared(results[2])
+
+    # Sync API
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        if self._version is None:
+            with self._sync().pipeline(transaction=True) as pipe:
+                pipe.get(self.version_key)
+                pipe.lrange(self.key, 0, -1)
+                return self._loaded(*pipe.execute())
+        return self._messages
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        with self._sync().pipeline(transaction=True) as pipe:
+            self._queue_append(pipe, messages)
+            results = pipe.execute()
+        if not self._appended(messages, results):
+            self._version = None
+
+    def clear(self) -> None:
+        with self._sync().pipeline(transaction=True) as pipe:
+            self._queue_clear(pipe)
+            results = pipe.execute()
+        self._cleared(results[2])
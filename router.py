@@ -0,0 +1,143 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from metrics import ROUTER_DECISIONS
+from scheduler import Scheduler, scheduler
+
+# ChatRequest.model value that asks for a routed model
+AUTO_MODEL = "auto"
+
+# Code in the message itself: fenced blocks, definitions, imports, statements
+CODE_SYNTAX = re.compile(
+    r"```"
+    r"|^\s*(?:async\s+)?def\s+\w+\s*\("
+    r"|^\s*class\s+\w+\s*[:({]"
+    r"|^\s*(?:import\s+[\w.]+|from\s+[\w.]+\s+import\s)"
+    r"|^\s*#include\s*<"
+    r"|\bfunction\s+\w+\s*\("
+    r"|^\s*(?:const|let|var)\s+\w+\s*="
+    r"|=>|;\s*$"
+    r"|\bSELECT\b.+\bFROM\b"
+    r"|Traceback \(most recent call last\)",
+    re.MULTILINE
+)
+
+# Requests about code
+CODE_TOPICS = re.compile(
+    r"\b(?:python|javascript|typescript|java|rust|golang|c\+\+|sql|regex|bash|"
+    r"compile[sd]?|compiler|debug|stack trace|segfault)\b",
+    re.IGNORECASE
+)
+
+# Requests that ask for reasoning rather than small talk
+REASONING = re.compile(
+    r"\b(?:explain|why|compare|analy[sz]e|step by step|prove|design|summari[sz]e|pros and cons|trade-?offs?)\b",
+    re.IGNORECASE
+)
+
+
+class ModelRouter:
+    """
+    Picks a model per turn for requests with model="auto".
+
+    A request is classified from cheap signals: code in or about the message
+    goes to the code model; otherwise one point each for a long message, a
+    deep conversation and reasoning keywords selects a tier in `models`
+    (smallest first), so small talk stays on the smallest model.
+
+    When the chosen model's expected queue wait (Scheduler.expected_wait:
+    the requests queued for it and its recent service time) is above
+    wait_slo, the next smaller model within the SLO is used instead, or the
+    one with the shortest wait if none is. Models only queue separately
+    with the scheduler's model_concurrency; otherwise they share one queue
+    and every candidate has the same wait, so the preferred model is kept.
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        code_model: Optional[str],
+        wait_slo: float,
+        long_message_chars: int,
+        deep_conversation: int,
+        scheduler: Scheduler = scheduler
+    ):
+        self.models = models
+        self.code_model = code_model or None
+        self.wait_slo = wait_slo
+        self.long_message_chars = long_message_chars
+        self.deep_conversation = deep_conversation
+        self.scheduler = scheduler
+
+        self.decisions: Dict[str, Dict[str, int]] = {}  # category -> model -> count
+        self.fallbacks = 0
+        self.latency_ewma: Dict[str, float] = {}  # seconds per routed turn, by model
+
+    def classify(self, message: str, history_length: int) -> Tuple[str, List[str]]:
+        """
+        Category of a request and the models that can serve it, preferred
+        first followed by the faster fallbacks
+        """
+        if CODE_SYNTAX.search(message) or CODE_TOPICS.search(message):
+            if self.code_model:
+                return "code", [self.code_model, *reversed(self.models)]
+            return "code", list(reversed(self.models))
+
+        score = (
+            (len(message) >= self.long_message_chars)
+            + (history_length >= self.deep_conversation)
+            + bool(REASONING.search(message))
+        )
+        tier = min(score, len(self.models) - 1)
+        return ("chat" if score == 0 else "complex"), self.models[tier::-1]
+
+    def route(self, message: str, history_length: int) -> Dict:
+        """Choose the model for one turn and record the decision"""
+        category, candidates = self.classify(message, history_length)
+        waits = {model: self.scheduler.expected_wait(model) for model in candidates}
+        model = next(
+            (model for model in candidates if waits[model] <= self.wait_slo),
+            min(candidates, key=waits.get)
+        )
+        fallback_from = candidates[0] if model != candidates[0] else None
+
+        counts = self.decisions.setdefault(category, {})
+        counts[model] = counts.get(model, 0) + 1
+        if fallback_from:
+            self.fallbacks += 1
+        ROUTER_DECISIONS.labels(category, model, "true" if fallback_from else "false").inc()
+        return {
+            "category": category,
+            "model": model,
+            "fallback_from": fallback_from,
+            "queue_wait_seconds": round(waits[model], 3)
+        }
+
+    def observe(self, model_name: str, seconds: float):
+        """Record how long a routed turn took"""
+        previous = self.latency_ewma.get(model_name, seconds)
+        self.latency_ewma[model_name] = previous + 0.2 * (seconds - previous)
+
+    def stats(self) -> Dict:
+        return {
+            "models": self.models,
+            "code_model": self.code_model,
+            "wait_slo_seconds": self.wait_slo,
+            "decisions": self.decisions,
+            "fallbacks": self.fallbacks,
+            "expected_wait_seconds": {
+                model: round(self.scheduler.expected_wait(model), 3)
+                for model in dict.fromkeys([*self.models, *filter(None, [self.code_model])])
+            },
+            "latency_ewma_seconds": {model: round(value, 3) for model, value in self.latency_ewma.items()}
+        }
+
+
+model_router = ModelRouter(
+    models=settings.ROUTER_MODELS,
+    code_model=settings.ROUTER_CODE_MODEL,
+    wait_slo=settings.ROUTER_WAIT_SLO,
+    long_message_chars=settings.ROUTER_LONG_MESSAGE_CHARS,
+    deep_conversation=settings.ROUTER_DEEP_CONVERSATION
+)
@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Set
+
+from config import settings
+from metrics import QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+
+# Traffic classes in priority order with their share of freed slots
+DEFAULT_CLASS_WEIGHTS = {"ws": 8, "api": 4, "batch": 1}
+
+
+class OverloadedError(Exception):
+    """The wait queue is full; the client should retry after retry_after seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request holding a session turn and a generation slot"""
+
+    __slots__ = ("session_id", "model_name", "traffic_class", "admitted_at", "turn_token", "released")
+
+    def __init__(
+        self,
+        session_id: str,
+        model_name: Optional[str],
+        traffic_class: str,
+        admitted_at: float,
+        turn_token: Optional[str] = None
+    ):
+        self.session_id = session_id
+        self.model_name = model_name
+        self.traffic_class = traffic_class
+        self.admitted_at = admitted_at
+        self.turn_token = turn_token
+        self.released = False
+
+
+class _SessionLock:
+    """FIFO lock for one session, dropped once nobody is using it"""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class _ModelSlots:
+    """Generation slots of one model: how many are in use and who waits for one (FIFO)"""
+
+    __slots__ = ("active", "waiters")
+
+    def __init__(self):
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+
+class FairQueue:
+    """
+    Requests waiting for a slot, grouped by traffic class and flow.
+
+    Classes are served weighted round-robin: the current class may take up
+    to its weight in consecutive slots before the next non-empty class gets
+    a turn, so higher classes get most of the capacity while lower ones
+    still make progress. Within a class, flows (sessions or API keys) are
+    served round-robin, so one busy flow can't starve the others.
+    """
+
+    def __init__(self, weights: Dict[str, int]):
+        self.weights = dict(weights)
+        self._classes = list(self.weights)
+        self._flows: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            name: OrderedDict() for name in self._classes
+        }
+        self._pending = dict.fromkeys(self._classes, 0)
+        self._current = 0
+        self._credit = self.weights[self._classes[0]] if self._classes else 0
+
+    def __len__(self) -> int:
+        return sum(self._pending.values())
+
+    def pending(self) -> Dict[str, int]:
+        """Waiting requests per class"""
+        return dict(self._pending)
+
+    def push(self, traffic_class: str, flow: str, waiter: asyncio.Future):
+        if traffic_class not in self._flows:
+            raise ValueError(f"Unknown traffic class: {traffic_class}")
+        flows = self._flows[traffic_class]
+        if flow not in flows:
+            flows[flow] = deque()
+        flows[flow].append(waiter)
+        self._pending[traffic_class] += 1
+
+    def remove(self, traffic_class: str, flow: str, waiter: asyncio.Future):
+        flows = self._flows[traffic_class]
+        flows[flow].remove(waiter)
+        if not flows[flow]:
+            del flows[flow]
+        self._pending[traffic_class] -= 1
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """Next waiter to be granted a slot, or None if nobody is waiting"""
+        for _ in range(len(self._classes) + 1):
+            name = self._classes[self._current]
+            if self._pending[name] and self._credit > 0:
+                self._credit -= 1
+                return self._pop_flow(name)
+            # Class exhausted its share (or is idle): move on to the next one
+            self._current = (self._current + 1) % len(self._classes)
+            self._credit = self.weights[self._classes[self._current]]
+        return None
+
+    def _pop_flow(self, traffic_class: str) -> asyncio.Future:
+        flows = self._flows[traffic_class]
+        flow, waiters = next(iter(flows.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            flows.move_to_end(flow)
+        else:
+            del flows[flow]
+        self._pending[traffic_class] -= 1
+        return waiter
+
+
+class Scheduler:
+    """
+    Admission control in front of the model.
+
+    At most max_concurrency generations run at once. Turns of the same
+    session run strictly one after another in arrival order (asyncio.Lock is
+    FIFO), so concurrent requests can't interleave a session's history. At
+    most max_queue requests may wait; beyond that acquire() raises
+    OverloadedError with a Retry-After estimate based on recent service times.
+    Freed slots go to waiting requests in FairQueue order.
+
+    With model_concurrency, one model can hold at most that many of the
+    slots (Ollama serves each loaded model with its own OLLAMA_NUM_PARALLEL
+    slots); further requests for it wait in the model's own FIFO queue
+    without holding up other models.
+
+    The session lock only covers this process. With several workers or
+    replicas, pass a turn_lock (RedisSessionLock) so a session's turns are
+    also serialized across processes; its lease is taken once the session's
+    local turn comes up and held until release().
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        class_weights: Optional[Dict[str, int]] = None,
+        model_concurrency: int = 0,
+        turn_lock=None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.model_concurrency = model_concurrency
+        self.turn_lock = turn_lock
+        self.clock = clock
+
+        self._active = 0
+        self._queued = 0
+        self._waiters = FairQueue(class_weights or DEFAULT_CLASS_WEIGHTS)
+        self._sessions: Dict[str, _SessionLock] = {}
+        self._models: Dict[str, _ModelSlots] = {}
+        self._lease_releases: Set[asyncio.Task] = set()
+
+        # Counters and moving averages (seconds)
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_ewma = 0.0
+        self.wait_max = 0.0
+        self.service_ewma = 0.0
+        self.model_wait_ewma: Dict[str, float] = {}
+        self.model_service_ewma: Dict[str, float] = {}
+        self.class_wait_ewma: Dict[str, float] = {}
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        backlog = (self._queued + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog * self.service_ewma))
+
+    def expected_wait(self, model_name: Optional[str] = None) -> float:
+        """
+        Estimated wait for a slot for a new request for model_name, from the
+        requests queued ahead of it and recent service times
+        """
+        wait = len(self._waiters) / max(self.max_concurrency, 1) * self.service_ewma
+        model = self._models.get(model_name) if self.model_concurrency else None
+        if model is not None and model.active >= self.model_concurrency:
+            service = self.model_service_ewma.get(model_name, self.service_ewma)
+            wait = max(wait, (len(model.waiters) + 1) / self.model_concurrency * service)
+        return wait
+
+    async def acquire(
+        self,
+        session_id: str,
+        model_name: Optional[str] = None,
+        traffic_class: str = "api",
+        flow: Optional[str] = None
+    ) -> Ticket:
+        """
+        Wait for the session's turn and a free slot. flow groups requests for
+        fair sharing (defaults to the session; pass an API key to share
+        fairly between clients instead).
+        """
+        if traffic_class not in self._waiters.weights:
+            raise ValueError(f"Unknown traffic class: {traffic_class}")
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(self.retry_after())
+
+        started = self.clock()
+        self._queued += 1
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _SessionLock()
+        session.users += 1
+
+        try:
+            await session.lock.acquire()
+            try:
+                turn_token = await self.turn_lock.acquire(session_id) if self.turn_lock else None
+                try:
+                    await self._acquire_model_slot(model_name)
+                    try:
+                        await self._acquire_slot(traffic_class, flow or session_id)
+                    except BaseException:
+                        self._release_model_slot(model_name)
+                        raise
+                except BaseException:
+                    if turn_token is not None:
+                        self._spawn_lease_release(session_id, turn_token)
+                    raise
+            except BaseException:
+                session.lock.release()
+                raise
+        except BaseException:
+            self._leave_session(session_id, session)
+            raise
+        finally:
+            self._queued -= 1
+
+        now = self.clock()
+        self._record_wait(model_name, traffic_class, now - started)
+        self.admitted += 1
+        return Ticket(session_id, model_name, traffic_class, now, turn_token)
+
+    def release(self, ticket: Ticket):
+        """
+        Give back the slot and let the session's next turn run (idempotent).
+        A turn lease is given back in the background, before the session's
+        next local turn is let through.
+        """
+        if ticket.released:
+            return
+        ticket.released = True
+        service = self.clock() - ticket.admitted_at
+        self.service_ewma += EWMA_ALPHA * (service - self.service_ewma)
+        if ticket.model_name is not None:
+            previous = self.model_service_ewma.get(ticket.model_name, service)
+            self.model_service_ewma[ticket.model_name] = previous + EWMA_ALPHA * (service - previous)
+
+        self._release_slot()
+        self._release_model_slot(ticket.model_name)
+        session = self._sessions[ticket.session_id]
+        if ticket.turn_token is None:
+            self._end_turn(ticket.session_id, session)
+        else:
+            task = self._spawn_lease_release(ticket.session_id, ticket.turn_token)
+            task.add_done_callback(lambda _: self._end_turn(ticket.session_id, session))
+
+    async def arelease(self, ticket: Ticket):
+        """release() as a coroutine, for callers (like Starlette background tasks) that would run it off the loop"""
+        self.release(ticket)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, model_name: Optional[str] = None, **kwargs) -> AsyncIterator[Ticket]:
+        """acquire()/release() as an async context manager"""
+        ticket = await self.acquire(session_id, model_name, **kwargs)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    async def _acquire_slot(self, traffic_class: str, flow: str):
+        if self._active < self.max_concurrency and not len(self._waiters):
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.push(traffic_class, flow, waiter)
+        try:
+            # On wake-up the slot has been handed over and _active still counts it
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            else:
+                self._waiters.remove(traffic_class, flow, waiter)
+            raise
+
+    def _release_slot(self):
+        while True:
+            waiter = self._waiters.pop()
+            if waiter is None:
+                self._active -= 1
+                return
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def _acquire_model_slot(self, model_name: Optional[str]):
+        if not self.model_concurrency or model_name is None:
+            return
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = _ModelSlots()
+        if model.active < self.model_concurrency and not model.waiters:
+            model.active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        model.waiters.append(waiter)
+        try:
+            # Handed over like the shared slots: active still counts it
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_model_slot(model_name)
+            else:
+                model.waiters.remove(waiter)
+            raise
+
+    def _release_model_slot(self, model_name: Optional[str]):
+        model = self._models.get(model_name) if self.model_concurrency else None
+        if model is None:
+            return
+        while model.waiters:
+            waiter = model.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        model.active -= 1
+        if model.active == 0:
+            del self._models[model_name]
+
+    def _end_turn(self, session_id: str, session: _SessionLock):
+        session.lock.release()
+        self._leave_session(session_id, session)
+
+    def _spawn_lease_release(self, session_id: str, token: str) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._release_lease(session_id, token))
+        self._lease_releases.add(task)
+        task.add_done_callback(self._lease_releases.discard)
+        return task
+
+    async def _release_lease(self, session_id: str, token: str):
+        try:
+            await self.turn_lock.release(session_id, token)
+        except Exception:
+            # The lease still expires after its TTL
+            logger.exception("Failed to release the turn lease of session %s", session_id)
+
+    def _leave_session(self, session_id: str, session: _SessionLock):
+        session.users -= 1
+        if session.users == 0:
+            del self._sessions[session_id]
+
+    def _record_wait(self, model_name: Optional[str], traffic_class: str, wait: float):
+        QUEUE_WAIT.labels(traffic_class).observe(wait)
+        self.wait_ewma += EWMA_ALPHA * (wait - self.wait_ewma)
+        self.wait_max = max(self.wait_max, wait)
+        for averages, key in ((self.model_wait_ewma, model_name), (self.class_wait_ewma, traffic_class)):
+            if key is not None:
+                previous = averages.get(key, wait)
+                averages[key] = previous + EWMA_ALPHA * (wait - previous)
+
+    def stats(self) -> Dict:
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self._queued,
+            "waiting_by_class": self._waiters.pending(),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_ewma_seconds": self.wait_ewma,
+            "wait_max_seconds": self.wait_max,
+            "service_ewma_seconds": self.service_ewma,
+            "model_concurrency": self.model_concurrency or None,
+            "active_by_model": {name: model.active for name, model in self._models.items()},
+            "model_wait_ewma_seconds": dict(self.model_wait_ewma),
+            "model_service_ewma_seconds": dict(self.model_service_ewma),
+            "class_wait_ewma_seconds": dict(self.class_wait_ewma)
+        }
+
+
+def create_turn_lock():
+    """Cross-process session lock when sessions are shared through Redis (None otherwise)"""
+    if not settings.USE_REDIS:
+        return None
+    from redis_history import get_redis
+    from session_lock import RedisSessionLock
+    return RedisSessionLock(get_redis(), ttl=settings.SESSION_LOCK_TTL)
+
+
+scheduler = Scheduler(
+    max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+    max_queue=settings.SCHEDULER_MAX_QUEUE,
+    class_weights=settings.SCHEDULER_CLASS_WEIGHTS,
+    model_concurrency=settings.SCHEDULER_MODEL_CONCURRENCY,
+    turn_lock=create_turn_lock()
+)
@@ -0,0 +1,107 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import settings
+from llm import llm_registry
+
+if TYPE_CHECKING:
+    from vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.npz"
+
+
+class SemanticCache:
+    """
+    Answers to session-opening messages, matched by embedding similarity.
+
+    Answers are only matched within their namespace, which the caller
+    derives from everything besides the message that shapes the answer
+    (model, system prompt, generation options). All namespaces share one
+    index, so capacity bounds the whole cache. A lookup embeds the message
+    once; on a miss the same vector is reused to store the answer once it
+    is generated.
+    """
+
+    def __init__(self, embedder=None, threshold: float = 0.92, capacity: int = 5000):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.index: Optional["VectorIndex"] = None
+        if embedder is not None:
+            # NumPy is only loaded when the cache is enabled
+            from vector_index import VectorIndex
+            self.index = VectorIndex(capacity)
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.embedder is not None
+
+    async def lookup(self, namespace: str, message: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Return (cached answer or None, message embedding). The embedding is
+        None if the embedder failed, in which case nothing should be stored.
+        """
+        try:
+            vector = await self.embedder.aembed_query(message)
+        except Exception:
+            self.errors += 1
+            logger.exception("Embedding failed; skipping the semantic cache")
+            return None, None
+
+        slots, similarities = self.index.search(vector, namespace)
+        if slots[0] >= 0 and similarities[0] >= self.threshold:
+            self.hits += 1
+            return self.index.get(int(slots[0])), vector
+
+        self.misses += 1
+        return None, vector
+
+    def add(self, namespace: str, vector: List[float], answer: str):
+        self.index.add(vector, answer, namespace)
+
+    def save(self, directory: str):
+        """Persist the index to directory"""
+        os.makedirs(directory, exist_ok=True)
+        self.index.save(os.path.join(directory, INDEX_FILENAME))
+
+    def load(self, directory: str):
+        """Reload an index saved by save(), if any"""
+        path = os.path.join(directory, INDEX_FILENAME)
+        if os.path.exists(path):
+            self.index = self.index.load(path, self.capacity)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.index) if self.index is not None else 0,
+            "namespaces": len(self.index.namespaces) if self.index is not None else 0
+        }
+
+
+def create_semantic_cache() -> SemanticCache:
+    """Build the process-wide semantic cache from settings"""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return SemanticCache()
+
+    embedder = llm_registry.create_embeddings(settings.SEMANTIC_CACHE_EMBED_MODEL)
+    return SemanticCache(
+        embedder,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        capacity=settings.SEMANTIC_CACHE_CAPACITY
+    )
+
+
+semantic_cache = create_semantic_cache()
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Only the holder (matching token) may give back or extend a lease
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisSessionLock:
+    """
+    Per-session turn lease shared by every worker and replica.
+
+    acquire() polls SET NX until the session is free and returns a token;
+    the lease is renewed while held, and expires after ttl seconds if the
+    holding process dies. Waiters in different processes are not ordered
+    among themselves (the scheduler keeps FIFO order within a process), but
+    two turns of a session never run at the same time.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: float = 30.0,
+        poll_interval: float = 0.05,
+        key_prefix: str = "chatbot:turn:"
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.key_prefix = key_prefix
+        self._release = client.register_script(RELEASE_LUA)
+        self._renew = client.register_script(RENEW_LUA)
+        self._renewals: Dict[str, asyncio.Task] = {}
+
+    async def acquire(self, session_id: str) -> str:
+        """Wait until no other process runs a turn of the session; returns the lease token"""
+        key = self.key_prefix + session_id
+        token = uuid.uuid4().hex
+        while not await self.client.set(key, token, nx=True, px=int(self.ttl * 1000)):
+            await asyncio.sleep(self.poll_interval)
+        self._renewals[token] = asyncio.create_task(self._keep_alive(key, token))
+        return token
+
+    async def release(self, session_id: str, token: str):
+        """Give back a lease taken by acquire()"""
+        renewal = self._renewals.pop(token, None)
+        if renewal is not None:
+            renewal.cancel()
+        await self._release(keys=[self.key_prefix + session_id], args=[token])
+
+    async def _keep_alive(self, key: str, token: str):
+        # Extend the lease at a third of its TTL so long generations keep it
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if not await self._renew(keys=[key], args=[token, int(self.ttl * 1000)]):
+                    logger.warning("Turn lease %s expired while held", key)
+                    return
+            except Exception:
+                logger.exception("Failed to renew turn lease %s", key)
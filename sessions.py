@@ -0,0 +1,219 @@
+import asyncio
+import itertools
+import logging
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Orders for SessionManager.page(), newest first
+ORDERS = ("last_activity", "created")
+
+
+class _Session:
+    """A stored chatbot with its access time and its positions in the indexes"""
+
+    __slots__ = ("chatbot", "last_access", "tick", "seq")
+
+    def __init__(self, chatbot: Any, last_access: float, tick: int, seq: int):
+        self.chatbot = chatbot
+        self.last_access = last_access
+        self.tick = tick  # position in the activity index (bumped on every access)
+        self.seq = seq    # position in the creation index
+
+
+class SessionManager:
+    """
+    Bounded store of chatbot sessions.
+
+    Sessions are kept in least-recently-used order, so touching a session,
+    evicting the LRU entry when the hard cap is reached and expiring idle
+    sessions from the front are all O(1) per session.
+
+    For listing, two append-only indexes of (position, session_id) are kept,
+    one bumped on every access and one written at creation. Both are sorted
+    by construction, so a cursor is found with a binary search and a page
+    costs O(page). Entries left behind by later accesses or removals are
+    skipped while reading and dropped when they outnumber the live ones.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_sessions: int,
+        idle_timeout: float,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+
+        # session_id -> session, oldest access first
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+
+        # Listing indexes: (tick, session_id) and (seq, session_id), ascending
+        self._ticks = itertools.count(1)
+        self._seqs = itertools.count(1)
+        self._activity: List[Tuple[int, str]] = []
+        self._creation: List[Tuple[int, str]] = []
+
+        # Counters
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Get a session and mark it as recently used"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.last_access = self.clock()
+        self._sessions.move_to_end(session_id)
+        self._touch(session_id, session)
+        return session.chatbot
+
+    def get_or_create(self, session_id: str) -> Any:
+        """Get a session, creating it (and evicting the LRU one if full)"""
+        chatbot = self.get(session_id)
+        if chatbot is not None:
+            return chatbot
+
+        while len(self._sessions) >= self.max_sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            evicted.chatbot.close()
+            self.evicted_lru += 1
+
+        chatbot = self.factory(session_id)
+        session = self._sessions[session_id] = _Session(chatbot, self.clock(), 0, next(self._seqs))
+        self._creation.append((session.seq, session_id))
+        self._touch(session_id, session)
+        self.created += 1
+        return chatbot
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns False if it did not exist"""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.chatbot.close()
+        return True
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Iterate (session_id, chatbot) pairs, least recently used first"""
+        for session_id, session in list(self._sessions.items()):
+            yield session_id, session.chatbot
+
+    def _touch(self, session_id: str, session: _Session):
+        session.tick = next(self._ticks)
+        self._activity.append((session.tick, session_id))
+        if len(self._activity) > 2 * len(self._sessions) + 64:
+            # OrderedDict order is access order, i.e. tick order
+            self._activity = [(s.tick, sid) for sid, s in self._sessions.items()]
+        if len(self._creation) > 2 * len(self._sessions) + 64:
+            self._creation = sorted((s.seq, sid) for sid, s in self._sessions.items())
+
+    def last_active(self, session_id: str) -> Optional[float]:
+        """Wall-clock time (epoch seconds) of a session's last access"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        return time.time() - (self.clock() - session.last_access)
+
+    def page(
+        self,
+        order: str = "last_activity",
+        cursor: Optional[int] = None,
+        limit: int = 50,
+        active_since: Optional[float] = None,
+        predicate: Optional[Callable[[Any], bool]] = None,
+        max_scan: Optional[int] = None
+    ) -> Tuple[List[Tuple[str, Any]], Optional[int]]:
+        """
+        One page of (session_id, chatbot) pairs, newest first by last access
+        or by creation, and the cursor for the next page (None at the end).
+        Listing doesn't count as an access.
+
+        active_since (epoch seconds) and predicate filter sessions. Ordered
+        by last access, active_since ends the listing at the first older
+        session. At most max_scan live sessions are examined per call; the
+        cursor then resumes where the scan stopped, so a selective predicate
+        yields short pages rather than slow ones.
+        """
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        index = self._activity if order == "last_activity" else self._creation
+        since = None if active_since is None else self.clock() - (time.time() - active_since)
+
+        position = len(index) if cursor is None else bisect_left(index, (cursor,))
+        results: List[Tuple[str, Any]] = []
+        scanned = 0
+        while position > 0 and len(results) < limit:
+            if max_scan is not None and scanned >= max_scan:
+                return results, index[position][0]
+            position -= 1
+            key, session_id = index[position]
+            session = self._sessions.get(session_id)
+            if session is None or key != (session.tick if order == "last_activity" else session.seq):
+                continue  # accessed again later, or removed
+            scanned += 1
+            if since is not None and session.last_access < since:
+                if order == "last_activity":
+                    return results, None
+                continue
+            if predicate is None or predicate(session.chatbot):
+                results.append((session_id, session.chatbot))
+
+        return results, (index[position][0] if position > 0 else None)
+
+    def sweep(self) -> int:
+        """Expire sessions idle for longer than idle_timeout"""
+        deadline = self.clock() - self.idle_timeout
+        expired = 0
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access > deadline:
+                break
+            del self._sessions[session_id]
+            session.chatbot.close()
+            expired += 1
+
+        self.evicted_ttl += expired
+        return expired
+
+    async def run_sweeper(self):
+        """Background task expiring idle sessions every sweep_interval seconds"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                expired = self.sweep()
+                if expired:
+                    logger.info("Expired %d idle sessions", expired)
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def stats(self) -> Dict:
+        """Counters and a resident-memory estimate for monitoring"""
+        estimated_bytes = sum(
+            session.chatbot.estimated_memory_bytes()
+            for session in self._sessions.values()
+        )
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "estimated_memory_bytes": estimated_bytes
+        }
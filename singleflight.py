@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-flight generation and the chunks it has produced so far"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, text: Optional[str] = None):
+        """Append a chunk (if any) and wake every subscriber"""
+        if text is not None:
+            self.chunks.append(text)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations into one upstream call.
+
+    The first caller for a key starts the generation in a background task;
+    callers arriving while it is running subscribe to the same flight and
+    receive every chunk from the beginning, so streaming clients all see the
+    same token stream. If every subscriber goes away the generation is
+    cancelled. Nothing is kept once a flight completes; repeats after that
+    are the response cache's job.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+        # Counters
+        self.leaders = 0
+        self.followers = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def stream(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Yield the chunks produced by produce(), sharing one run of it with
+        every concurrent caller using the same key
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.get_running_loop().create_task(self._run(key, flight, produce))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        flight.subscribers += 1
+        try:
+            position = 0
+            while True:
+                if position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight._changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    async def _run(self, key: str, flight: _Flight, produce: Callable[[], AsyncIterator[str]]):
+        try:
+            async for text in produce():
+                flight.publish(text)
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(key, flight)
+            flight.publish()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        requests = self.leaders + self.followers
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalescing_ratio": self.followers / requests if requests else 0.0
+        }
+
+
+singleflight = SingleFlight()
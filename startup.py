@@ -0,0 +1,74 @@
+import asyncio
+import importlib
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import settings
+from llm import llm_registry
+from warmup import model_warmer
+
+logger = logging.getLogger(__name__)
+
+# Slow imports kept off the startup path: main.py only imports them on first
+# use, and prepare() loads them in a thread once the server is accepting
+# connections, so the first request doesn't pay for them either
+PRELOAD_MODULES = (
+    "langchain_ollama",
+    "bot"
+)
+
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    llm_registry.transports()
+
+
+class Readiness:
+    """
+    Progress of the work that happens after the server starts listening:
+    preloading the LLM stack, then warming up WARMUP_MODELS. /api/health
+    answers as soon as the process is up; /api/ready only once this is done.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready = False
+        self.ready_at: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    async def prepare(self):
+        try:
+            phase_started = time.perf_counter()
+            await asyncio.to_thread(preload_modules)
+            self.timings["imports"] = round(time.perf_counter() - phase_started, 3)
+
+            if settings.WARMUP_MODELS:
+                phase_started = time.perf_counter()
+                # Failures are logged and shown in /api/models, not fatal
+                await model_warmer.warm_up_all(settings.WARMUP_MODELS, settings.WARMUP_TIMEOUT)
+                self.timings["warmup"] = round(time.perf_counter() - phase_started, 3)
+        except Exception as e:
+            # Never ready: the orchestrator should restart the process
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Startup preparation failed")
+            return
+
+        self.ready = True
+        self.ready_at = datetime.now().isoformat()
+        logger.info("Ready after %.2fs", time.perf_counter() - self.started)
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "ready_at": self.ready_at,
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "timings": dict(self.timings),
+            "error": self.error
+        }
+
+
+readiness = Readiness()
@@ -85,6 +85,26 @@ def test_list_sessions():
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+def test_history_and_session_pagination(fake_llm):
+    """Test cursor pages for history and the session list"""
+    for session_id in ("page-a", "page-b", "page-c"):
+        client.delete(f"/api/sessions/{session_id}")
+        client.post("/api/chat", json={"message": "One", "session_id": session_id})
+    client.post("/api/chat", json={"message": "Two", "session_id": "page-a"})
+
+    newest = client.get("/api/history/page-a", params={"limit": 3}).json()
+    older = client.get("/api/history/page-a", params={"limit": 3, "cursor": newest["next_cursor"]}).json()
+    assert newest["total_messages"] == 4
+    assert [m["content"] for m in newest["messages"]] == ["Hello there", "Two", "Hello there"]
+    assert [m["content"] for m in older["messages"]] == ["One"] and older["next_cursor"] is None
+
+    first = client.get("/api/sessions", params={"limit": 2, "min_messages": 2})
+    assert [s["session_id"] for s in first.json()] == ["page-a", "page-c"]
+    assert first.json()[0]["message_count"] == 4 and first.json()[0]["last_activity"]
+    second = client.get("/api/sessions", params={"limit": 2, "min_messages": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert second.json()[0]["session_id"] == "page-b"
+    assert 'rel="next"' in first.headers["Link"]
+
 def test_delete_session():
     """Test deleting a session"""
     # Create a session
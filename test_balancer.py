@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_ollama import ChatOllama
+
+from balancer import BackendPool, BalancingTransport
+from benchmarks.fake_ollama import FakeOllamaConfig, create_app
+
+class FakeOllamaServers(httpx.AsyncBaseTransport):
+    """Several fake Ollama servers, one per host; hosts in down refuse connections"""
+
+    def __init__(self, **configs):
+        self.transports = {host: httpx.ASGITransport(app=create_app(config)) for host, config in configs.items()}
+        self.down = set()
+        self.attempts = []
+
+    async def handle_async_request(self, request):
+        self.attempts.append(request.url.host)
+        if request.url.host in self.down:
+            raise httpx.ConnectError("Connection refused", request=request)
+        return await self.transports[request.url.host].handle_async_request(request)
+
+    async def requests(self, host):
+        async with httpx.AsyncClient(transport=self) as client:
+            return (await client.get(f"http://{host}/stats")).json()["requests"]
+
+def fast(prefill_ms=0):
+    return FakeOllamaConfig(prefill_ms=prefill_ms, decode_ms=0, tokens=3)
+
+def balanced(servers, strategy="least_outstanding"):
+    """A pool over the fake servers and a ChatOllama client going through it"""
+    pool = BackendPool([f"http://{host}" for host in servers.transports], servers, strategy=strategy)
+    llm = ChatOllama(
+        model="m",
+        base_url=pool.backends[0].url,
+        async_client_kwargs={"transport": BalancingTransport(pool, servers)}
+    )
+    return pool, llm
+
+def ask(llm):
+    return llm.ainvoke([HumanMessage(content="Hi")])
+
+def test_least_outstanding_spreads_concurrent_requests():
+    """Test that requests in flight are spread evenly and released afterwards"""
+    servers = FakeOllamaServers(a=fast(prefill_ms=20), b=fast(prefill_ms=20))
+    pool, llm = balanced(servers)
+
+    async def scenario():
+        await asyncio.gather(*(ask(llm) for _ in range(6)))
+        return await servers.requests("a"), await servers.requests("b")
+
+    assert asyncio.run(scenario()) == (3, 3)
+    assert [backend.outstanding for backend in pool.backends] == [0, 0]
+
+def test_requests_follow_loaded_models_and_latency():
+    """Test model-aware placement, then EWMA selection among warm backends"""
+    servers = FakeOllamaServers(a=fast(prefill_ms=30), b=fast())
+    pool, llm = balanced(servers, strategy="ewma")
+
+    async def scenario():
+        # Only b has the model loaded, so everything goes there
+        async with httpx.AsyncClient(transport=servers) as client:
+            await client.post("http://b/api/chat", json={"model": "m", "messages": [], "stream": False})
+        await pool.check_all()
+        for _ in range(3):
+            await ask(llm)
+        placed = await servers.requests("a"), await servers.requests("b")
+
+        # Once both have it, the faster backend wins after one probe each
+        async with httpx.AsyncClient(transport=servers) as client:
+            await client.post("http://a/api/chat", json={"model": "m", "messages": [], "stream": False})
+        await pool.check_all()
+        for _ in range(6):
+            await ask(llm)
+        return placed, await servers.requests("a"), await servers.requests("b")
+
+    placed, a, b = asyncio.run(scenario())
+
+    assert placed == (0, 4)
+    assert a - 1 <= 1 and b - 4 >= 5
+
+def test_connect_failures_retry_once_eject_and_readmit():
+    """Test failover to another backend, ejection and readmission by health checks"""
+    servers = FakeOllamaServers(a=fast(), b=fast(), c=fast())
+    pool, llm = balanced(servers)
+    servers.down = {"a"}
+
+    async def scenario():
+        answer = await ask(llm)
+        assert answer.content
+        assert [b["healthy"] for b in pool.stats()] == [False, True, True]
+
+        servers.down = set()
+        assert await pool.check_all() == [True, True, True]
+
+        servers.down = {"a", "b", "c"}
+        servers.attempts.clear()
+        with pytest.raises((ConnectionError, httpx.ConnectError)):
+            await ask(llm)
+        return len(servers.attempts)
+
+    assert asyncio.run(scenario()) == 2
+
+def test_busy_warm_backends_spill_over():
+    """Test that a model spreads to other backends once its warm ones are saturated"""
+    pool = BackendPool(["http://a", "http://b"], transport=None, spill_outstanding=2)
+    pool.backends[0].models = {"m"}
+
+    first = [pool.choose("m") for _ in range(2)]
+    for backend in first:
+        pool.started(backend)
+
+    assert [b.url for b in first] == ["http://a", "http://a"]
+    assert pool.choose("m").url == "http://b"
+    assert pool.choose("other").url == "http://b"
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import ratelimit
+from batch import run_batch, session_chains
+from config import settings
+from main import app, chatbot_sessions
+from ratelimit import TokenBucketLimiter
+
+client = TestClient(app)
+
+def test_session_chains_keep_order_and_split_stateless():
+    """Test that session items are chained in order and stateless items run alone"""
+    chains = session_chains(["a", None, "b", "a", None, "b"])
+
+    assert chains == [[0, 3], [1], [2, 5], [4]]
+
+def test_run_batch_caps_parallelism_and_orders_sessions():
+    """Test the parallelism cap, per-session order and completion-order output"""
+    running = 0
+    peak = 0
+    started = []
+
+    async def handle(index):
+        nonlocal running, peak
+        started.append(index)
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02 if index == 0 else 0.005)
+        running -= 1
+        if index == 4:
+            raise RuntimeError("boom")
+        return f"result {index}"
+
+    async def scenario():
+        return [item async for item in run_batch(["s", "s", None, None, None, "s"], handle, max_parallel=2)]
+
+    results = asyncio.run(scenario())
+
+    assert peak == 2
+    assert sorted(index for index, _ in results) == list(range(6))
+    assert [i for i in started if i in (0, 1, 5)] == [0, 1, 5]
+    # The slow first item finishes after stateless items that started later
+    assert [index for index, _ in results].index(0) > [index for index, _ in results].index(2)
+    assert isinstance(dict(results)[4], RuntimeError)
+
+def test_batch_endpoint_streams_ndjson(fake_llm):
+    """Test session and stateless items through /api/chat/batch"""
+    chatbot_sessions.delete("batch-session")
+
+    response = client.post("/api/chat/batch", json={"requests": [
+        {"message": "First", "session_id": "batch-session"},
+        {"message": "Standalone", "session_id": None},
+        {"message": "Second", "session_id": "batch-session"}
+    ]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = {line["index"]: line for line in map(json.loads, response.text.strip().split("\n"))}
+    assert sorted(results) == [0, 1, 2]
+    assert all(result["response"] == "Hello there" and result["error"] is None for result in results.values())
+    assert results[2]["metadata"]["message_count"] == 4
+    assert results[1]["session_id"] is None
+    assert [sid for sid, _ in chatbot_sessions.items() if sid.startswith("batch-")] == ["batch-session"]
+
+    chatbot_sessions.delete("batch-session")
+
+def test_anonymous_batch_items_are_stateless(monkeypatch, fake_llm):
+    """Test that items without a session_id neither chain nor use the "default" session"""
+    chatbot_sessions.delete("default")
+    submitted = []
+
+    def spy(session_ids, handle, max_parallel):
+        submitted.append(session_chains(session_ids))
+        return run_batch(session_ids, handle, max_parallel)
+
+    monkeypatch.setattr("main.run_batch", spy)
+
+    response = client.post("/api/chat/batch", json={"requests": [{"message": f"Prompt {i}"} for i in range(3)]})
+
+    results = [json.loads(line) for line in response.text.strip().split("\n")]
+    assert submitted == [[[0], [1], [2]]]
+    assert all(result["session_id"] is None for result in results)
+    assert all(result["metadata"]["message_count"] == 2 for result in results)
+    assert chatbot_sessions.get("default") is None
+
+def test_batch_endpoint_rejects_oversized_batch(monkeypatch):
+    """Test the BATCH_MAX_ITEMS limit"""
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 2)
+
+    response = client.post("/api/chat/batch", json={"requests": [{"message": "Hi"}] * 3})
+
+    assert response.status_code == 413
+
+def test_batch_items_are_rate_limited_per_item(monkeypatch, fake_llm):
+    """Test that every batch item takes a token, not every batch call"""
+    monkeypatch.setattr(ratelimit, "batch_rate_limiter", TokenBucketLimiter(limit=3, period=60))
+    monkeypatch.setattr("main.batch_rate_limiter", ratelimit.batch_rate_limiter)
+    items = [{"message": "Hi", "session_id": None}] * 2
+
+    assert client.post("/api/chat/batch", json={"requests": items}).status_code == 200
+    limited = client.post("/api/chat/batch", json={"requests": items})
+    too_big = client.post("/api/chat/batch", json={"requests": items * 2})
+
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+    assert too_big.status_code == 413
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import bot
+from bot import ChatBot
+from config import settings
+from context import ContextWindow, approx_tokens
+from llm import generation_options, llm_registry
+from scheduler import Scheduler
+
+def test_generation_options():
+    """Test mapping of request settings onto Ollama options"""
+    assert generation_options() == {}
+    assert generation_options(temperature=0.2, max_tokens=64) == {
+        "options": {"temperature": 0.2, "num_predict": 64}
+    }
+
+def test_sessions_share_one_client(fake_llm):
+    """Test that sessions and temperatures reuse the same client per model"""
+    first = ChatBot(session_id="shared-1", model_name="phi")
+    second = ChatBot(session_id="shared-2", model_name="phi")
+
+    asyncio.run(first.get_response("Hi", temperature=0.1, max_tokens=32))
+    asyncio.run(second.get_response("Hi", temperature=0.9))
+
+    assert list(fake_llm) == ["phi"]
+    assert llm_registry.get("phi") is fake_llm["phi"]
+
+    calls = fake_llm["phi"].calls
+    assert calls[0]["options"] == {"temperature": 0.1, "num_predict": 32}
+    assert calls[1]["options"]["temperature"] == 0.9
+
+def test_change_model_uses_registry(fake_llm):
+    """Test that switching models picks up the shared client for the new model"""
+    chatbot = ChatBot(session_id="switch", model_name="phi")
+    chatbot.change_model("mistral")
+
+    response = asyncio.run(chatbot.get_response("Hi"))
+
+    assert response["response"] == "Hello there"
+    assert "mistral" in fake_llm and "phi" not in fake_llm
+    assert [m["role"] for m in asyncio.run(chatbot.get_history())] == ["user", "assistant"]
+
+def _turns(count, text="x" * 40):
+    """Build count user/assistant pairs"""
+    messages = []
+    for _ in range(count):
+        messages += [HumanMessage(content=text), AIMessage(content=text)]
+    return messages
+
+def test_context_window_trims_oldest_messages():
+    """Test that the newest messages that fit the budget are kept"""
+    messages = _turns(50)
+    per_message = approx_tokens(messages[0].content)
+    window = ContextWindow(token_budget=per_message * 10 + 5)
+
+    selected, tokens = window.select(messages)
+
+    assert selected == messages[-10:]
+    assert tokens == per_message * 10
+
+    # Reserved tokens shrink the history share, never dropping the newest turn
+    selected, _ = window.select(messages, reserved_tokens=per_message * 6)
+    assert selected == messages[-4:]
+
+def test_context_window_counts_incrementally():
+    """Test cached counts across appends, message caps and resets"""
+    messages = _turns(5)
+    window = ContextWindow(token_budget=10_000, max_messages=4)
+
+    assert window.select(messages)[0] == messages[-4:]
+    messages += _turns(1, text="y" * 400)
+    assert window.select(messages)[0] == messages[-4:]
+    assert window.select(messages)[1] == 2 * approx_tokens("x" * 40) + 2 * approx_tokens("y" * 400)
+
+    window.reset()
+    assert window.select(messages[:2])[0] == messages[:2]
+
+    # A min_start past the end (history trimmed under a summary) selects nothing
+    assert window.select(messages[:2], min_start=10) == ([], 0)
+
+def test_prompt_respects_budget_and_caps_generation(fake_llm, monkeypatch):
+    """Test that long sessions send a bounded prompt and a capped num_predict"""
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 200)
+    monkeypatch.setattr(settings, "MODEL_CONTEXT_TOKENS", 300)
+    chatbot = ChatBot(session_id="budget", model_name="phi")
+    chatbot.get_session_history("budget").add_messages(_turns(500))
+
+    asyncio.run(chatbot.get_response("Hi", max_tokens=4000))
+
+    call = fake_llm["phi"].calls[-1]
+    prompt_tokens = sum(approx_tokens(m.content) for m in call["messages"])
+    assert prompt_tokens <= 200
+    assert call["messages"][0].type == "system"
+    assert call["messages"][-1].content == "Hi"
+    assert call["options"]["num_predict"] <= 300 - prompt_tokens + 10
+    assert len(asyncio.run(chatbot.get_history())) == 1002
+
+def test_summary_memory_folds_old_turns(fake_llm, monkeypatch):
+    """Test background summarization and summary + recent turns prompts"""
+    monkeypatch.setattr(settings, "SUMMARY_TRIGGER_MESSAGES", 10)
+    monkeypatch.setattr(settings, "SUMMARY_KEEP_RECENT", 4)
+    monkeypatch.setattr(bot, "scheduler", Scheduler(max_concurrency=1, max_queue=4))
+    chatbot = ChatBot(session_id="summary", model_name="phi", memory_mode="summary")
+    chatbot.get_session_history("summary").add_messages(_turns(10))
+
+    async def scenario():
+        await chatbot.get_response("First question")
+        # The summary runs in the background, off the request path
+        assert chatbot.summarized_count == 0
+        await chatbot._summary_task
+
+        await chatbot.get_response("Second question")
+
+    asyncio.run(scenario())
+
+    assert chatbot.summary == "Hello there"
+    assert chatbot.summarized_count == 18
+    # The summary generation took a low-priority scheduler slot
+    assert bot.scheduler.admitted == 1 and "batch" in bot.scheduler.class_wait_ewma
+
+    prompt = fake_llm["phi"].calls[-1]["messages"]
+    assert prompt[1].type == "system" and "Hello there" in prompt[1].content
+    assert len(prompt) == 2 + 1 + 4
+    assert len(asyncio.run(chatbot.get_history())) == 24
+
+    asyncio.run(chatbot.clear_history())
+    assert chatbot.summary == "" and chatbot.summarized_count == 0
+
+def test_summary_reset_when_stored_history_is_trimmed(fake_llm, fake_redis, monkeypatch):
+    """Test that a summary covering more than the capped history is dropped, not indexed past the end"""
+    monkeypatch.setattr(settings, "REDIS_HISTORY_MAX_MESSAGES", 8)
+    chatbot = ChatBot(session_id="capped", model_name="phi", memory_mode="summary")
+
+    async def scenario():
+        history = chatbot.get_session_history("capped")
+        await history.aadd_messages(_turns(10))
+        # Summarized before the store capped the list at 8 messages
+        chatbot.summary, chatbot.summarized_count = "Earlier talk", 16
+        return await chatbot.get_response("Still there?")
+
+    response = asyncio.run(scenario())
+
+    assert response["response"] == "Hello there"
+    assert chatbot.summary == "" and chatbot.summarized_count == 0
+    assert len(fake_llm["phi"].calls[-1]["messages"]) == 1 + 8 + 1
+
+def test_context_window_follows_head_trimming():
+    """Test that sync() reports messages dropped from the head and keeps counting"""
+    window = ContextWindow(token_budget=1000)
+    messages = _turns(3)
+    assert window.sync(messages) == 0
+
+    del messages[:2]
+    messages += _turns(1)
+    assert window.sync(messages) == 2
+    assert window.select(messages)[1] == sum(approx_tokens(m.content) for m in messages)
+
+    assert window.sync(_turns(2, text="other")) is None
+
+def test_summary_survives_capped_history(fake_llm, fake_redis, monkeypatch):
+    """Test that a full capped list keeps its summary in the prompt instead of resummarizing every turn"""
+    monkeypatch.setattr(settings, "REDIS_HISTORY_MAX_MESSAGES", 20)
+    monkeypatch.setattr(settings, "SUMMARY_TRIGGER_MESSAGES", 6)
+    monkeypatch.setattr(settings, "SUMMARY_KEEP_RECENT", 4)
+    monkeypatch.setattr(bot, "scheduler", Scheduler(max_concurrency=1, max_queue=4))
+    chatbot = ChatBot(session_id="capped-summary", model_name="phi", memory_mode="summary")
+
+    async def scenario():
+        prompts = []
+        for turn in range(30):
+            await chatbot.get_response(f"Question {turn}")
+            prompts.append(fake_llm["phi"].calls[-1]["messages"])
+            if chatbot._summary_task is not None:
+                await chatbot._summary_task
+        return prompts
+
+    turn_prompts = asyncio.run(scenario())
+    summaries = len(fake_llm["phi"].calls) - len(turn_prompts)
+
+    # Trimming starts at turn 10; every later turn still sends the summary
+    assert all("Summary of the earlier conversation" in prompt[1].content for prompt in turn_prompts[10:])
+    # One summary per SUMMARY_TRIGGER_MESSAGES new messages, not one per turn
+    assert summaries <= 30 * 2 // 6 + 1
+    assert 0 < chatbot.summarized_count <= 20 - 4
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import bot
+from bot import ChatBot
+from cache import InMemoryCacheBackend, RedisCacheBackend, ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_in_memory_backend_lru_and_ttl():
+    """Test size-bounded LRU eviction and expiry"""
+    clock = FakeClock()
+    backend = InMemoryCacheBackend(max_entries=2, ttl=10, clock=clock)
+
+    async def scenario():
+        await backend.set("a", "1")
+        await backend.set("b", "2")
+        assert await backend.get("a") == "1"  # "b" is now least recently used
+        await backend.set("c", "3")
+        assert await backend.get("b") is None
+        assert len(backend) == 2
+
+        clock.now = 11
+        assert await backend.get("a") is None
+
+    asyncio.run(scenario())
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = ResponseCache(InMemoryCacheBackend(max_entries=10, ttl=60), max_temperature=0.0)
+    monkeypatch.setattr(bot, "response_cache", cache)
+    return cache
+
+def test_deterministic_repeat_served_from_cache(fake_llm, memory_cache):
+    """Test that a repeated temperature-0 question skips the model"""
+    first = ChatBot(session_id="faq-1", model_name="phi")
+    second = ChatBot(session_id="faq-2", model_name="phi")
+
+    miss = asyncio.run(first.get_response("How do I reset my password?", temperature=0.0))
+    hit = asyncio.run(second.get_response("How do I reset my password?", temperature=0.0))
+
+    assert len(fake_llm["phi"].calls) == 1
+    assert hit["response"] == miss["response"] == "Hello there"
+    assert hit["metadata"]["cached"] and "cached" not in miss["metadata"]
+    assert [m["role"] for m in asyncio.run(second.get_history())] == ["user", "assistant"]
+    assert memory_cache.stats()["hits"] == 1
+
+def test_context_and_temperature_change_the_key(fake_llm, memory_cache):
+    """Test that different history or sampled requests are not cache hits"""
+    chatbot = ChatBot(session_id="faq-3", model_name="phi")
+
+    asyncio.run(chatbot.get_response("Hi", temperature=0.0))
+    asyncio.run(chatbot.get_response("Hi", temperature=0.0))  # history differs now
+    asyncio.run(chatbot.get_response("Hi", temperature=0.7))
+
+    assert len(fake_llm["phi"].calls) == 3
+    assert memory_cache.stats()["bypassed"] == 1
+
+def test_streaming_cache_hit(fake_llm, memory_cache):
+    """Test that streamed requests share the cache"""
+    async def collect(chatbot):
+        return [frame async for frame in chatbot.stream_response("Hi", temperature=0.0)]
+
+    asyncio.run(collect(ChatBot(session_id="stream-1", model_name="phi")))
+    frames = asyncio.run(collect(ChatBot(session_id="stream-2", model_name="phi")))
+
+    assert len(fake_llm["phi"].calls) == 1
+    assert frames[0] == {"type": "delta", "seq": 0, "delta": "Hello there"}
+    assert frames[-1]["metadata"]["cached"]
+
+def test_redis_backend(fake_redis):
+    """Test that the Redis backend stores entries with a TTL"""
+    backend = RedisCacheBackend(fake_redis, ttl=30)
+
+    async def scenario():
+        await backend.set("k", "v")
+        return await backend.get("k")
+
+    assert asyncio.run(scenario()) == "v"
+    assert fake_redis.ttls["chatbot:cache:k"] == 30
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+from langchain_core.messages import HumanMessage
+from langchain_ollama import ChatOllama
+
+from benchmarks.fake_ollama import FakeOllamaConfig, create_app
+from llm import generation_options
+
+def make_client(config):
+    """ChatOllama talking to the fake server in-process"""
+    return ChatOllama(
+        model="fake-model",
+        base_url="http://fake-ollama",
+        async_client_kwargs={"transport": httpx.ASGITransport(app=create_app(config))}
+    )
+
+def test_streams_tokens_with_ollama_timings():
+    """Test that the real Ollama client can stream from the fake server"""
+    llm = make_client(FakeOllamaConfig(prefill_ms=0, decode_ms=0, tokens=5))
+
+    async def scenario():
+        return [chunk async for chunk in llm.astream([HumanMessage(content="Hi")])]
+
+    chunks = asyncio.run(scenario())
+
+    text = "".join(chunk.content for chunk in chunks)
+    assert len(text.split()) == 5
+    final = next(chunk for chunk in chunks if chunk.response_metadata.get("done"))
+    assert final.response_metadata["eval_count"] == 5
+    assert "prompt_eval_duration" in final.response_metadata
+
+def test_num_predict_caps_answer_length():
+    """Test that per-call generation options are honored"""
+    llm = make_client(FakeOllamaConfig(prefill_ms=0, decode_ms=0, tokens=50))
+
+    response = asyncio.run(llm.ainvoke([HumanMessage(content="Hi")], **generation_options(max_tokens=3)))
+
+    assert len(response.content.split()) == 3
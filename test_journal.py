@@ -0,0 +1,115 @@
+import asyncio
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import journal as journal_module
+from bot import ChatBot
+from config import settings
+from journal import Journal
+from message_log import JournaledMessageLog
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    """Enable the journal backend in a temporary directory"""
+    path = str(tmp_path / "history.db")
+    monkeypatch.setattr(settings, "JOURNAL_PATH", path)
+    monkeypatch.setattr(journal_module, "_journal", None)
+    yield path
+    journal_module.close_journal()
+
+def test_appends_are_group_committed(tmp_path):
+    """Test that appends queued within one window share a transaction"""
+    journal = Journal(str(tmp_path / "history.db"), commit_interval=0.2)
+    for i in range(50):
+        journal.append("s1", "human", f"message {i}", 1000.0 + i)
+
+    assert journal.flush(timeout=5)
+    assert journal.commits == 1 and journal.messages_written == 50
+    journal.close()
+
+    reopened = Journal(str(tmp_path / "history.db"))
+    assert reopened.exists("s1") and not reopened.exists("s2")
+    assert reopened.load("s1")[-1] == ("human", "message 49", 1049.0)
+    reopened.close()
+
+def test_committed_writes_survive_kill(tmp_path):
+    """Test that a kill -9 after a commit window loses nothing"""
+    path = str(tmp_path / "history.db")
+    code = (
+        "import os, signal, time\n"
+        "from journal import Journal\n"
+        f"journal = Journal({path!r}, commit_interval=0.01)\n"
+        "journal.append('s1', 'human', 'Hi', 1.0)\n"
+        "journal.append('s1', 'ai', 'Hello', 2.0)\n"
+        "time.sleep(0.5)\n"
+        "os.kill(os.getpid(), signal.SIGKILL)\n"
+    )
+
+    result = subprocess.run([sys.executable, "-c", code])
+
+    assert result.returncode == -9
+    journal = Journal(path)
+    assert journal.load("s1") == [("human", "Hi", 1.0), ("ai", "Hello", 2.0)]
+    journal.close()
+
+def test_clear_and_compaction(tmp_path):
+    """Test clearing, per-session trimming and retention of idle sessions"""
+    now = [10_000.0]
+    journal = Journal(
+        str(tmp_path / "history.db"), commit_interval=0.01, max_messages=2,
+        retention=100, compact_interval=3600, clock=lambda: now[0]
+    )
+    for i in range(5):
+        journal.append("busy", "human", str(i), now[0])
+    journal.append("idle", "human", "old", now[0] - 500)
+    journal.append("cleared", "human", "gone", now[0])
+    journal.clear("cleared")
+    journal.flush()
+
+    journal._compact(journal._reader)
+
+    assert journal.load("busy") == [("human", "3", now[0]), ("human", "4", now[0])]
+    assert not journal.exists("idle") and journal.load("idle") == []
+    assert not journal.exists("cleared")
+    journal.close()
+
+def test_chatbot_history_survives_restart(journal_path, fake_llm):
+    """Test that a new ChatBot (e.g. after a restart) reloads the conversation"""
+    chatbot = ChatBot(session_id="durable", model_name="phi")
+    asyncio.run(chatbot.get_response("Hi"))
+
+    assert isinstance(chatbot.get_session_history("durable"), JournaledMessageLog)
+    journal_module.close_journal()
+
+    restarted = ChatBot(session_id="durable", model_name="phi")
+    history = asyncio.run(restarted.get_history())
+    assert [m["content"] for m in history] == ["Hi", "Hello there"]
+
+    asyncio.run(restarted.clear_history())
+    assert asyncio.run(ChatBot(session_id="durable").get_history()) == []
+
+def test_history_is_read_off_the_event_loop(journal_path, monkeypatch):
+    """Test that the stored history is loaded in a worker thread, once, and not by stats"""
+    journal = journal_module.get_journal()
+    journal.append("lazy", "human", "Hi", 1.0)
+    threads = []
+    load = journal.load
+
+    def recording_load(session_id):
+        threads.append(threading.current_thread())
+        return load(session_id)
+
+    monkeypatch.setattr(journal, "load", recording_load)
+    chatbot = ChatBot(session_id="lazy")
+    chatbot.estimated_memory_bytes()
+    assert threads == []
+
+    async def scenario():
+        await asyncio.gather(chatbot.load_history(), chatbot.get_history())
+        return chatbot.message_count()
+
+    assert asyncio.run(scenario()) == 1
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
@@ -0,0 +1,74 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from bot import ChatBot
+from context import ContextWindow
+from message_log import MessageLog
+
+def test_tail_reports_stored_timestamps():
+    """Test that records carry creation times and tail returns only the newest"""
+    times = iter([1_700_000_000.0, 1_700_000_060.0, 1_700_000_120.0])
+    log = MessageLog(clock=lambda: next(times))
+    log.append("human", "Hi")
+    log.append("ai", "Hello")
+    log.append("human", "Bye")
+
+    tail = log.tail(2)
+
+    assert [r["role"] for r in tail] == ["assistant", "user"]
+    assert [r["content"] for r in tail] == ["Hello", "Bye"]
+    assert tail[0]["timestamp"] < tail[1]["timestamp"]
+    assert len(log.tail()) == 3
+
+def test_messages_view_builds_langchain_messages_lazily():
+    """Test the sequence view used for prompts, and head identity across clears"""
+    log = MessageLog()
+    log.add_messages([HumanMessage(content="Hi"), AIMessage(content="Hello")])
+    view = log.messages
+
+    assert len(view) == 2
+    assert isinstance(view[-1], AIMessage) and view[-1].content == "Hello"
+    assert [m.type for m in view[0:]] == ["human", "ai"]
+    assert view[0] is log.messages[0]
+
+    first = view[0]
+    log.clear()
+    log.append("human", "Again")
+    assert log.messages[0] is not first
+
+def test_context_window_over_message_log():
+    """Test that the token window counts incrementally over the lazy view"""
+    log = MessageLog()
+    for i in range(10):
+        log.append("human", f"question {i}")
+        log.append("ai", f"answer {i}")
+    window = ContextWindow(token_budget=10_000, max_messages=4)
+
+    assert [m.content for m in window.select(log.messages)[0]] == ["question 8", "answer 8", "question 9", "answer 9"]
+    log.append("human", "question 10")
+    log.append("ai", "answer 10")
+    assert window.select(log.messages)[0][-1].content == "answer 10"
+    assert len(window._prefix) == 23
+
+def test_chatbot_history_timestamps_are_stable(fake_llm):
+    """Test that get_history reports when messages were stored, not the time of the call"""
+    chatbot = ChatBot(session_id="timestamps")
+    asyncio.run(chatbot.get_response("Hi"))
+
+    first = asyncio.run(chatbot.get_history())
+    second = asyncio.run(chatbot.get_history(limit=1))
+
+    assert [m["role"] for m in first] == ["user", "assistant"]
+    assert first[0]["timestamp"] <= first[1]["timestamp"]
+    assert second == first[-1:]
+
+def test_redis_history_keeps_timestamps(fake_llm, fake_redis):
+    """Test that histories storing whole messages also report real timestamps"""
+    chatbot = ChatBot(session_id="redis-timestamps")
+    asyncio.run(chatbot.get_response("Hi"))
+
+    history = asyncio.run(chatbot.get_history())
+
+    assert all(m["timestamp"] for m in history)
+    assert history == asyncio.run(chatbot.get_history())
@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from bot import ChatBot
+from config import settings
+from prometheus_client import CollectorRegistry, Histogram, generate_latest
+
+import metrics
+from metrics import REGISTRY, register_collector
+
+def test_histogram_buckets_match_the_app_buckets():
+    """Test that app histograms expose the configured buckets"""
+    registry = CollectorRegistry()
+    latency = Histogram(
+        "test_latency_seconds", "Test latency", ("route",), buckets=metrics.LATENCY_BUCKETS, registry=registry
+    )
+
+    for value in (0.004, 0.05, 200):
+        latency.labels("chat").observe(value)
+
+    assert registry.get_sample_value("test_latency_seconds_bucket", {"route": "chat", "le": "0.005"}) == 1
+    assert registry.get_sample_value("test_latency_seconds_bucket", {"route": "chat", "le": "120.0"}) == 2
+    assert registry.get_sample_value("test_latency_seconds_bucket", {"route": "chat", "le": "+Inf"}) == 3
+
+def test_state_collectors(monkeypatch):
+    """Test scrape-time collectors, including replacing one by name"""
+    monkeypatch.setattr(metrics._state, "collectors", {})
+    register_collector("queue", lambda: [("test_queue_depth", "gauge", "Depth", [({"class": "ws"}, 1)])])
+    register_collector("queue", lambda: [
+        ("test_queue_depth", "gauge", "Depth", [({"class": "ws"}, 3)]),
+        ("test_rejected_total", "counter", "Rejected", [({}, 2)])
+    ])
+
+    text = generate_latest(REGISTRY).decode()
+
+    assert 'test_queue_depth{class="ws"} 3.0' in text
+    assert "test_rejected_total 2.0" in text
+    assert "_created" not in text
+
+def test_metrics_endpoint_reports_chat_requests(fake_llm):
+    """Test that /metrics covers chat traffic and app state"""
+    client = TestClient(main.app)
+    client.post("/api/chat", json={"message": "Hello", "session_id": "metrics-session"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    model = settings.DEFAULT_MODEL
+    assert REGISTRY.get_sample_value("chatbot_requests_total", {"route": "chat", "model": model, "status": "ok"}) >= 1
+    assert REGISTRY.get_sample_value("chatbot_prompt_tokens_count", {"model": model}) >= 1
+    assert REGISTRY.get_sample_value("chatbot_active_sessions") >= 1
+    assert REGISTRY.get_sample_value("chatbot_cache_lookups_total", {"cache": "exact", "result": "hits"}) is not None
+    assert "# TYPE chatbot_request_duration_seconds histogram" in response.text
+
+    main.chatbot_sessions.delete("metrics-session")
+
+def test_generation_errors_are_counted(fake_llm, monkeypatch):
+    """Test that failures reported as "Error: ..." responses are still counted"""
+    chatbot = ChatBot(session_id="failing", model_name="broken")
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("Ollama is down")
+
+    monkeypatch.setattr(chatbot, "_generate", fail)
+    labels = {"model": "broken", "error": "ConnectionError"}
+    before = REGISTRY.get_sample_value("chatbot_generation_errors_total", labels) or 0
+
+    result = asyncio.run(chatbot.get_response("Hi"))
+
+    assert result["metadata"]["error"] is True
+    assert REGISTRY.get_sample_value("chatbot_generation_errors_total", labels) == before + 1
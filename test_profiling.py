@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+
+import main
+from config import settings
+from profiling import PhaseTimer
+
+def test_server_timings_split_generation():
+    """Test that Ollama durations and the remaining client overhead are reported"""
+    timer = PhaseTimer()
+    timer.add("generation", 1.5)
+    timer.add_server_timings(
+        {"total_duration": 1_200_000_000, "load_duration": 100_000_000,
+         "prompt_eval_duration": 300_000_000, "eval_duration": 800_000_000},
+        generation_seconds=1.5
+    )
+
+    timings = timer.as_metadata()
+
+    assert timings["ollama_prefill"] == 300.0
+    assert timings["ollama_decode"] == 800.0
+    assert timings["client_overhead"] == 300.0
+
+def test_debug_flag_adds_phase_timings(fake_llm):
+    """Test that debug requests carry a per-phase breakdown"""
+    client = TestClient(main.app)
+
+    plain = client.post("/api/chat", json={"message": "Hello", "session_id": "debug-session"})
+    debug = client.post("/api/chat", json={"message": "Hello again", "session_id": "debug-session", "debug": True})
+
+    assert "timings" not in plain.json()["metadata"]
+    timings = debug.json()["metadata"]["timings"]
+    for phase in ("session_lookup", "queue_wait", "history_load", "prompt_build",
+                  "cache_lookup", "generation", "history_commit", "total"):
+        assert phase in timings
+
+    main.chatbot_sessions.delete("debug-session")
+
+def test_profile_endpoint_requires_admin_token(monkeypatch):
+    """Test that profiling is disabled without a configured token"""
+    client = TestClient(main.app)
+
+    assert client.get("/api/admin/profile?seconds=0.01").status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/profile?seconds=0.01", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+def test_profile_endpoint_returns_report(monkeypatch):
+    """Test a short profile capture"""
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+
+    response = client.get("/api/admin/profile?seconds=0.05&limit=5", headers={"X-Admin-Token": "secret"})
+    bad_sort = client.get("/api/admin/profile?seconds=0.05&sort=nope", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert "function calls" in response.text
+    assert bad_sort.status_code == 400
+
+    # Captures are bounded, however the duration is spelled
+    monkeypatch.setattr(settings, "PROFILE_MAX_SECONDS", 1)
+    for seconds in ("2", "inf", "nan"):
+        capped = client.get(f"/api/admin/profile?seconds={seconds}", headers={"X-Admin-Token": "secret"})
+        assert capped.status_code in (400, 422)
@@ -0,0 +1,144 @@
+import asyncio
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from ratelimit import RateLimitMiddleware, TokenBucketLimiter, client_key
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_app(limiter, **kwargs):
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, **kwargs)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.websocket("/ws/{session_id}")
+    async def echo(websocket: WebSocket, session_id: str):
+        await websocket.accept()
+        try:
+            while True:
+                await websocket.send_json({"echo": await websocket.receive_text()})
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+def test_token_bucket_refills_over_time():
+    """Test bursts up to the limit, then one token per period/limit seconds"""
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(limit=2, period=10, clock=clock)
+
+    async def scenario():
+        results = [await limiter.hit("a") for _ in range(3)]
+        clock.now = 5
+        results.append(await limiter.hit("a"))
+        return results
+
+    first, second, third, refilled = asyncio.run(scenario())
+
+    assert (first.allowed, first.remaining) == (True, 1)
+    assert second.allowed and second.remaining == 0
+    assert not third.allowed and third.retry_after == 5
+    assert refilled.allowed
+
+def test_idle_buckets_are_evicted():
+    """Test that buckets idle for a full period are dropped"""
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(limit=5, period=10, clock=clock)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await limiter.hit(key)
+        clock.now = 11
+        await limiter.hit("d")
+
+    asyncio.run(scenario())
+
+    assert len(limiter) == 1
+
+def test_client_key_modes():
+    """Test API key, session and IP identities"""
+    scope = {
+        "path": "/ws/session-1",
+        "headers": [(b"x-api-key", b"secret")],
+        "client": ("10.0.0.1", 1234)
+    }
+
+    assert client_key(scope, "api_key", {"secret"}) == "key:secret"
+    assert client_key(scope, "session") == "session:session-1"
+    assert client_key(scope, "ip") == "ip:10.0.0.1"
+    assert client_key({**scope, "headers": []}, "api_key", {"secret"}) == "ip:10.0.0.1"
+    # Keys that aren't configured are limited by IP
+    assert client_key(scope, "api_key", {"other"}) == "ip:10.0.0.1"
+
+def test_http_requests_limited_with_headers():
+    """Test rate-limit headers and 429 once the bucket is empty"""
+    client = TestClient(make_app(TokenBucketLimiter(limit=2, period=60), exempt_paths=("/api/health",)))
+
+    first = client.get("/ping")
+    client.get("/ping")
+    limited = client.get("/ping")
+
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    # Exempt routes are never limited
+    assert client.get("/api/health").status_code == 200
+
+def test_api_keys_have_separate_buckets():
+    """Test that known API keys don't share a limit and random ones don't escape it"""
+    client = TestClient(make_app(TokenBucketLimiter(limit=1, period=60), key_by="api_key", api_keys={"a", "b"}))
+
+    assert client.get("/ping", headers={"X-API-Key": "a"}).status_code == 200
+    assert client.get("/ping", headers={"X-API-Key": "b"}).status_code == 200
+    assert client.get("/ping", headers={"X-API-Key": "a"}).status_code == 429
+
+    assert client.get("/ping", headers={"X-API-Key": "random-1"}).status_code == 200
+    assert client.get("/ping", headers={"X-API-Key": "random-2"}).status_code == 429
+
+def test_bucket_charges_cost_all_or_nothing():
+    """Test multi-token hits, as used for batch items"""
+    limiter = TokenBucketLimiter(limit=5, period=5, clock=FakeClock())
+
+    async def scenario():
+        return await limiter.hit("a", cost=3), await limiter.hit("a", cost=3), await limiter.hit("a", cost=2)
+
+    first, refused, last = asyncio.run(scenario())
+
+    assert first.allowed and first.remaining == 2
+    assert not refused.allowed and refused.retry_after == 1
+    assert last.allowed and last.remaining == 0
+
+def test_websocket_messages_limited_individually():
+    """Test that excess WebSocket messages get an error frame, not a disconnect"""
+    client = TestClient(make_app(TokenBucketLimiter(limit=2, period=60)))
+
+    with client.websocket_connect("/ws/session-1") as websocket:
+        websocket.send_text("one")
+        assert websocket.receive_json() == {"echo": "one"}
+        websocket.send_text("two")
+        assert websocket.receive_json() == {"echo": "two"}
+
+        websocket.send_text('{"message": "three", "stream": true}')
+        frame = websocket.receive_json()
+        assert frame["type"] == "error" and frame["seq"] == 0 and frame["timestamp"]
+        assert frame["metadata"]["retry_after"] >= 1
+
+        websocket.send_text('{"message": "four"}')
+        frame = websocket.receive_json()
+        assert frame["response"].startswith("Error:") and frame["timestamp"]
+        assert frame["metadata"]["error"] is True
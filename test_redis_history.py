@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from bot import ChatBot
+from redis_history import RedisChatMessageHistory
+
+def test_pipelined_capped_appends(fake_redis):
+    """Test that appends are one round trip, capped and given a TTL"""
+    history = RedisChatMessageHistory("capped", fake_redis, ttl=60, max_messages=3)
+
+    async def scenario():
+        await history.aget_messages()
+        trips = fake_redis.round_trips
+        await history.aadd_messages([HumanMessage(content="1"), AIMessage(content="2")])
+        await history.aadd_messages([HumanMessage(content="3"), AIMessage(content="4")])
+        assert fake_redis.round_trips == trips + 2
+
+    asyncio.run(scenario())
+
+    assert [m.content for m in history.messages] == ["2", "3", "4"]
+    assert len(fake_redis.data[history.key]) == 3
+    assert fake_redis.ttls[history.key] == 60
+
+def test_local_cache_refreshes_on_foreign_writes(fake_redis):
+    """Test the read-through cache across two history objects for one session"""
+    mine = RedisChatMessageHistory("shared", fake_redis, ttl=60, max_messages=100)
+    theirs = RedisChatMessageHistory("shared", fake_redis, ttl=60, max_messages=100)
+
+    async def scenario():
+        await mine.aadd_messages([HumanMessage(content="hello")])
+        assert [m.content for m in await theirs.aget_messages()] == ["hello"]
+
+        # Unchanged version: served locally without re-reading the list
+        trips = fake_redis.round_trips
+        await theirs.aget_messages()
+        assert fake_redis.round_trips == trips + 1
+
+        await theirs.aadd_messages([AIMessage(content="hi")])
+        assert [m.content for m in await mine.aget_messages()] == ["hello", "hi"]
+
+        await mine.aclear()
+        assert await theirs.aget_messages() == []
+
+    asyncio.run(scenario())
+
+def test_clear_is_seen_by_other_workers(fake_redis):
+    """Test that a cleared (or expired) session never comes back from a stale local copy"""
+    mine = RedisChatMessageHistory("cleared", fake_redis, ttl=60, max_messages=100)
+    theirs = RedisChatMessageHistory("cleared", fake_redis, ttl=60, max_messages=100)
+
+    async def scenario():
+        await mine.aadd_messages([HumanMessage(content="secret old")])
+        assert [m.content for m in await theirs.aget_messages()] == ["secret old"]
+
+        await mine.aclear()
+        await mine.aadd_messages([HumanMessage(content="x")])
+        assert [m.content for m in await theirs.aget_messages()] == ["x"]
+
+        await theirs.aadd_messages([AIMessage(content="y")])
+        assert fake_redis.data[mine.key] == fake_redis.data[theirs.key]
+        assert [m.content for m in await mine.aget_messages()] == ["x", "y"]
+
+        # Both keys expire, then another worker starts the session again
+        del fake_redis.data[mine.key], fake_redis.data[mine.version_key]
+        await mine.aadd_messages([HumanMessage(content="new")])
+        assert [m.content for m in await theirs.aget_messages()] == ["new"]
+
+    asyncio.run(scenario())
+
+def test_sync_interface(fake_redis):
+    """Test the blocking BaseChatMessageHistory methods against the same store"""
+    writer = RedisChatMessageHistory("sync", fake_redis, ttl=60, max_messages=3)
+    writer.add_messages([HumanMessage(content="1"), AIMessage(content="2")])
+
+    reader = RedisChatMessageHistory("sync", fake_redis, ttl=60, max_messages=3)
+    assert [m.content for m in reader.messages] == ["1", "2"]
+
+    reader.add_messages([HumanMessage(content="3"), AIMessage(content="4")])
+    assert [m.content for m in reader.messages] == ["2", "3", "4"]
+
+    reader.clear()
+    assert asyncio.run(writer.aget_messages()) == []
+
+def test_chatbot_uses_redis_history(fake_redis, fake_llm):
+    """Test ChatBot persisting turns through the Redis backend"""
+    chatbot = ChatBot(session_id="redis-bot", model_name="phi")
+
+    asyncio.run(chatbot.get_response("Hi"))
+
+    assert isinstance(chatbot.get_session_history("redis-bot"), RedisChatMessageHistory)
+    assert len(fake_redis.data["chatbot:history:redis-bot"]) == 2
+
+    # A fresh instance (e.g. after a restart) sees the same conversation
+    restarted = ChatBot(session_id="redis-bot", model_name="phi")
+    history = asyncio.run(restarted.get_history())
+    assert [m["content"] for m in history] == ["Hi", "Hello there"]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
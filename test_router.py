@@ -0,0 +1,118 @@
+from fastapi.testclient import TestClient
+
+import asyncio
+
+import main
+from router import ModelRouter
+from scheduler import Scheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_router():
+    clock = FakeClock()
+    scheduler = Scheduler(max_concurrency=3, max_queue=20, model_concurrency=1, clock=clock)
+    router = ModelRouter(
+        models=["phi", "mistral", "llama2"], code_model="codellama", wait_slo=2.0,
+        long_message_chars=200, deep_conversation=10, scheduler=scheduler
+    )
+    return router, scheduler, clock
+
+def test_requests_go_to_the_smallest_adequate_model():
+    """Test classification by code, length, reasoning and conversation depth"""
+    router, _, _ = make_router()
+
+    assert router.route("hey, how are you?", 0)["model"] == "phi"
+    assert router.route("thanks!", 25)["model"] == "mistral"
+    assert router.route("Can you explain why the sky is blue? " * 8, 25)["model"] == "llama2"
+    assert router.route("Why does this fail?\n```\nx = [1, 2\n```", 0)["category"] == "code"
+    assert router.route("How do I reverse a list in Python", 0)["model"] == "codellama"
+    assert router.decisions["chat"] == {"phi": 1}
+
+def test_fallback_lowers_queue_wait_under_load():
+    """Test that turns moved off a saturated model start sooner, and that it is used again once drained"""
+    router, scheduler, clock = make_router()
+    long_question = "Please compare these two designs in detail. " * 6
+
+    async def turn(model_name, seconds):
+        ticket = await scheduler.acquire(f"s-{clock.now}-{model_name}", model_name)
+        clock.now += seconds
+        scheduler.release(ticket)
+
+    async def scenario():
+        # Recent service times: llama2 takes 10s a turn, mistral 3s
+        await turn("llama2", 10)
+        await turn("mistral", 3)
+
+        # Load: one llama2 turn generating and two queued behind it
+        busy = await scheduler.acquire("busy", "llama2")
+        backlog = [asyncio.ensure_future(scheduler.acquire(f"queued-{i}", "llama2")) for i in range(2)]
+        await asyncio.sleep(0)
+
+        routed = router.route(long_question, 20)
+        llama2_wait = scheduler.expected_wait("llama2")
+        admitted = asyncio.ensure_future(scheduler.acquire("routed", routed["model"]))
+        unrouted = asyncio.ensure_future(scheduler.acquire("unrouted", "llama2"))
+        await asyncio.sleep(0)
+        started = admitted.done(), unrouted.done()
+
+        # Drain the backlog; the large model is preferred again
+        scheduler.release(admitted.result())
+        scheduler.release(busy)
+        for waiter in [*backlog, unrouted]:
+            scheduler.release(await waiter)
+        return routed, started, llama2_wait, router.route(long_question, 20)
+
+    routed, started, llama2_wait, recovered = asyncio.run(scenario())
+
+    assert (routed["model"], routed["fallback_from"]) == ("mistral", "llama2")
+    assert started == (True, False)
+    # Three llama2 turns of 10s ahead of it, none ahead on mistral
+    assert routed["queue_wait_seconds"] == 0 and llama2_wait == 30
+    assert (recovered["model"], recovered["fallback_from"]) == ("llama2", None)
+    assert router.fallbacks == 1
+
+def test_shared_queue_keeps_the_preferred_model():
+    """Test that without per-model slots a fallback wouldn't help, so none happens"""
+    scheduler = Scheduler(max_concurrency=1, max_queue=20)
+    router = ModelRouter(
+        models=["phi", "llama2"], code_model=None, wait_slo=0.5,
+        long_message_chars=200, deep_conversation=10, scheduler=scheduler
+    )
+
+    async def scenario():
+        scheduler.service_ewma = 10.0
+        busy = await scheduler.acquire("busy", "llama2")
+        backlog = [asyncio.ensure_future(scheduler.acquire(f"queued-{i}", "llama2")) for i in range(3)]
+        await asyncio.sleep(0)
+        decision = router.route("Explain it", 20)
+        for task in backlog:
+            task.cancel()
+        await asyncio.gather(*backlog, return_exceptions=True)
+        scheduler.release(busy)
+        return decision
+
+    decision = asyncio.run(scenario())
+
+    assert decision["queue_wait_seconds"] > 0.5
+    assert (decision["model"], decision["fallback_from"]) == ("llama2", None)
+
+def test_chat_endpoint_routes_auto_requests(fake_llm):
+    """Test model="auto" end to end: routed model, metadata and metrics"""
+    client = TestClient(main.app)
+
+    response = client.post("/api/chat", json={"message": "Hello!", "session_id": "auto-1", "model": "auto"})
+    metadata = response.json()["metadata"]
+
+    assert metadata["model"] == metadata["routing"]["model"] == main.model_router.models[0]
+    assert metadata["routing"]["category"] == "chat"
+    assert fake_llm[metadata["model"]].calls
+    assert client.post("/api/chat", json={"message": "Hi", "model": "gpt-4"}).status_code == 422
+    assert "chatbot_router_decisions_total" in client.get("/metrics").text
+    assert client.get("/api/health").json()["router"]["decisions"]["chat"]
+
+    main.chatbot_sessions.delete("auto-1")
@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from scheduler import FairQueue, OverloadedError, Scheduler
+from session_lock import RedisSessionLock
+
+def test_global_concurrency_limit():
+    """Test that no more than max_concurrency requests hold a slot"""
+    scheduler = Scheduler(max_concurrency=2, max_queue=10)
+    peak = 0
+
+    async def work(session_id):
+        nonlocal peak
+        async with scheduler.slot(session_id):
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(work(f"session-{i}") for i in range(6)))
+
+    asyncio.run(scenario())
+
+    assert peak == 2
+    assert scheduler.active == 0
+    assert scheduler.stats()["admitted"] == 6
+
+def test_session_turns_run_in_arrival_order():
+    """Test that a session's requests never overlap and keep FIFO order"""
+    scheduler = Scheduler(max_concurrency=4, max_queue=10)
+    events = []
+
+    async def turn(number):
+        async with scheduler.slot("same-session"):
+            events.append(("start", number))
+            await asyncio.sleep(0.005)
+            events.append(("end", number))
+
+    async def scenario():
+        await asyncio.gather(*(turn(i) for i in range(3)))
+
+    asyncio.run(scenario())
+
+    assert events == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    assert scheduler._sessions == {}
+
+def test_session_turns_serialized_across_workers(fake_redis):
+    """Test that two processes sharing Redis never run a session's turns at once"""
+    workers = [
+        Scheduler(max_concurrency=4, max_queue=10, turn_lock=RedisSessionLock(fake_redis, poll_interval=0.001))
+        for _ in range(2)
+    ]
+    events = []
+
+    async def turn(scheduler, number):
+        async with scheduler.slot("shared-session"):
+            events.append(("start", number))
+            await asyncio.sleep(0.01)
+            events.append(("end", number))
+
+    async def scenario():
+        await asyncio.gather(*(turn(workers[i % 2], i) for i in range(4)))
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert [kind for kind, _ in events] == ["start", "end"] * 4
+    assert all(events[i][1] == events[i + 1][1] for i in range(0, 8, 2))
+    assert "chatbot:turn:shared-session" not in fake_redis.data
+    assert all(worker._sessions == {} for worker in workers)
+
+def test_model_concurrency_keeps_busy_models_from_blocking_others():
+    """Test per-model slot limits, their FIFO queue and the expected wait"""
+    scheduler = Scheduler(max_concurrency=2, max_queue=10, model_concurrency=1)
+
+    async def scenario():
+        big = await scheduler.acquire("a", "big")
+        queued = asyncio.ensure_future(scheduler.acquire("b", "big"))
+        await asyncio.sleep(0)
+        small = await asyncio.wait_for(scheduler.acquire("c", "small"), 0.1)
+        assert not queued.done() and scheduler.active == 2
+        scheduler.model_service_ewma["big"] = 10.0
+        waits = scheduler.expected_wait("big"), scheduler.expected_wait("small")
+
+        scheduler.release(big)
+        scheduler.release((await queued))
+        scheduler.release(small)
+        return waits
+
+    assert asyncio.run(scenario()) == (20.0, 0.0)
+    assert scheduler.active == 0 and scheduler._models == {}
+
+def test_full_queue_rejects_with_retry_after():
+    """Test backpressure once max_queue requests are waiting"""
+    scheduler = Scheduler(max_concurrency=1, max_queue=1)
+
+    async def scenario():
+        holder = await scheduler.acquire("a")
+        waiter = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        with pytest.raises(OverloadedError) as excinfo:
+            await scheduler.acquire("c")
+        assert excinfo.value.retry_after >= 1
+
+        scheduler.release(holder)
+        scheduler.release(await waiter)
+
+    asyncio.run(scenario())
+
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.active == 0
+
+def test_cancelled_waiter_frees_its_place():
+    """Test that a request abandoned while queued doesn't leak a slot"""
+    scheduler = Scheduler(max_concurrency=1, max_queue=10)
+
+    async def scenario():
+        holder = await scheduler.acquire("a")
+        waiter = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        async with scheduler.slot("c"):
+            pass
+
+    asyncio.run(scenario())
+
+    assert scheduler.active == 0
+    assert scheduler.queued == 0
+
+def test_chat_returns_503_when_overloaded(fake_llm, monkeypatch):
+    """Test that the API maps a full queue to 503 with Retry-After"""
+    monkeypatch.setattr(main, "scheduler", Scheduler(max_concurrency=1, max_queue=0))
+    client = TestClient(main.app)
+
+    response = client.post("/api/chat", json={"message": "Hi", "session_id": "busy"})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_fair_queue_weights_classes_and_rotates_flows():
+    """Test weighted round-robin across classes and round-robin across flows"""
+    queue = FairQueue({"ws": 2, "api": 1})
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        waiters = {}
+        for name, traffic_class, flow in [
+            ("A1", "ws", "A"), ("A2", "ws", "A"), ("A3", "ws", "A"),
+            ("B1", "ws", "B"), ("C1", "api", "C"), ("C2", "api", "C")
+        ]:
+            waiters[name] = loop.create_future()
+            queue.push(traffic_class, flow, waiters[name])
+        names = {id(waiter): name for name, waiter in waiters.items()}
+        return [names[id(queue.pop())] for _ in range(6)]
+
+    assert asyncio.run(scenario()) == ["A1", "B1", "C1", "A2", "A3", "C2"]
+    assert len(queue) == 0
+
+def test_busy_flow_does_not_starve_others():
+    """Test that a late request from another flow overtakes a busy flow's backlog"""
+    scheduler = Scheduler(max_concurrency=1, max_queue=10)
+    order = []
+
+    async def turn(session_id, flow):
+        async with scheduler.slot(session_id, flow=flow):
+            order.append(session_id)
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        holder = await scheduler.acquire("first")
+        tasks = [asyncio.ensure_future(turn(f"busy-{i}", "busy-key")) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(turn("other", "other-key")))
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert order[:2] == ["busy-0", "other"]
+
+def test_interactive_class_served_before_batch_backlog():
+    """Test that WebSocket turns jump ahead of queued batch work"""
+    scheduler = Scheduler(max_concurrency=1, max_queue=20, class_weights={"ws": 4, "api": 2, "batch": 1})
+    order = []
+
+    async def turn(session_id, traffic_class):
+        async with scheduler.slot(session_id, traffic_class=traffic_class):
+            order.append(session_id)
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        holder = await scheduler.acquire("first")
+        tasks = [asyncio.ensure_future(turn(f"batch-{i}", "batch")) for i in range(5)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(turn("interactive", "ws")))
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert order[0] == "interactive"
+    assert scheduler.stats()["class_wait_ewma_seconds"].keys() == {"api", "batch", "ws"}
@@ -0,0 +1,142 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+import bot
+from bot import ChatBot
+from llm import llm_registry
+from semantic_cache import SemanticCache
+from vector_index import VectorIndex
+
+class FakeEmbedder:
+    """Deterministic bag-of-words embedding (hashed into 64 buckets)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().strip("?!.").split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector.tolist()
+
+@pytest.fixture
+def semantic(monkeypatch):
+    cache = SemanticCache(FakeEmbedder(), threshold=0.8, capacity=10)
+    monkeypatch.setattr(bot, "semantic_cache", cache)
+    return cache
+
+def test_vector_index_batch_search_and_eviction():
+    """Test vectorized best-match search and LRU replacement when full"""
+    index = VectorIndex(capacity=2)
+    index.add([1.0, 0.0, 0.0], "x")
+    index.add([0.0, 1.0, 0.0], "y")
+
+    slots, similarities = index.search([[2.0, 0.1, 0.0], [0.0, 0.0, 1.0]])
+    assert index.get(int(slots[0])) == "x"
+    assert similarities[0] > 0.99 and similarities[1] == pytest.approx(0.0)
+
+    index.add([0.0, 0.0, 1.0], "z")  # evicts "y", the least recently used
+    assert sorted(index.payloads) == ["x", "z"]
+
+def test_vector_index_namespaces_and_growth():
+    """Test that searches stay in their namespace and arrays grow with use"""
+    index = VectorIndex(capacity=1000)
+    index.add([1.0, 0.0], "a-answer", namespace="a")
+    assert index.vectors.shape == (16, 2)
+
+    slots, _ = index.search([1.0, 0.0], namespace="b")
+    assert slots[0] == -1
+
+    index.add([1.0, 0.1], "b-answer", namespace="b")
+    slots, _ = index.search([1.0, 0.0], namespace="b")
+    assert index.get(int(slots[0])) == "b-answer"
+
+    for i in range(20):
+        index.add([float(i), 1.0], str(i), namespace="a")
+    assert len(index) == 22 and index.vectors.shape == (32, 2)
+
+def test_capacity_bounds_all_namespaces(fake_llm, semantic):
+    """Test that distinct option sets share one capacity and memory budget"""
+    for number in range(30):
+        asyncio.run(ChatBot(session_id=f"sem-many-{number}", model_name="phi").get_response(
+            "How do I reset my password?", max_tokens=100 + number
+        ))
+
+    stats = semantic.stats()
+    assert len(fake_llm["phi"].calls) == 30
+    assert stats["entries"] == 10
+    assert stats["namespaces"] == 10
+    assert semantic.index.vectors.shape == (10, 64)
+    assert semantic.index.nbytes <= 10 * (64 * 4 + 8 + 8)
+
+    # The most recent namespaces survive eviction
+    hit = asyncio.run(ChatBot(session_id="sem-many-last", model_name="phi").get_response(
+        "How do I reset my password?", max_tokens=129
+    ))
+    assert hit["metadata"]["cached"] == "semantic"
+
+def test_similar_opening_question_hits(fake_llm, semantic):
+    """Test that a reworded first message is answered from the cache"""
+    first = ChatBot(session_id="sem-1", model_name="phi")
+    second = ChatBot(session_id="sem-2", model_name="phi")
+
+    asyncio.run(first.get_response("How do I reset my password?"))
+    hit = asyncio.run(second.get_response("how do i reset my password please"))
+
+    assert len(fake_llm["phi"].calls) == 1
+    assert hit["response"] == "Hello there"
+    assert hit["metadata"]["cached"] == "semantic"
+    assert len(asyncio.run(second.get_history())) == 2
+
+def test_only_session_opening_messages_use_cache(fake_llm, semantic):
+    """Test that later turns and unrelated questions go to the model"""
+    chatbot = ChatBot(session_id="sem-3", model_name="phi")
+
+    asyncio.run(chatbot.get_response("How do I reset my password?"))
+    asyncio.run(chatbot.get_response("How do I reset my password?"))
+    asyncio.run(ChatBot(session_id="sem-4", model_name="phi").get_response("What is the weather"))
+
+    assert len(fake_llm["phi"].calls) == 3
+    assert semantic.embedder.calls == 2
+
+def test_persist_and_reload(tmp_path, fake_llm, semantic):
+    """Test saving the index and answering from a reloaded copy"""
+    asyncio.run(ChatBot(session_id="sem-5", model_name="phi").get_response("reset password"))
+    semantic.save(str(tmp_path))
+    [namespace] = semantic.index.namespaces
+
+    reloaded = SemanticCache(FakeEmbedder(), threshold=0.8, capacity=10)
+    reloaded.load(str(tmp_path))
+    answer, _ = asyncio.run(reloaded.lookup(namespace, "reset password"))
+
+    assert answer == "Hello there"
+    assert reloaded.stats()["entries"] == 1
+
+def test_answers_are_not_shared_across_models_or_options(fake_llm, semantic):
+    """Test that another model, temperature or token limit misses the cache"""
+    question = "How do I reset my password?"
+    asyncio.run(ChatBot(session_id="sem-6", model_name="phi").get_response(question))
+    asyncio.run(ChatBot(session_id="sem-7", model_name="mistral").get_response(question))
+    asyncio.run(ChatBot(session_id="sem-8", model_name="phi").get_response(question, temperature=1.2))
+    asyncio.run(ChatBot(session_id="sem-9", model_name="phi").get_response(question, max_tokens=16))
+    hit = asyncio.run(ChatBot(session_id="sem-10", model_name="phi").get_response(question))
+
+    assert len(fake_llm["phi"].calls) == 3
+    assert len(fake_llm["mistral"].calls) == 1
+    assert hit["metadata"]["cached"] == "semantic"
+    assert semantic.stats()["namespaces"] == 4
+
+def test_embeddings_use_the_balanced_pool():
+    """Test that embedding requests go through the backend balancer"""
+    embedder = llm_registry.create_embeddings("nomic-embed-text")
+    _, async_transport = llm_registry.transports()
+
+    assert embedder.base_url == llm_registry.base_url
+    assert embedder.async_client_kwargs["transport"] is async_transport
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from sessions import SessionManager
+
+class FakeBot:
+    """Minimal stand-in for ChatBot"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.closed = False
+
+    def estimated_memory_bytes(self):
+        return 100
+
+    def close(self):
+        self.closed = True
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_manager(max_sessions=3, idle_timeout=60):
+    clock = FakeClock()
+    manager = SessionManager(FakeBot, max_sessions=max_sessions, idle_timeout=idle_timeout, clock=clock)
+    return manager, clock
+
+def test_lru_eviction_at_capacity():
+    """Test that the least recently used session is evicted at the cap"""
+    manager, _ = make_manager(max_sessions=2)
+    first = manager.get_or_create("a")
+    manager.get_or_create("b")
+    manager.get("a")  # "b" is now least recently used
+    manager.get_or_create("c")
+
+    assert "a" in manager and "c" in manager and "b" not in manager
+    assert len(manager) == 2
+    assert manager.get_or_create("a") is first
+    assert manager.stats()["evicted_lru"] == 1
+
+def test_idle_sessions_expire():
+    """Test that sweeping removes only sessions idle past the timeout"""
+    manager, clock = make_manager(idle_timeout=60)
+    old = manager.get_or_create("old")
+    clock.now = 50
+    manager.get_or_create("recent")
+    clock.now = 61
+
+    assert manager.sweep() == 1
+    assert old.closed
+    assert "old" not in manager and "recent" in manager
+
+    stats = manager.stats()
+    assert stats["evicted_ttl"] == 1
+    assert stats["estimated_memory_bytes"] == 100
+
+def test_delete_closes_session():
+    """Test deleting sessions"""
+    manager, _ = make_manager()
+    chatbot = manager.get_or_create("x")
+
+    assert manager.delete("x")
+    assert chatbot.closed
+    assert not manager.delete("x")
+    assert manager.get("x") is None
+
+def test_pages_follow_last_activity_without_duplicates():
+    """Test cursor pages newest-first while sessions keep being used"""
+    manager, clock = make_manager(max_sessions=100)
+    for name in "abcdef":
+        clock.now += 1
+        manager.get_or_create(name)
+
+    first, cursor = manager.page(limit=2)
+    manager.get("a")  # moves ahead of the cursor
+    rest = []
+    while cursor is not None:
+        page, cursor = manager.page(cursor=cursor, limit=2)
+        rest += page
+
+    assert [sid for sid, _ in first] == ["f", "e"]
+    assert [sid for sid, _ in rest] == ["d", "c", "b"]
+    assert [sid for sid, _ in manager.page(order="created", limit=10)[0]] == list("fedcba")
+
+def test_page_filters_and_scan_limit():
+    """Test active_since, predicates and bounded scans"""
+    manager, clock = make_manager(max_sessions=100)
+    for i in range(10):
+        clock.now = i
+        manager.get_or_create(f"s{i}")
+
+    # clock.now is 9, so only s7..s9 were used within the last 2.5s
+    recent, cursor = manager.page(active_since=time.time() - 2.5)
+    assert [sid for sid, _ in recent] == ["s9", "s8", "s7"] and cursor is None
+
+    odd = lambda chatbot: int(chatbot.session_id[1:]) % 2 == 1
+    page, cursor = manager.page(limit=10, predicate=odd, max_scan=4)
+    assert [sid for sid, _ in page] == ["s9", "s7"]
+    page, cursor = manager.page(cursor=cursor, limit=10, predicate=odd, max_scan=4)
+    assert [sid for sid, _ in page] == ["s5", "s3"]
+
+def test_listing_indexes_stay_bounded():
+    """Test that stale index entries are compacted"""
+    manager, _ = make_manager(max_sessions=10)
+    for i in range(10):
+        manager.get_or_create(f"s{i}")
+    for _ in range(1000):
+        manager.get("s0")
+    manager.delete("s1")
+
+    assert len(manager._activity) <= 2 * len(manager) + 64
+    assert [sid for sid, _ in manager.page(limit=3)[0]] == ["s0", "s9", "s8"]
+    assert "s1" not in [sid for sid, _ in manager.page(order="created", limit=20)[0]]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import bot
+from bot import ChatBot
+from singleflight import SingleFlight
+
+@pytest.fixture
+def flights(monkeypatch, fake_llm):
+    flights = SingleFlight()
+    monkeypatch.setattr(bot, "singleflight", flights)
+    # Slow the fake model down so the requests overlap
+    original = bot.llm_registry.factory
+    def factory(model_name):
+        client = original(model_name)
+        client.sleep = 0.01
+        return client
+    monkeypatch.setattr(bot.llm_registry, "factory", factory)
+    return flights
+
+def test_concurrent_identical_requests_share_generation(fake_llm, flights):
+    """Test that simultaneous identical requests make one model call"""
+    bots = [ChatBot(session_id=f"session-{i}", model_name="fake") for i in range(5)]
+
+    async def scenario():
+        return await asyncio.gather(*(chatbot.get_response("Hi", temperature=0.0) for chatbot in bots))
+
+    results = asyncio.run(scenario())
+
+    assert [result["response"] for result in results] == ["Hello there"] * 5
+    assert len(fake_llm["fake"].calls) == 1
+    # Every session still records its own turn
+    for chatbot in bots:
+        assert chatbot.get_session_history(chatbot.session_id).messages[-1].content == "Hello there"
+
+    stats = flights.stats()
+    assert stats["leaders"] == 1
+    assert stats["followers"] == 4
+    assert stats["coalescing_ratio"] == pytest.approx(0.8)
+    assert stats["in_flight"] == 0
+
+def test_streaming_waiters_receive_same_tokens(fake_llm, flights):
+    """Test that a late subscriber replays the stream from the beginning"""
+    first = ChatBot(session_id="first", model_name="fake")
+    second = ChatBot(session_id="second", model_name="fake")
+
+    async def collect(chatbot, delay):
+        await asyncio.sleep(delay)
+        return [frame async for frame in chatbot.stream_response("Hi", temperature=0.0)]
+
+    async def scenario():
+        return await asyncio.gather(collect(first, 0), collect(second, 0.03))
+
+    first_frames, second_frames = asyncio.run(scenario())
+
+    deltas = lambda frames: [frame["delta"] for frame in frames if frame["type"] == "delta"]
+    assert deltas(first_frames) == deltas(second_frames) == list("Hello there")
+    assert second_frames[-1]["response"] == "Hello there"
+    assert len(fake_llm["fake"].calls) == 1
+
+def test_different_prompts_are_not_coalesced(fake_llm, flights):
+    """Test that only identical requests share a generation"""
+    bots = [ChatBot(session_id=f"session-{i}", model_name="fake") for i in range(2)]
+
+    async def scenario():
+        await asyncio.gather(bots[0].get_response("Hi"), bots[1].get_response("Hello"))
+
+    asyncio.run(scenario())
+
+    assert len(fake_llm["fake"].calls) == 2
+    assert flights.stats()["followers"] == 0
+
+def test_errors_reach_every_waiter():
+    """Test that a failed generation is reported to all subscribers"""
+    flights = SingleFlight()
+
+    async def produce():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+        yield
+
+    async def consume():
+        return [text async for text in flights.stream("key", produce)]
+
+    async def scenario():
+        return await asyncio.gather(consume(), consume(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(flights) == 0
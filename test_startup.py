@@ -0,0 +1,50 @@
+import asyncio
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.bench_import import parse_importtime
+from config import settings
+from startup import Readiness
+
+def test_main_import_skips_langchain():
+    """Test that the heavy LLM stack stays off the startup import path"""
+    code = "import sys, main; print(','.join(m for m in ('bot', 'langchain_ollama', 'langchain_core', 'httpx', 'numpy') if m in sys.modules))"
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+def test_parse_importtime():
+    """Test parsing of python -X importtime output"""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     json.decoder\n"
+        "import time:       300 |        420 |   json\n"
+        "import time:        50 |        470 | main\n"
+    )
+
+    entries = parse_importtime(output)
+
+    assert [(e.module, e.cumulative_us, e.depth) for e in entries] == [
+        ("json.decoder", 120, 2), ("json", 420, 1), ("main", 470, 0)
+    ]
+
+def test_ready_endpoint_waits_for_preload_and_warmup(fake_llm, monkeypatch):
+    """Test that /api/ready turns 200 only after startup preparation"""
+    monkeypatch.setattr(settings, "WARMUP_MODELS", ["llama2"])
+    monkeypatch.setattr(main, "readiness", Readiness())
+    client = TestClient(main.app)
+
+    starting = client.get("/api/ready")
+    asyncio.run(main.readiness.prepare())
+    ready = client.get("/api/ready")
+
+    assert starting.status_code == 503
+    assert starting.json()["status"] == "starting"
+    assert client.get("/api/health").status_code == 200
+    assert ready.status_code == 200
+    assert set(ready.json()["timings"]) == {"imports", "warmup"}
+    assert fake_llm["llama2"].calls
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app, chatbot_sessions
+
+client = TestClient(app)
+
+def test_websocket_streaming(fake_llm):
+    """Test delta frames followed by a final frame over the WebSocket"""
+    chatbot_sessions.delete("stream-test")
+
+    with client.websocket_connect("/ws/stream-test") as websocket:
+        websocket.send_json({"message": "Hi", "stream": True})
+
+        frames = []
+        while True:
+            frame = websocket.receive_json()
+            frames.append(frame)
+            if frame["type"] != "delta":
+                break
+
+    deltas = frames[:-1]
+    final = frames[-1]
+    assert [f["seq"] for f in deltas] == list(range(len(deltas)))
+    assert "".join(f["delta"] for f in deltas) == "Hello there"
+    assert final["type"] == "final"
+    assert final["seq"] == len(deltas)
+    assert final["response"] == "Hello there"
+    assert final["metadata"]["message_count"] == 2
+    assert "timestamp" in final
+
+def test_websocket_non_streaming_unchanged(fake_llm):
+    """Test that messages without the stream flag still get a single reply"""
+    chatbot_sessions.delete("stream-off-test")
+
+    with client.websocket_connect("/ws/stream-off-test") as websocket:
+        websocket.send_json({"message": "Hi"})
+        frame = websocket.receive_json()
+
+    assert frame["response"] == "Hello there"
+    assert "type" not in frame
+
+def _parse_sse(body):
+    """Split an SSE body into (event, data) pairs"""
+    events = []
+    for raw in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in raw.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_chat_sse_stream(fake_llm):
+    """Test the SSE variant of the chat endpoint"""
+    chatbot_sessions.delete("sse-test")
+
+    response = client.post(
+        "/api/chat",
+        json={"message": "Hi", "session_id": "sse-test", "stream": True}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    assert all(event == "delta" for event, _ in events[:-1])
+    assert "".join(data["delta"] for _, data in events[:-1]) == "Hello there"
+
+    event, done = events[-1]
+    assert event == "done"
+    assert done["response"] == "Hello there"
+    assert done["session_id"] == "sse-test"
+    assert done["metadata"]["message_count"] == 2
+
+    history = client.get("/api/history/sse-test").json()
+    assert [m["role"] for m in history["messages"]] == ["user", "assistant"]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from config import parse_keep_alive, settings
+from llm import keep_alive_for, llm_registry
+from warmup import ModelWarmer
+
+def test_keep_alive_per_model(monkeypatch):
+    """Test exact, untagged and default keep_alive lookups"""
+    monkeypatch.setattr(settings, "MODEL_KEEP_ALIVE", {"llama3.2": "-1", "mistral:7b": "30m", "*": "10m"})
+
+    assert keep_alive_for("llama3.2:latest") == -1
+    assert keep_alive_for("mistral:7b") == "30m"
+    assert keep_alive_for("phi") == "10m"
+    assert llm_registry._create_ollama_client("llama3.2:latest").keep_alive == -1
+
+def test_parse_keep_alive():
+    """Test per-model entries and a bare duration as the default for all models"""
+    assert parse_keep_alive("llama2=-1, *=30m") == {"llama2": "-1", "*": "30m"}
+    assert parse_keep_alive("10m") == {"*": "10m"}
+    assert parse_keep_alive("10m,llama2=-1,") == {"*": "10m", "llama2": "-1"}
+    assert parse_keep_alive("") == {}
+
+def test_warm_up_records_latency_and_failures(fake_llm, monkeypatch):
+    """Test that warm-up loads each model and reports failures without raising"""
+    warmer = ModelWarmer(llm_registry)
+
+    results = asyncio.run(warmer.warm_up_all(["llama2", "mistral"], timeout=5))
+
+    assert results == {"llama2": True, "mistral": True}
+    assert fake_llm["llama2"].calls[0]["options"] == {"num_predict": 1}
+    assert warmer.stats()["mistral"]["warmup_seconds"] is not None
+
+    def unreachable(model_name):
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(llm_registry, "factory", unreachable)
+    assert asyncio.run(warmer.warm_up("phi", timeout=5)) is False
+    assert "ConnectionError" in warmer.stats()["phi"]["warmup_error"]
+
+def test_cold_starts_are_tracked():
+    """Test that only responses with a real model load count as cold starts"""
+    warmer = ModelWarmer(llm_registry)
+
+    warmer.observe("llama2", {"load_duration": 20_000_000})
+    warmer.observe("llama2", {"load_duration": 3_000_000_000})
+    warmer.observe("llama2", {"load_duration": 1_500_000_000})
+
+    status = warmer.stats()["llama2"]
+    assert status["cold_starts"] == 2
+    assert status["last_cold_start_seconds"] == 1.5
+    assert status["max_cold_start_seconds"] == 3.0
+
+def test_models_endpoint_reports_loaded_models(monkeypatch):
+    """Test /api/models against Ollama's running model list"""
+    async def running_models():
+        return [{"name": "mistral:latest", "expires_at": "2030-01-01T00:00:00Z", "size_vram": 4096}]
+
+    monkeypatch.setattr(llm_registry, "running_models", running_models)
+    client = TestClient(main.app)
+
+    models = {model["name"]: model for model in client.get("/api/models").json()["models"]}
+
+    assert models["mistral"]["loaded"] is True
+    assert models["mistral"]["size_vram"] == 4096
+    assert models["llama2"]["loaded"] is False
+    assert "mistral:latest" not in models
@@ -0,0 +1,62 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+def load_worker(name):
+    """Import main.py as an independent module, like a separate worker process"""
+    spec = importlib.util.spec_from_file_location(name, Path(__file__).parent / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def workers(fake_redis, fake_llm):
+    """Two workers with separate session managers sharing one Redis"""
+    return [TestClient(load_worker(f"main_worker_{i}").app) for i in range(2)]
+
+def _chat(client, message):
+    response = client.post("/api/chat", json={"message": message, "session_id": "multi"})
+    assert response.status_code == 200
+    return response.json()
+
+def _contents(client):
+    response = client.get("/api/history/multi")
+    assert response.status_code == 200
+    return [m["content"] for m in response.json()["messages"]]
+
+def test_session_consistent_across_workers(workers):
+    """Test alternating a session between workers keeps one history"""
+    first, second = workers
+
+    _chat(first, "one")
+    assert _contents(second) == ["one", "Hello there"]
+
+    reply = _chat(second, "two")
+    assert reply["metadata"]["message_count"] == 4
+
+    _chat(first, "three")
+    expected = ["one", "Hello there", "two", "Hello there", "three", "Hello there"]
+    assert _contents(first) == expected
+    assert _contents(second) == expected
+
+def test_delete_visible_to_other_workers(workers):
+    """Test that deleting a session on one worker removes it for all"""
+    first, second = workers
+    _chat(first, "one")
+
+    assert second.delete("/api/sessions/multi").status_code == 200
+    assert _contents(first) == []
+
+def test_multiple_workers_require_redis(monkeypatch):
+    """Test that in-memory sessions refuse to run with several workers"""
+    from config import settings
+    monkeypatch.setattr(settings, "API_WORKERS", 4)
+    monkeypatch.setattr(settings, "USE_REDIS", False)
+
+    with pytest.raises(RuntimeError):
+        load_worker("main_worker_unsafe")
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,145 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Rows allocated on the first insert; the arrays then double up to capacity
+INITIAL_ROWS = 16
+
+
+class VectorIndex:
+    """
+    Bounded cosine-similarity index backed by a NumPy matrix.
+
+    Vectors are stored L2-normalized so a batch search is a single matrix
+    product. Every row belongs to a namespace and searches only match rows
+    of their own namespace, so capacity bounds the index as a whole however
+    many namespaces are in use. The arrays grow as entries are added; when
+    full, the least recently used entry (of any namespace) is overwritten.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.dim: Optional[int] = None
+        self.size = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.payloads: List[Optional[str]] = []
+        self.last_used = np.zeros(0, dtype=np.int64)
+        self.namespace_ids = np.zeros(0, dtype=np.int64)
+        self._namespaces: Dict[str, int] = {}  # namespace -> id
+        self._names: Dict[int, str] = {}       # id -> namespace
+        self._rows: Dict[int, int] = {}        # id -> rows using it
+        self._next_id = 0
+        self._tick = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def namespaces(self) -> List[str]:
+        """Namespaces with at least one entry"""
+        return list(self._namespaces)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the NumPy arrays"""
+        vectors = self.vectors.nbytes if self.vectors is not None else 0
+        return vectors + self.last_used.nbytes + self.namespace_ids.nbytes
+
+    def _grow(self, dim: int):
+        rows = min(self.capacity, max(INITIAL_ROWS, 2 * len(self.last_used)))
+        vectors = np.zeros((rows, dim), dtype=np.float32)
+        if self.vectors is not None:
+            vectors[:self.size] = self.vectors[:self.size]
+        self.dim = dim
+        self.vectors = vectors
+        self.last_used = np.resize(self.last_used, rows)
+        self.namespace_ids = np.resize(self.namespace_ids, rows)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def _touch(self, slot: int):
+        self._tick += 1
+        self.last_used[slot] = self._tick
+
+    def _claim_namespace(self, namespace: str) -> int:
+        namespace_id = self._namespaces.get(namespace)
+        if namespace_id is None:
+            namespace_id = self._namespaces[namespace] = self._next_id
+            self._names[namespace_id] = namespace
+            self._next_id += 1
+        self._rows[namespace_id] = self._rows.get(namespace_id, 0) + 1
+        return namespace_id
+
+    def _drop_namespace(self, slot: int):
+        namespace_id = int(self.namespace_ids[slot])
+        self._rows[namespace_id] -= 1
+        if self._rows[namespace_id] == 0:
+            del self._rows[namespace_id]
+            del self._namespaces[self._names.pop(namespace_id)]
+
+    def add(self, vector, payload: str, namespace: str = "") -> int:
+        """Insert a vector, evicting the least recently used entry when full"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.size < self.capacity:
+            if self.vectors is None or self.size == len(self.vectors):
+                self._grow(vector.shape[-1])
+            slot = self.size
+            self.size += 1
+            self.payloads.append(None)
+        else:
+            slot = int(np.argmin(self.last_used))
+            self._drop_namespace(slot)
+
+        self.vectors[slot] = self._normalize(vector)
+        self.payloads[slot] = payload
+        self.namespace_ids[slot] = self._claim_namespace(namespace)
+        self._touch(slot)
+        return slot
+
+    def search(self, queries, namespace: str = "") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best match in namespace for each row of queries; returns (slots,
+        similarities). Slots are -1 when the namespace has no entries.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        namespace_id = self._namespaces.get(namespace)
+        if namespace_id is None:
+            return np.full(len(queries), -1), np.zeros(len(queries), dtype=np.float32)
+
+        similarities = self._normalize(queries) @ self.vectors[:self.size].T
+        similarities[:, self.namespace_ids[:self.size] != namespace_id] = -np.inf
+        slots = np.argmax(similarities, axis=1)
+        return slots, similarities[np.arange(len(queries)), slots]
+
+    def get(self, slot: int) -> Optional[str]:
+        """Payload for a slot, marking it as recently used"""
+        self._touch(slot)
+        return self.payloads[slot]
+
+    def save(self, path: str):
+        """Write the index to a .npz file"""
+        np.savez_compressed(
+            path,
+            vectors=self.vectors[:self.size] if self.vectors is not None else np.zeros((0, 0), dtype=np.float32),
+            last_used=self.last_used[:self.size],
+            payloads=np.array(json.dumps(self.payloads[:self.size])),
+            namespaces=np.array(json.dumps([self._names[int(id_)] for id_ in self.namespace_ids[:self.size]]))
+        )
+
+    @classmethod
+    def load(cls, path: str, capacity: int) -> "VectorIndex":
+        """Read an index written by save(), keeping the most recent entries"""
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            last_used = data["last_used"]
+            payloads = json.loads(str(data["payloads"]))
+            namespaces = json.loads(str(data["namespaces"]))
+
+        index = cls(capacity)
+        for slot in np.argsort(last_used)[-capacity:]:
+            index.add(vectors[slot], payloads[slot], namespaces[slot])
+        return index
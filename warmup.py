@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable
+
+from llm import LLMRegistry, generation_options, llm_registry
+from metrics import MODEL_LOAD
+
+logger = logging.getLogger(__name__)
+
+# Ollama reports a load_duration with every response; anything above this
+# means the weights had to be loaded, i.e. the request hit a cold model
+COLD_START_SECONDS = 0.5
+
+
+class ModelWarmer:
+    """
+    Loads models ahead of traffic and keeps track of cold starts.
+
+    warm_up() sends a one-token generation, which makes Ollama load the
+    model (with the client's keep_alive) before the first user request
+    pays for it. observe() is fed the Ollama timings of every generation,
+    so loads after an eviction show up too.
+    """
+
+    def __init__(self, registry: LLMRegistry):
+        self.registry = registry
+        self._models: Dict[str, Dict] = {}
+
+    def _status(self, model_name: str) -> Dict:
+        status = self._models.get(model_name)
+        if status is None:
+            status = self._models[model_name] = {
+                "warmed_at": None,
+                "warmup_seconds": None,
+                "warmup_error": None,
+                "cold_starts": 0,
+                "last_cold_start_seconds": None,
+                "max_cold_start_seconds": None
+            }
+        return status
+
+    async def warm_up(self, model_name: str, timeout: float) -> bool:
+        """Load a model with a one-token generation; False if it failed"""
+        status = self._status(model_name)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.registry.get(model_name).ainvoke("Hi", **generation_options(max_tokens=1)),
+                timeout
+            )
+        except Exception as e:
+            status["warmup_error"] = f"{type(e).__name__}: {e}"
+            logger.warning("Warm-up of %s failed: %s", model_name, status["warmup_error"])
+            return False
+
+        status["warmup_seconds"] = round(time.perf_counter() - started, 3)
+        status["warmed_at"] = datetime.now().isoformat()
+        status["warmup_error"] = None
+        self.observe(model_name, getattr(response, "response_metadata", None) or {})
+        logger.info("Warmed up %s in %.2fs", model_name, status["warmup_seconds"])
+        return True
+
+    async def warm_up_all(self, model_names: Iterable[str], timeout: float) -> Dict[str, bool]:
+        """Warm up several models concurrently"""
+        model_names = list(model_names)
+        results = await asyncio.gather(*(self.warm_up(name, timeout) for name in model_names))
+        return dict(zip(model_names, results))
+
+    def observe(self, model_name: str, response_metadata: Dict):
+        """Record a cold start if Ollama had to load the model for this response"""
+        load_seconds = (response_metadata.get("load_duration") or 0) / 1e9
+        if load_seconds < COLD_START_SECONDS:
+            return
+        status = self._status(model_name)
+        status["cold_starts"] += 1
+        status["last_cold_start_seconds"] = round(load_seconds, 3)
+        status["max_cold_start_seconds"] = max(status["max_cold_start_seconds"] or 0, round(load_seconds, 3))
+        MODEL_LOAD.labels(model_name).observe(load_seconds)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: dict(status) for name, status in self._models.items()}
+
+
+model_warmer = ModelWarmer(llm_registry)
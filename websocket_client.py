@@ -8,9 +8,10 @@ class WebSocketChatClient:
     WebSocket client for real-time chat with the bot
     """
     
-    def __init__(self, url: str = "ws://localhost:8000", session_id: str = "websocket_client"):
+    def __init__(self, url: str = "ws://localhost:8000", session_id: str = "websocket_client", stream: bool = False):
         self.url = f"{url}/ws/{session_id}"
         self.session_id = session_id
+        self.stream = stream
         self.websocket = None
     
     async def connect(self):
@@ -26,7 +27,8 @@ class WebSocketChatClient:
         payload = {
             "message": message,
             "temperature": temperature,
-            "max_tokens": 2000
+            "max_tokens": 2000,
+            "stream": self.stream
         }
         
         await self.websocket.send(json.dumps(payload))
@@ -71,8 +73,19 @@ class WebSocketChatClient:
             while True:
                 try:
                     response = await self.receive_message()
-                    print(f"\nBot: {response['response']}")
-                    print(f"[{response['timestamp']}]")
+                    frame_type = response.get("type")
+                    
+                    if frame_type == "delta":
+                        if response["seq"] == 0:
+                            print("\nBot: ", end="")
+                        print(response["delta"], end="", flush=True)
+                    elif frame_type == "final":
+                        print(f"\n[{response['timestamp']}]")
+                    elif frame_type == "error":
+                        print(f"\n❌ Error: {response['error']}")
+                    else:
+                        print(f"\nBot: {response['response']}")
+                        print(f"[{response['timestamp']}]")
                 
                 except websockets.exceptions.ConnectionClosed:
                     print("\n🔌 Connection closed")
@@ -96,10 +109,11 @@ async def main():
     parser = argparse.ArgumentParser(description="WebSocket Chatbot Client")
     parser.add_argument("--url", default="ws://localhost:8000", help="WebSocket URL")
     parser.add_argument("--session", default="websocket_client", help="Session ID")
+    parser.add_argument("--stream", action="store_true", help="Stream the response token by token")
     
     args = parser.parse_args()
     
-    client = WebSocketChatClient(url=args.url, session_id=args.session)
+    client = WebSocketChatClient(url=args.url, session_id=args.session, stream=args.stream)
     
     try:
         await client.chat()